@@ -2,16 +2,25 @@ import requests
 import json
 import time
 import logging
+import threading
 import os
 from dotenv import load_dotenv
 from urllib.parse import quote_plus
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.transport import get_session, log_connection_stats
+from common.rate_limit import TokenBucket, QuotaExhausted, get_limiter
+from common.pagination import fetch_pages
+from common.quota_ledger import BudgetExceeded, get_ledger
+from common.metrics import metrics
+from common.search_records import SearchItem, PageMeta, to_json
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class GoogleSearchScraper:
-    def __init__(self):
+    def __init__(self, requests_per_second=4):
         # Load environment variables
         load_dotenv()
         
@@ -28,6 +37,21 @@ class GoogleSearchScraper:
         # API endpoint
         self.api_endpoint = "https://www.googleapis.com/customsearch/v1"
         
+        # Shared keep-alive HTTP session
+        self.session = get_session()
+        
+        # Request budget for parallel page fetches
+        self.rate_limiter = TokenBucket(rate=requests_per_second)
+        
+        # Per-provider AIMD concurrency limit; retries 429/5xx with backoff, honoring Retry-After
+        self.limiter = get_limiter("google_cse")
+        
+        # Daily/monthly budget shared with every other process using this API key
+        self.ledger = get_ledger()
+        
+        # Guards counters shared by parallel page fetches
+        self._lock = threading.Lock()
+        
         # Results storage
         self.results = {
             "metadata": {
@@ -51,6 +75,12 @@ class GoogleSearchScraper:
         Returns:
             dict: Search results
         """
+        data = self._request_search(query, num_results, start_index, search_type)
+        self._store_search_data(data)
+        return data
+    
+    def _request_search(self, query, num_results=10, start_index=1, search_type=None):
+        """Make one API request without touching stored results (safe to call from worker threads)"""
         # Prepare parameters
         params = {
             'key': self.api_key,
@@ -68,7 +98,12 @@ class GoogleSearchScraper:
         
         try:
             # Make the API request
-            response = requests.get(self.api_endpoint, params=params)
+            # Each attempt, retries included, is reserved against the shared budget; refunded unless the provider answered
+            send = self.ledger.metered("google_cse", lambda: self.session.get(self.api_endpoint, params=params))
+            with metrics.stage("request", "google_cse"):
+                response = self.limiter.call(send)
+            
+            metrics.inc("scraper_requests_total", provider="google_cse", status=response.status_code)
             
             # Check for API errors
             if response.status_code != 200:
@@ -82,110 +117,122 @@ class GoogleSearchScraper:
                 return {"error": error_info}
             
             # Parse the response
-            data = response.json()
+            with metrics.stage("decode", "google_cse"):
+                data = response.json()
             
             # Update metadata
-            self.results["metadata"]["total_queries"] += 1
+            with self._lock:
+                self.results["metadata"]["total_queries"] += 1
             
             # Check if there are search results
             if 'items' in data:
-                result_count = len(data['items'])
-                logger.info(f"Found {result_count} results")
-                self.results["metadata"]["total_results"] += result_count
-                
-                # Process and store the results
-                for item in data['items']:
-                    processed_item = self._process_search_item(item)
-                    self.results["search_results"].append(processed_item)
-                
                 return data
             else:
                 logger.warning(f"No results found for '{query}'")
                 return {"items": []}
                 
+        except (QuotaExhausted, BudgetExceeded) as e:
+            logger.error(f"{e}. Stopping further requests.")
+            return {"error": str(e)}
         except requests.exceptions.RequestException as e:
             logger.error(f"API request error: {e}")
             return {"error": str(e)}
     
+    def _store_search_data(self, data):
+        """Process and store the items of a search response"""
+        if not data.get('items'):
+            return
+        
+        result_count = len(data['items'])
+        metrics.inc("scraper_items_total", result_count, provider="google_cse")
+        logger.info(f"Found {result_count} results")
+        self.results["metadata"]["total_results"] += result_count
+        
+        # Process and store the results
+        for item in data['items']:
+            with metrics.stage("process_item", "google_cse"):
+                processed_item = self._process_search_item(item)
+            self.results["search_results"].append(processed_item)
+    
     def _process_search_item(self, item):
         """Process a single search result item"""
-        processed = {
-            "title": item.get("title", ""),
-            "link": item.get("link", ""),
-            "snippet": item.get("snippet", ""),
-            "htmlSnippet": item.get("htmlSnippet", ""),
-            "displayLink": item.get("displayLink", ""),
-            "formattedUrl": item.get("formattedUrl", "")
-        }
+        processed = SearchItem(
+            title=item.get("title", ""),
+            link=item.get("link", ""),
+            snippet=item.get("snippet", ""),
+            htmlSnippet=item.get("htmlSnippet", ""),
+            displayLink=item.get("displayLink", ""),
+            formattedUrl=item.get("formattedUrl", "")
+        )
         
         # Add image information if available
         if "pagemap" in item and "cse_image" in item["pagemap"]:
-            processed["image"] = item["pagemap"]["cse_image"][0].get("src", "")
+            processed.image = item["pagemap"]["cse_image"][0].get("src", "")
         
         # Add additional metadata if available
         if "pagemap" in item and "metatags" in item["pagemap"] and item["pagemap"]["metatags"]:
             metatags = item["pagemap"]["metatags"][0]
-            processed["metadata"] = {
-                "description": metatags.get("og:description", metatags.get("description", "")),
-                "type": metatags.get("og:type", ""),
-                "site_name": metatags.get("og:site_name", "")
-            }
+            processed.metadata = PageMeta(
+                description=metatags.get("og:description", metatags.get("description", "")),
+                type=metatags.get("og:type", ""),
+                site_name=metatags.get("og:site_name", "")
+            )
         
         return processed
     
-    def search_multiple_pages(self, query, total_results=30, search_type=None):
+    def search_multiple_pages(self, query, total_results=30, search_type=None, max_parallel=4):
         """
         Search multiple pages to get more than 10 results
         
+        Pages are requested speculatively in parallel (within the rate limiter's
+        budget); once a page comes back empty or without a next page, later
+        pages that haven't started are cancelled. Results are merged by start index.
+        
         Args:
             query (str): The search query
             total_results (int, optional): Total number of results to fetch
             search_type (str, optional): Type of search ('image' for image search)
+            max_parallel (int, optional): Pages in flight at once (1 = sequential)
             
         Returns:
             list: Combined search results
         """
-        all_results = []
         results_per_page = 10
         pages_needed = min(10, (total_results + results_per_page - 1) // results_per_page)  # API limit is 10 pages (100 results)
+        start_indexes = [page * results_per_page + 1 for page in range(pages_needed)]
         
-        for page in range(pages_needed):
-            start_index = page * results_per_page + 1
-            
-            logger.info(f"Fetching page {page+1} of {pages_needed}")
-            
-            # Make the search request
-            response = self.search(
+        logger.info(f"Fetching {pages_needed} pages for '{query}' ({max_parallel} in parallel)")
+        
+        def fetch_page(start_index):
+            return self._request_search(
                 query=query,
                 num_results=results_per_page,
                 start_index=start_index,
                 search_type=search_type
             )
-            
+        
+        def is_last_page(response):
+            # Errors, empty pages and pages without a "nextPage" end the sweep
+            return not response.get('items') or 'nextPage' not in response.get('queries', {})
+        
+        all_results = []
+        for start_index, response in fetch_pages(fetch_page, start_indexes, is_last_page, max_parallel, self.rate_limiter):
             # Check if there was an error
             if 'error' in response:
                 logger.error(f"Error in search request: {response.get('error')}")
                 break
             
-            # Check if there are results
-            if 'items' in response:
-                all_results.extend(response['items'])
-            else:
-                # No more results
-                break
-            
-            # Respect API rate limits
-            if page < pages_needed - 1:
-                logger.info("Waiting 1 second before next request...")
-                time.sleep(1)
+            # Store in page order so results stay deterministic
+            self._store_search_data(response)
+            all_results.extend(response.get('items', []))
         
         logger.info(f"Total results fetched: {len(all_results)}")
         return all_results
     
     def save_results(self, filename="google_search_results.json"):
         """Save search results to a JSON file"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(self.results, f, indent=2, ensure_ascii=False)
+        with metrics.stage("save", "google_cse"), open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.results, f, indent=2, ensure_ascii=False, default=to_json)
         
         logger.info(f"Results saved to {filename}")
         return filename
@@ -233,7 +280,7 @@ class GoogleSearchScraper:
         
         try:
             # Make the API request
-            response = requests.get(self.api_endpoint, params=params)
+            response = self.session.get(self.api_endpoint, params=params)
             
             # Print full response for debugging
             logger.info(f"Response status code: {response.status_code}")
@@ -305,6 +352,8 @@ def main():
         with open("search_summary.json", 'w', encoding='utf-8') as f:
             json.dump(summary, f, indent=2, ensure_ascii=False)
         
+        log_connection_stats(logger)
+        logger.info(f"Throttling: {scraper.limiter.get_stats()}")
         logger.info("Search completed successfully!")
         
     except Exception as e:
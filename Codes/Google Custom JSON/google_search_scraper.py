@@ -2,16 +2,25 @@ import requests
 import json
 import time
 import logging
+import threading
 import os
 from dotenv import load_dotenv
-from urllib.parse import urlparse
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.transport import get_session, log_connection_stats
+from common.rate_limit import TokenBucket, QuotaExhausted, get_limiter
+from common.pagination import fetch_pages
+from common.quota_ledger import BudgetExceeded, get_ledger
+from common.metrics import metrics
+from common.search_records import SearchItem, PageMeta, to_json
+from common.url_classifier import classify_url
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class GoogleSearchScraper:
-    def __init__(self, max_queries=50):
+    def __init__(self, max_queries=50, requests_per_second=4):
         # Load environment variables
         load_dotenv()
         
@@ -28,6 +37,21 @@ class GoogleSearchScraper:
         # API endpoint
         self.api_endpoint = "https://www.googleapis.com/customsearch/v1"
         
+        # Shared keep-alive HTTP session
+        self.session = get_session()
+        
+        # Request budget for parallel page fetches
+        self.rate_limiter = TokenBucket(rate=requests_per_second)
+        
+        # Per-provider AIMD concurrency limit; retries 429/5xx with backoff, honoring Retry-After
+        self.limiter = get_limiter("google_cse")
+        
+        # Daily/monthly budget shared with every other process using this API key
+        self.ledger = get_ledger()
+        
+        # Guards counters shared by parallel page fetches
+        self._lock = threading.Lock()
+        
         # Target website
         self.target_site = "mykitsch.com"
         
@@ -79,9 +103,22 @@ class GoogleSearchScraper:
         Returns:
             dict: Search results
         """
-        # Check if we've reached the query limit
-        if not self.check_quota():
-            return {"quota_exceeded": True}
+        data = self._request_search(query, num_results, start_index, search_type)
+        self._store_search_data(data)
+        return data
+    
+    def _request_search(self, query, num_results=10, start_index=1, search_type=None):
+        """Make one API request without touching stored results (safe to call from worker threads)"""
+        # Quota check and counter increment happen atomically so parallel
+        # page fetches can never exceed max_queries
+        with self._lock:
+            # Check if we've reached the query limit
+            if not self.check_quota():
+                return {"quota_exceeded": True}
+            
+            # Increment query counter
+            self.query_count += 1
+            query_number = self.query_count
         
         # Prepare parameters
         params = {
@@ -96,14 +133,16 @@ class GoogleSearchScraper:
         if search_type:
             params['searchType'] = search_type
         
-        logger.info(f"Searching for: '{query}' (start: {start_index}, num: {num_results}) [Query {self.query_count + 1}/{self.max_queries}]")
+        logger.info(f"Searching for: '{query}' (start: {start_index}, num: {num_results}) [Query {query_number}/{self.max_queries}]")
         
         try:
-            # Increment query counter
-            self.query_count += 1
-            
             # Make the API request
-            response = requests.get(self.api_endpoint, params=params)
+            # Each attempt, retries included, is reserved against the shared budget; refunded unless the provider answered
+            send = self.ledger.metered("google_cse", lambda: self.session.get(self.api_endpoint, params=params))
+            with metrics.stage("request", "google_cse"):
+                response = self.limiter.call(send)
+            
+            metrics.inc("scraper_requests_total", provider="google_cse", status=response.status_code)
             
             # Check for API errors
             if response.status_code != 200:
@@ -114,72 +153,84 @@ class GoogleSearchScraper:
                 if 'error' in error_info:
                     logger.error(f"Error details: {error_info['error'].get('message', 'No message')}")
                 
-                # Check for quota exceeded error
+                # Still throttled after every retry: skip this request, keep the run going
                 if response.status_code == 429:
-                    logger.error("API quota exceeded. Stopping further requests.")
-                    self.results["metadata"]["quota_limited"] = True
-                    return {"quota_exceeded": True}
+                    logger.error("Still rate limited after retries; skipping this request.")
                 
                 return {"error": error_info}
             
             # Parse the response
-            data = response.json()
+            with metrics.stage("decode", "google_cse"):
+                data = response.json()
             
             # Update metadata
-            self.results["metadata"]["total_queries"] += 1
+            with self._lock:
+                self.results["metadata"]["total_queries"] += 1
             
             # Check if there are search results
             if 'items' in data:
-                result_count = len(data['items'])
-                logger.info(f"Found {result_count} results")
-                self.results["metadata"]["total_results"] += result_count
-                
-                # Process and store the results
-                for item in data['items']:
-                    processed_item = self._process_search_item(item)
-                    
-                    # Only add if it's from the target site
-                    if self.target_site in processed_item.get("displayLink", ""):
-                        self.results["search_results"].append(processed_item)
-                        
-                        # Categorize the result
-                        self._categorize_result(processed_item)
-                
                 return data
             else:
                 logger.warning(f"No results found for '{query}'")
                 return {"items": []}
                 
+        except (QuotaExhausted, BudgetExceeded) as e:
+            logger.error(f"{e}. Stopping further requests.")
+            self.results["metadata"]["quota_limited"] = True
+            return {"quota_exceeded": True}
         except requests.exceptions.RequestException as e:
             logger.error(f"API request error: {e}")
             return {"error": str(e)}
     
+    def _store_search_data(self, data):
+        """Process and store the items of a search response"""
+        if not data.get('items'):
+            return
+        
+        result_count = len(data['items'])
+        metrics.inc("scraper_items_total", result_count, provider="google_cse")
+        logger.info(f"Found {result_count} results")
+        self.results["metadata"]["total_results"] += result_count
+        
+        # Process and store the results
+        for item in data['items']:
+            with metrics.stage("process_item", "google_cse"):
+                processed_item = self._process_search_item(item)
+            
+            # Only add if it's from the target site
+            if self.target_site in processed_item.get("displayLink", ""):
+                self.results["search_results"].append(processed_item)
+                
+                # Categorize the result
+                with metrics.stage("categorize", "google_cse"):
+                    self._categorize_result(processed_item)
+    
     def _process_search_item(self, item):
         """Process a single search result item"""
-        processed = {
-            "title": item.get("title", ""),
-            "link": item.get("link", ""),
-            "snippet": item.get("snippet", ""),
-            "displayLink": item.get("displayLink", ""),
-            "formattedUrl": item.get("formattedUrl", "")
-        }
+        processed = SearchItem(
+            title=item.get("title", ""),
+            link=item.get("link", ""),
+            snippet=item.get("snippet", ""),
+            displayLink=item.get("displayLink", ""),
+            formattedUrl=item.get("formattedUrl", "")
+        )
         
         # Add image information if available
         if "pagemap" in item and "cse_image" in item["pagemap"]:
-            processed["image"] = item["pagemap"]["cse_image"][0].get("src", "")
+            processed.image = item["pagemap"]["cse_image"][0].get("src", "")
         
         # Add additional metadata if available
         if "pagemap" in item and "metatags" in item["pagemap"] and item["pagemap"]["metatags"]:
             metatags = item["pagemap"]["metatags"][0]
-            processed["metadata"] = {
-                "description": metatags.get("og:description", metatags.get("description", "")),
-                "type": metatags.get("og:type", ""),
-                "site_name": metatags.get("og:site_name", ""),
-                "price": metatags.get("og:price:amount", ""),
-                "currency": metatags.get("og:price:currency", ""),
-                "availability": metatags.get("og:availability", ""),
-                "image": metatags.get("og:image", "")
-            }
+            processed.metadata = PageMeta(
+                description=metatags.get("og:description", metatags.get("description", "")),
+                type=metatags.get("og:type", ""),
+                site_name=metatags.get("og:site_name", ""),
+                price=metatags.get("og:price:amount", ""),
+                currency=metatags.get("og:price:currency", ""),
+                availability=metatags.get("og:availability", ""),
+                image=metatags.get("og:image", "")
+            )
         
         return processed
     
@@ -193,133 +244,127 @@ class GoogleSearchScraper:
         
         self.processed_urls.add(url)
         
-        # Extract path from URL
-        parsed_url = urlparse(url)
-        path = parsed_url.path.strip('/')
-        
-        # Categorize based on URL pattern
-        if path.startswith('collections'):
-            # It's a collection
-            parts = path.split('/')
-            if len(parts) >= 2:
-                collection_name = parts[1]
-                if collection_name not in self.discovered_collections:
-                    self.discovered_collections.add(collection_name)
-                    
-                    # Store in collections
-                    if collection_name not in self.results["collections"]:
-                        self.results["collections"][collection_name] = {
-                            "name": collection_name,
-                            "url": url,
-                            "title": result.get("title", ""),
-                            "description": result.get("snippet", ""),
-                            "products": []
-                        }
-                    
-                    # If it's a product within a collection
-                    if len(parts) >= 4 and parts[2] == "products":
-                        product_name = parts[3]
-                        if product_name not in self.discovered_products:
-                            self.discovered_products.add(product_name)
-                            self.results["collections"][collection_name]["products"].append({
-                                "name": product_name,
-                                "url": url,
-                                "title": result.get("title", "")
-                            })
-        
-        elif path.startswith('products'):
+        # Match the URL against the site's route table
+        classified = classify_url(url)
+        kind = classified.kind
+        
+        if kind in ("collection", "product") and classified.collection:
+            # It's a collection, or a product within a collection
+            collection_name = classified.collection
+            self.discovered_collections.add(collection_name)
+            
+            # Store in collections
+            if collection_name not in self.results["collections"]:
+                self.results["collections"][collection_name] = {
+                    "name": collection_name,
+                    "url": url,
+                    "title": result.get("title", ""),
+                    "description": result.get("snippet", ""),
+                    "products": []
+                }
+            
+            # If it's a product within a collection
+            if kind == "product" and classified.name not in self.discovered_products:
+                product_name = classified.name
+                self.discovered_products.add(product_name)
+                self.results["collections"][collection_name]["products"].append({
+                    "name": product_name,
+                    "url": url,
+                    "title": result.get("title", "")
+                })
+        
+        elif kind == "product":
             # It's a product
-            parts = path.split('/')
-            if len(parts) >= 2:
-                product_name = parts[1]
-                if product_name not in self.discovered_products:
-                    self.discovered_products.add(product_name)
-                    self.results["products"][product_name] = {
-                        "name": product_name,
-                        "url": url,
-                        "title": result.get("title", ""),
-                        "description": result.get("snippet", ""),
-                        "image": result.get("image", "")
-                    }
-                    
-                    # Add metadata if available
-                    if "metadata" in result:
-                        self.results["products"][product_name].update({
-                            "price": result["metadata"].get("price", ""),
-                            "currency": result["metadata"].get("currency", ""),
-                            "availability": result["metadata"].get("availability", "")
-                        })
-        
-        elif path.startswith('pages'):
+            product_name = classified.name
+            if product_name not in self.discovered_products:
+                self.discovered_products.add(product_name)
+                self.results["products"][product_name] = {
+                    "name": product_name,
+                    "url": url,
+                    "title": result.get("title", ""),
+                    "description": result.get("snippet", ""),
+                    "image": result.get("image", "")
+                }
+                
+                # Add metadata if available
+                if "metadata" in result:
+                    self.results["products"][product_name].update({
+                        "price": result["metadata"].get("price", ""),
+                        "currency": result["metadata"].get("currency", ""),
+                        "availability": result["metadata"].get("availability", "")
+                    })
+        
+        elif kind == "page":
             # It's a page
-            parts = path.split('/')
-            if len(parts) >= 2:
-                page_name = parts[1]
-                if page_name not in self.results["pages"]:
-                    self.results["pages"][page_name] = {
-                        "name": page_name,
-                        "url": url,
-                        "title": result.get("title", ""),
-                        "description": result.get("snippet", "")
-                    }
-        
-        elif path and path not in self.results["categories"]:
+            page_name = classified.name
+            if page_name not in self.results["pages"]:
+                self.results["pages"][page_name] = {
+                    "name": page_name,
+                    "url": url,
+                    "title": result.get("title", ""),
+                    "description": result.get("snippet", "")
+                }
+        
+        elif kind in ("home", "search", "listing"):
+            # The homepage, a search page or the list of all collections / products / pages
+            pass
+        
+        elif classified.path not in self.results["categories"]:
             # It might be a category or other page
-            self.results["categories"][path] = {
-                "name": path,
+            self.results["categories"][classified.path] = {
+                "name": classified.path,
                 "url": url,
                 "title": result.get("title", ""),
                 "description": result.get("snippet", "")
             }
     
-    def search_multiple_pages(self, query, total_results=30, search_type=None):
+    def search_multiple_pages(self, query, total_results=30, search_type=None, max_parallel=4):
         """
         Search multiple pages to get more than 10 results
         
+        Pages are requested speculatively in parallel (within the rate limiter's
+        budget); once a page comes back empty or without a next page, later
+        pages that haven't started are cancelled. Results are merged by start index.
+        
         Args:
             query (str): The search query
             total_results (int, optional): Total number of results to fetch
             search_type (str, optional): Type of search ('image' for image search)
+            max_parallel (int, optional): Pages in flight at once (1 = sequential)
             
         Returns:
             list: Combined search results
         """
-        all_results = []
         results_per_page = 10
         pages_needed = min(10, (total_results + results_per_page - 1) // results_per_page)  # API limit is 10 pages (100 results)
+        start_indexes = [page * results_per_page + 1 for page in range(pages_needed)]
         
-        for page in range(pages_needed):
-            # Check if we've reached the query limit
-            if not self.check_quota():
-                break
-                
-            start_index = page * results_per_page + 1
-            
-            logger.info(f"Fetching page {page+1} of {pages_needed}")
-            
-            # Make the search request
-            response = self.search(
+        logger.info(f"Fetching {pages_needed} pages for '{query}' ({max_parallel} in parallel)")
+        
+        def fetch_page(start_index):
+            return self._request_search(
                 query=query,
                 num_results=results_per_page,
                 start_index=start_index,
                 search_type=search_type
             )
-            
-            # Check if there was an error or quota exceeded
-            if 'error' in response or 'quota_exceeded' in response:
+        
+        def is_last_page(response):
+            # Errors, quota exhaustion, empty pages and pages without a "nextPage" end the sweep
+            return not response.get('items') or 'nextPage' not in response.get('queries', {})
+        
+        all_results = []
+        for start_index, response in fetch_pages(fetch_page, start_indexes, is_last_page, max_parallel, self.rate_limiter):
+            # Check if there was an error
+            if 'error' in response:
+                logger.error(f"Error in search request: {response.get('error')}")
                 break
-            
-            # Check if there are results
-            if 'items' in response:
-                all_results.extend(response['items'])
-            else:
-                # No more results
+            if 'quota_exceeded' in response:
                 break
             
-            # Respect API rate limits
-            if page < pages_needed - 1:
-                logger.info("Waiting 1 second before next request...")
-                time.sleep(1)
+            # Store in page order so results stay deterministic
+            self._store_search_data(response)
+            all_results.extend(response.get('items', []))
         
         logger.info(f"Total results fetched: {len(all_results)}")
         return all_results
@@ -377,8 +422,8 @@ class GoogleSearchScraper:
         self.results["metadata"]["queries_used"] = self.query_count
         self.results["metadata"]["queries_limit"] = self.max_queries
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(self.results, f, indent=2, ensure_ascii=False)
+        with metrics.stage("save", "google_cse"), open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.results, f, indent=2, ensure_ascii=False, default=to_json)
         
         logger.info(f"Results saved to {filename}")
         return filename
@@ -416,7 +461,7 @@ class GoogleSearchScraper:
         
         try:
             # Make the API request
-            response = requests.get(self.api_endpoint, params=params)
+            response = self.session.get(self.api_endpoint, params=params)
             
             # Print full response for debugging
             logger.info(f"Response status code: {response.status_code}")
@@ -475,6 +520,8 @@ def main():
         with open("kitsch_search_summary2.json", 'w', encoding='utf-8') as f:
             json.dump(summary, f, indent=2, ensure_ascii=False)
         
+        log_connection_stats(logger)
+        logger.info(f"Throttling: {scraper.limiter.get_stats()}")
         logger.info("Search completed successfully!")
         
     except Exception as e:
@@ -2,18 +2,34 @@ import requests
 import json
 import time
 import logging
+import threading
 import os
 from dotenv import load_dotenv
-from urllib.parse import quote_plus, urlparse, parse_qs
+from urllib.parse import quote_plus, parse_qs
 import re
 from collections import defaultdict
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.transport import get_session, log_connection_stats
+from common.rate_limit import TokenBucket, QuotaExhausted, get_limiter
+from common.pagination import fetch_pages
+from common.quota_ledger import BudgetExceeded, get_ledger
+from common.metrics import metrics
+from common.search_records import SearchItem, PageMeta, ProductInfo, StructuredProduct, StructuredOffer, to_json
+from common.crawl_planner import CrawlPlanner, PlannedQuery
+from common.url_index import UrlIndex, DEFAULT_REFRESH_DAYS
+from common.url_classifier import classify_url
+from common.columnar_export import export_site_results
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Also write the run as partitioned Parquet tables under this directory (needs pyarrow); None = JSON only
+COLUMNAR_ROOT = None
+
 class GoogleSearchScraper:
-    def __init__(self):
+    def __init__(self, requests_per_second=4, skip_fresh=False):
         # Load environment variables
         load_dotenv()
         
@@ -30,6 +46,30 @@ class GoogleSearchScraper:
         # API endpoint
         self.api_endpoint = "https://www.googleapis.com/customsearch/v1"
         
+        # Shared keep-alive HTTP session
+        self.session = get_session()
+        
+        # Request budget for parallel page fetches
+        self.rate_limiter = TokenBucket(rate=requests_per_second)
+        
+        # Per-provider AIMD concurrency limit; retries 429/5xx with backoff, honoring Retry-After
+        self.limiter = get_limiter("google_cse")
+        
+        # Daily/monthly budget shared with every other process using this API key
+        self.ledger = get_ledger()
+        
+        # Guards counters shared by parallel page fetches
+        self._lock = threading.Lock()
+        
+        # URLs and query runs persisted across runs (first-seen / last-seen)
+        self.url_index = UrlIndex()
+        
+        # Skips discovery queries predicted to return only already-seen URLs. With
+        # skip_fresh (opt-in) it also skips queries an earlier run executed less than
+        # DEFAULT_REFRESH_DAYS ago; their results are not reloaded into the saved JSON
+        refresh_after = DEFAULT_REFRESH_DAYS * 86400 if skip_fresh else None
+        self.planner = CrawlPlanner(history=self.url_index, refresh_after=refresh_after)
+        
         # Target website
         self.target_site = "mykitsch.com"
         
@@ -68,6 +108,12 @@ class GoogleSearchScraper:
         Returns:
             dict: Search results
         """
+        data = self._request_search(query, num_results, start_index, search_type)
+        self._store_search_data(data)
+        return data
+    
+    def _request_search(self, query, num_results=10, start_index=1, search_type=None):
+        """Make one API request without touching stored results (safe to call from worker threads)"""
         # Prepare parameters
         params = {
             'key': self.api_key,
@@ -85,7 +131,12 @@ class GoogleSearchScraper:
         
         try:
             # Make the API request
-            response = requests.get(self.api_endpoint, params=params)
+            # Each attempt, retries included, is reserved against the shared budget; refunded unless the provider answered
+            send = self.ledger.metered("google_cse", lambda: self.session.get(self.api_endpoint, params=params))
+            with metrics.stage("request", "google_cse"):
+                response = self.limiter.call(send)
+            
+            metrics.inc("scraper_requests_total", provider="google_cse", status=response.status_code)
             
             # Check for API errors
             if response.status_code != 200:
@@ -99,96 +150,109 @@ class GoogleSearchScraper:
                 return {"error": error_info}
             
             # Parse the response
-            data = response.json()
+            with metrics.stage("decode", "google_cse"):
+                data = response.json()
             
             # Update metadata
-            self.results["metadata"]["total_queries"] += 1
+            with self._lock:
+                self.results["metadata"]["total_queries"] += 1
             
             # Check if there are search results
             if 'items' in data:
-                result_count = len(data['items'])
-                logger.info(f"Found {result_count} results")
-                self.results["metadata"]["total_results"] += result_count
-                
-                # Process and store the results
-                for item in data['items']:
-                    processed_item = self._process_search_item(item)
-                    
-                    # Only add if it's from the target site
-                    if self.target_site in processed_item.get("displayLink", ""):
-                        self.results["search_results"].append(processed_item)
-                        
-                        # Categorize the result
-                        self._categorize_result(processed_item)
-                
                 return data
             else:
                 logger.warning(f"No results found for '{query}'")
                 return {"items": []}
                 
+        except (QuotaExhausted, BudgetExceeded) as e:
+            logger.error(f"{e}. Stopping further requests.")
+            return {"error": str(e)}
         except requests.exceptions.RequestException as e:
             logger.error(f"API request error: {e}")
             return {"error": str(e)}
     
+    def _store_search_data(self, data):
+        """Process and store the items of a search response"""
+        if not data.get('items'):
+            return
+        
+        result_count = len(data['items'])
+        metrics.inc("scraper_items_total", result_count, provider="google_cse")
+        logger.info(f"Found {result_count} results")
+        self.results["metadata"]["total_results"] += result_count
+        
+        # Process and store the results
+        for item in data['items']:
+            with metrics.stage("process_item", "google_cse"):
+                processed_item = self._process_search_item(item)
+            
+            # Only add if it's from the target site
+            if self.target_site in processed_item.get("displayLink", ""):
+                self.results["search_results"].append(processed_item)
+                
+                # Categorize the result
+                with metrics.stage("categorize", "google_cse"):
+                    self._categorize_result(processed_item)
+    
     def _process_search_item(self, item):
         """Process a single search result item"""
-        processed = {
-            "title": item.get("title", ""),
-            "link": item.get("link", ""),
-            "snippet": item.get("snippet", ""),
-            "htmlSnippet": item.get("htmlSnippet", ""),
-            "displayLink": item.get("displayLink", ""),
-            "formattedUrl": item.get("formattedUrl", "")
-        }
+        processed = SearchItem(
+            title=item.get("title", ""),
+            link=item.get("link", ""),
+            snippet=item.get("snippet", ""),
+            htmlSnippet=item.get("htmlSnippet", ""),
+            displayLink=item.get("displayLink", ""),
+            formattedUrl=item.get("formattedUrl", "")
+        )
         
         # Add image information if available
         if "pagemap" in item and "cse_image" in item["pagemap"]:
-            processed["image"] = item["pagemap"]["cse_image"][0].get("src", "")
+            processed.image = item["pagemap"]["cse_image"][0].get("src", "")
         
         # Add additional metadata if available
         if "pagemap" in item and "metatags" in item["pagemap"] and item["pagemap"]["metatags"]:
             metatags = item["pagemap"]["metatags"][0]
-            processed["metadata"] = {
-                "description": metatags.get("og:description", metatags.get("description", "")),
-                "type": metatags.get("og:type", ""),
-                "site_name": metatags.get("og:site_name", ""),
-                "price": metatags.get("og:price:amount", ""),
-                "currency": metatags.get("og:price:currency", ""),
-                "availability": metatags.get("og:availability", ""),
-                "image": metatags.get("og:image", "")
-            }
+            processed.metadata = PageMeta(
+                description=metatags.get("og:description", metatags.get("description", "")),
+                type=metatags.get("og:type", ""),
+                site_name=metatags.get("og:site_name", ""),
+                price=metatags.get("og:price:amount", ""),
+                currency=metatags.get("og:price:currency", ""),
+                availability=metatags.get("og:availability", ""),
+                image=metatags.get("og:image", "")
+            )
             
             # Extract product information if available
             if "product" in metatags.get("og:type", "").lower():
-                processed["product_info"] = {
-                    "name": metatags.get("og:title", processed["title"]),
-                    "price": metatags.get("og:price:amount", ""),
-                    "currency": metatags.get("og:price:currency", ""),
-                    "availability": metatags.get("og:availability", ""),
-                    "image": metatags.get("og:image", ""),
-                    "brand": metatags.get("og:brand", "Kitsch")
-                }
+                processed.product_info = ProductInfo(
+                    name=metatags.get("og:title", processed.title),
+                    price=metatags.get("og:price:amount", ""),
+                    currency=metatags.get("og:price:currency", ""),
+                    availability=metatags.get("og:availability", ""),
+                    image=metatags.get("og:image", ""),
+                    brand=metatags.get("og:brand", "Kitsch")
+                )
         
         # Extract structured data if available
         if "pagemap" in item:
             if "product" in item["pagemap"]:
                 product_data = item["pagemap"]["product"][0]
-                processed["structured_product"] = {
-                    "name": product_data.get("name", ""),
-                    "description": product_data.get("description", ""),
-                    "price": product_data.get("price", ""),
-                    "availability": product_data.get("availability", ""),
-                    "sku": product_data.get("sku", ""),
-                    "brand": product_data.get("brand", "")
-                }
+                processed.structured_product = StructuredProduct(
+                    name=product_data.get("name", ""),
+                    description=product_data.get("description", ""),
+                    price=product_data.get("price", ""),
+                    availability=product_data.get("availability", ""),
+                    sku=product_data.get("sku", ""),
+                    brand=product_data.get("brand", "")
+                )
             
             if "offer" in item["pagemap"]:
                 offer_data = item["pagemap"]["offer"][0]
-                processed["structured_offer"] = {
-                    "price": offer_data.get("price", ""),
-                    "currency": offer_data.get("pricecurrency", ""),
-                    "availability": offer_data.get("availability", "")
-                }
+                processed.structured_offer = StructuredOffer(
+                    price=offer_data.get("price", ""),
+                    currency=offer_data.get("pricecurrency", ""),
+                    availability=offer_data.get("availability", "")
+                )
         
         return processed
     
@@ -202,79 +266,73 @@ class GoogleSearchScraper:
         
         self.processed_urls.add(url)
         
-        # Extract path from URL
-        parsed_url = urlparse(url)
-        path = parsed_url.path.strip('/')
-        
-        # Categorize based on URL pattern
-        if path.startswith('collections'):
-            # It's a collection
-            parts = path.split('/')
-            if len(parts) >= 2:
-                collection_name = parts[1]
-                if collection_name not in self.discovered_collections:
-                    self.discovered_collections.add(collection_name)
-                    
-                    # Store in collections
-                    if collection_name not in self.results["collections"]:
-                        self.results["collections"][collection_name] = {
-                            "name": collection_name,
-                            "url": url,
-                            "title": result.get("title", ""),
-                            "description": result.get("snippet", ""),
-                            "products": []
-                        }
-                    
-                    # If it's a product within a collection
-                    if len(parts) >= 4 and parts[2] == "products":
-                        product_name = parts[3]
-                        if product_name not in self.discovered_products:
-                            self.discovered_products.add(product_name)
-                            self.results["collections"][collection_name]["products"].append({
-                                "name": product_name,
-                                "url": url,
-                                "title": result.get("title", "")
-                            })
-                            
-                            # Also add to products
-                            if product_name not in self.results["products"]:
-                                self._add_product(result, product_name, collection_name)
-        
-        elif path.startswith('products'):
+        # Persist first-seen / last-seen so later runs know which sections are stale
+        if url:
+            self.url_index.upsert(url, result.get("title", ""), result.get("snippet", ""))
+        
+        # Match the URL against the site's route table
+        classified = classify_url(url)
+        kind = classified.kind
+        
+        if kind in ("collection", "product") and classified.collection:
+            # It's a collection, or a product within a collection
+            collection_name = classified.collection
+            self.discovered_collections.add(collection_name)
+            
+            # Store in collections
+            if collection_name not in self.results["collections"]:
+                self.results["collections"][collection_name] = {
+                    "name": collection_name,
+                    "url": url,
+                    "title": result.get("title", ""),
+                    "description": result.get("snippet", ""),
+                    "products": []
+                }
+            
+            # If it's a product within a collection
+            if kind == "product" and classified.name not in self.discovered_products:
+                product_name = classified.name
+                self.discovered_products.add(product_name)
+                self.results["collections"][collection_name]["products"].append({
+                    "name": product_name,
+                    "url": url,
+                    "title": result.get("title", "")
+                })
+                
+                # Also add to products
+                if product_name not in self.results["products"]:
+                    self._add_product(result, product_name, collection_name)
+        
+        elif kind == "product":
             # It's a product
-            parts = path.split('/')
-            if len(parts) >= 2:
-                product_name = parts[1]
-                if product_name not in self.discovered_products:
-                    self.discovered_products.add(product_name)
-                    self._add_product(result, product_name)
-        
-        elif path.startswith('pages'):
-            # It's a page
-            parts = path.split('/')
-            if len(parts) >= 2:
-                page_name = parts[1]
-                if page_name not in self.results["pages"]:
-                    self.results["pages"][page_name] = {
-                        "name": page_name,
-                        "url": url,
-                        "title": result.get("title", ""),
-                        "description": result.get("snippet", "")
-                    }
-        
-        elif path == "" or path.startswith('search'):
-            # It's the homepage or search page
-            pass
+            product_name = classified.name
+            if product_name not in self.discovered_products:
+                self.discovered_products.add(product_name)
+                self._add_product(result, product_name)
         
-        else:
-            # It might be a category or other page
-            if path not in self.results["categories"] and path:
-                self.results["categories"][path] = {
-                    "name": path,
+        elif kind == "page":
+            # It's a page
+            page_name = classified.name
+            if page_name not in self.results["pages"]:
+                self.results["pages"][page_name] = {
+                    "name": page_name,
                     "url": url,
                     "title": result.get("title", ""),
                     "description": result.get("snippet", "")
                 }
+        
+        elif kind in ("home", "search", "listing"):
+            # The homepage, a search page or the list of all collections / products / pages
+            pass
+        
+        elif classified.path not in self.results["categories"]:
+            # It might be a category or other page
+            self.results["categories"][classified.path] = {
+                "name": classified.path,
+                "url": url,
+                "title": result.get("title", ""),
+                "description": result.get("snippet", "")
+            }
     
     def _add_product(self, result, product_name, collection_name=None):
         """Add a product to the results"""
@@ -322,70 +380,87 @@ class GoogleSearchScraper:
         # Store the product
         self.results["products"][product_name] = product_info
     
-    def search_multiple_pages(self, query, total_results=100, search_type=None):
+    def search_multiple_pages(self, query, total_results=100, search_type=None, max_parallel=4):
         """
         Search multiple pages to get more than 10 results
         
+        Pages are requested speculatively in parallel (within the rate limiter's
+        budget); once a page comes back empty or without a next page, later
+        pages that haven't started are cancelled. Results are merged by start index.
+        
         Args:
             query (str): The search query
             total_results (int, optional): Total number of results to fetch
             search_type (str, optional): Type of search ('image' for image search)
+            max_parallel (int, optional): Pages in flight at once (1 = sequential)
             
         Returns:
-            list: Combined search results
+            list: Combined search results, or None if a page request failed (the
+                  pages fetched before it are still stored)
         """
-        all_results = []
         results_per_page = 10
         pages_needed = min(10, (total_results + results_per_page - 1) // results_per_page)  # API limit is 10 pages (100 results)
+        start_indexes = [page * results_per_page + 1 for page in range(pages_needed)]
         
-        for page in range(pages_needed):
-            start_index = page * results_per_page + 1
-            
-            logger.info(f"Fetching page {page+1} of {pages_needed}")
-            
-            # Make the search request
-            response = self.search(
+        logger.info(f"Fetching {pages_needed} pages for '{query}' ({max_parallel} in parallel)")
+        
+        def fetch_page(start_index):
+            return self._request_search(
                 query=query,
                 num_results=results_per_page,
                 start_index=start_index,
                 search_type=search_type
             )
-            
+        
+        def is_last_page(response):
+            # Errors, empty pages and pages without a "nextPage" end the sweep
+            return not response.get('items') or 'nextPage' not in response.get('queries', {})
+        
+        all_results = []
+        for start_index, response in fetch_pages(fetch_page, start_indexes, is_last_page, max_parallel, self.rate_limiter):
             # Check if there was an error
             if 'error' in response:
                 logger.error(f"Error in search request: {response.get('error')}")
-                break
+                logger.info(f"Sweep of '{query}' failed after {len(all_results)} results")
+                return None
             
-            # Check if there are results
-            if 'items' in response:
-                all_results.extend(response['items'])
-            else:
-                # No more results
-                break
-            
-            # Respect API rate limits
-            if page < pages_needed - 1:
-                logger.info("Waiting 1 second before next request...")
-                time.sleep(1)
+            # Store in page order so results stay deterministic
+            self._store_search_data(response)
+            all_results.extend(response.get('items', []))
         
         logger.info(f"Total results fetched: {len(all_results)}")
         return all_results
     
+    def _run_planned(self, queries):
+        """Run discovery queries through the crawl planner, skipping ones predicted to find nothing new"""
+        def execute(planned):
+            if planned.pages > 1:
+                items = self.search_multiple_pages(planned.query, total_results=planned.results)
+                if items is None:
+                    return None
+            else:
+                # Respect API rate limits
+                self.rate_limiter.acquire()
+                response = self.search(planned.query)
+                if 'error' in response:
+                    return None
+                items = response.get('items', [])
+            return [item.get('link') for item in items]
+        
+        self.planner.run(queries, execute)
+    
     def discover_site_structure(self):
         """
         Discover the site structure by searching for key sections
         """
-        # First, search for the site: operator to get an overview
+        # First, search for the site: operator to get an overview,
+        # then the collections and products sections
         logger.info("Discovering site structure...")
-        self.search_multiple_pages(f"site:{self.target_site}", total_results=100)
-        
-        # Search for collections
-        logger.info("Discovering collections...")
-        self.search_multiple_pages(f"site:{self.target_site}/collections", total_results=100)
-        
-        # Search for products
-        logger.info("Discovering products...")
-        self.search_multiple_pages(f"site:{self.target_site}/products", total_results=100)
+        self._run_planned([
+            PlannedQuery(f"site:{self.target_site}", results=100),
+            PlannedQuery(f"site:{self.target_site}/collections", results=100),
+            PlannedQuery(f"site:{self.target_site}/products", results=100)
+        ])
         
         # Search for specific product categories
         product_categories = [
@@ -394,29 +469,22 @@ class GoogleSearchScraper:
             "travel", "gift", "sale", "new"
         ]
         
-        for category in product_categories:
-            logger.info(f"Searching for {category} products...")
-            self.search(f"site:{self.target_site} {category}")
-            time.sleep(1)  # Respect API rate limits
-            
-            # Also search in collections
-            self.search(f"site:{self.target_site}/collections {category}")
-            time.sleep(1)
-        
         # Search for specific product types
         product_types = [
             "scrunchie", "headband", "clip", "claw", "brush", "towel", 
             "pillow", "mask", "earring", "necklace", "bracelet", "ring"
         ]
         
+        # Site-wide, in collections, and in the products directory
+        logger.info("Searching product categories and types...")
+        queries = []
+        for category in product_categories:
+            queries.append(PlannedQuery(f"site:{self.target_site} {category}"))
+            queries.append(PlannedQuery(f"site:{self.target_site}/collections {category}"))
         for product_type in product_types:
-            logger.info(f"Searching for {product_type} products...")
-            self.search(f"site:{self.target_site} {product_type}")
-            time.sleep(1)
-            
-            # Also search in products directory
-            self.search(f"site:{self.target_site}/products {product_type}")
-            time.sleep(1)
+            queries.append(PlannedQuery(f"site:{self.target_site} {product_type}"))
+            queries.append(PlannedQuery(f"site:{self.target_site}/products {product_type}"))
+        self._run_planned(queries)
     
     def discover_collections(self):
         """
@@ -424,19 +492,18 @@ class GoogleSearchScraper:
         """
         logger.info("Discovering collections in depth...")
         
-        # First get all collections
-        self.search_multiple_pages(f"site:{self.target_site}/collections", total_results=100)
-        
-        # Then search for each discovered collection to get more details
-        collections_to_search = list(self.discovered_collections)
-        for collection in collections_to_search:
-            logger.info(f"Searching collection: {collection}")
-            self.search(f"site:{self.target_site}/collections/{collection}")
-            time.sleep(1)
-            
-            # Also search for products in this collection
-            self.search(f"site:{self.target_site}/collections/{collection}/products")
-            time.sleep(1)
+        # First get all collections (skipped if discover_site_structure already swept them)
+        self._run_planned([PlannedQuery(f"site:{self.target_site}/collections", results=100)])
+        
+        # Then search for each collection discovered now or in an earlier run to get
+        # more details, and for products in this collection (fresh ones are skipped)
+        known = {section.partition('/')[2] for section in self.url_index.sections(self.target_site)
+                 if section.startswith('collections/')}
+        queries = []
+        for collection in sorted(self.discovered_collections | known):
+            queries.append(PlannedQuery(f"site:{self.target_site}/collections/{collection}"))
+            queries.append(PlannedQuery(f"site:{self.target_site}/collections/{collection}/products"))
+        self._run_planned(queries)
     
     def discover_products(self):
         """
@@ -444,26 +511,31 @@ class GoogleSearchScraper:
         """
         logger.info("Discovering products in depth...")
         
-        # Search for all products
-        self.search_multiple_pages(f"site:{self.target_site}/products", total_results=100)
+        # Search for all products (skipped if discover_site_structure already swept them)
+        queries = [PlannedQuery(f"site:{self.target_site}/products", results=100)]
         
         # Search for specific product attributes
         attributes = ["color", "size", "material", "price", "sale", "new", "bestseller", "limited"]
-        
         for attribute in attributes:
-            logger.info(f"Searching for products with attribute: {attribute}")
-            self.search(f"site:{self.target_site} {attribute}")
-            time.sleep(1)
+            queries.append(PlannedQuery(f"site:{self.target_site} {attribute}"))
+        self._run_planned(queries)
     
-    def save_results(self, filename="kitsch_site_data.json"):
-        """Save search results to a JSON file"""
+    def save_results(self, filename="kitsch_site_data.json", columnar_root=None):
+        """Save search results to a JSON file, and optionally as Parquet tables under columnar_root"""
         # Convert sets to lists for JSON serialization
         self.results["metadata"]["discovered_collections"] = list(self.discovered_collections)
         self.results["metadata"]["discovered_products"] = list(self.discovered_products)
         self.results["metadata"]["processed_urls"] = list(self.processed_urls)
+        self.results["metadata"]["url_index"] = self.url_index.get_stats(self.target_site)
+        self.url_index.flush()
+        self.results["metadata"]["query_planner"] = self.planner.get_report()
+        
+        with metrics.stage("save", "google_cse"), open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.results, f, indent=2, ensure_ascii=False, default=to_json)
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(self.results, f, indent=2, ensure_ascii=False)
+        if columnar_root:
+            with metrics.stage("columnar_export", "google_cse"):
+                export_site_results(self.results, "google_cse", columnar_root)
         
         logger.info(f"Results saved to {filename}")
         return filename
@@ -477,7 +549,9 @@ class GoogleSearchScraper:
             "products_found": len(self.results["products"]),
             "categories_found": len(self.results["categories"]),
             "pages_found": len(self.results["pages"]),
-            "unique_urls": len(self.processed_urls)
+            "unique_urls": len(self.processed_urls),
+            "new_urls": self.url_index.new_urls,
+            "requests_saved_by_planner": self.planner.get_report()["requests_saved"]
         }
         
         return summary
@@ -499,7 +573,7 @@ class GoogleSearchScraper:
         
         try:
             # Make the API request
-            response = requests.get(self.api_endpoint, params=params)
+            response = self.session.get(self.api_endpoint, params=params)
             
             # Print full response for debugging
             logger.info(f"Response status code: {response.status_code}")
@@ -530,7 +604,7 @@ class GoogleSearchScraper:
 def main():
     try:
         # Initialize the scraper
-        scraper = GoogleSearchScraper()
+        scraper = GoogleSearchScraper(skip_fresh="--skip-fresh" in sys.argv)
         
         # Test the API connection first
         if not scraper.test_api_connection():
@@ -547,7 +621,7 @@ def main():
         scraper.discover_products()
         
         # Save the results
-        results_file = scraper.save_results("kitsch_comprehensive_data2.json")
+        results_file = scraper.save_results("kitsch_comprehensive_data2.json", columnar_root=COLUMNAR_ROOT)
         
         # Generate and display summary
         summary = scraper.get_results_summary()
@@ -558,12 +632,15 @@ def main():
         logger.info(f"Products found: {summary['products_found']}")
         logger.info(f"Categories found: {summary['categories_found']}")
         logger.info(f"Pages found: {summary['pages_found']}")
-        logger.info(f"Unique URLs: {summary['unique_urls']}")
+        logger.info(f"Unique URLs: {summary['unique_urls']} ({summary['new_urls']} never seen before)")
+        logger.info(f"API requests saved by query planner: {summary['requests_saved_by_planner']}")
         
         # Save summary
         with open("kitsch_search_summary2.json", 'w', encoding='utf-8') as f:
             json.dump(summary, f, indent=2, ensure_ascii=False)
         
+        log_connection_stats(logger)
+        logger.info(f"Throttling: {scraper.limiter.get_stats()}")
         logger.info("Search completed successfully!")
         
     except Exception as e:
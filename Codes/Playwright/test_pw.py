@@ -2,13 +2,21 @@ import os
 import random
 import asyncio
 import datetime
-import json
+import functools
 import logging
+import time
 
 from playwright.async_api import async_playwright
 from playwright_stealth import Stealth
 from twocaptcha import TwoCaptcha
 from dotenv import load_dotenv
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.result_store import open_result_sink, completed_queries
+from common.readiness import ReadinessDetector, PacingPolicy
+from common.resource_blocking import BandwidthStats, PageTraffic, install_playwright_blocking
+from common.metrics import metrics
+from common.serp_html import fetch_overview_http, overview_hyperlinks, FOUND, NOT_FOUND
 
 # --- Load environment (2captcha API key) ---
 load_dotenv()
@@ -23,7 +31,31 @@ BRIGHTDATA_PROXIES = [
     "brd-customer-hl_5b87c58d-zone-residential_proxy2:y44okq7d0wxs@brd.superproxy.io:33335"
 ]
 
-JSON_FILE = "ai_overview_results_playwright.json"
+# One browser per proxy; at most this many isolated contexts (pages) in flight per proxy
+CONTEXTS_PER_PROXY = 4
+
+# Wait for an overview / no-overview / CAPTCHA state in the DOM instead of networkidle + sleep
+readiness = ReadinessDetector(timeout=20)
+# Human-like dwell on a ready page, independent of readiness
+DWELL_PACING = PacingPolicy(0.5, 2)
+
+# Try a plain HTTP fetch + lxml parse through the query's proxy first; only open a page when it needs JS
+HTTP_FIRST = True
+
+# extract_ai_overview's attribute selectors, for the HTTP path; it accepts any match, whatever its size.
+# Its text-based selectors ("AI-powered overview") have no lxml twin: such pages go to the browser
+HTTP_SELECTORS = [
+    'div[data-md="311"]',
+    'div[data-attrid*="ai_overview"]',
+    'div[aria-label*="AI Overview"]',
+]
+
+# Drop images, fonts, media and trackers (see common.resource_blocking.PROFILES); Bright Data bills per GB
+BLOCKING_PROFILE = "lean"
+bandwidth = BandwidthStats()
+
+JSON_FILE = "ai_overview_results_playwright.jsonl"
+LEGACY_JSON_FILE = "ai_overview_results_playwright.json"
 LOGFILE = "ai_overview_scraper.log"
 
 logging.basicConfig(
@@ -32,8 +64,7 @@ logging.basicConfig(
     level=logging.INFO
 )
 
-def get_proxy():
-    s = random.choice(BRIGHTDATA_PROXIES)
+def parse_proxy(s):
     # Format: username:password@host:port
     creds, hostport = s.split("@")
     user, pwd = creds.split(":", 1)
@@ -44,6 +75,9 @@ def get_proxy():
         "password": pwd
     }
 
+def get_proxy():
+    return parse_proxy(random.choice(BRIGHTDATA_PROXIES))
+
 async def solve_recaptcha(page, query, proxy_dict):
     """
     Detect and solve reCAPTCHA with 2Captcha using the current proxy.
@@ -97,40 +131,30 @@ async def solve_recaptcha(page, query, proxy_dict):
         logging.error(f"2Captcha error ({str(e)}) for '{query}'")
         return False
 
-async def fetch_ai_overview(query):
-    proxy = get_proxy()
-    logging.info(f"Using proxy {proxy['server']} for '{query}'")
-    async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(
-            headless=False,   # For debug; if stable change to True for headless
-            proxy=proxy
-        )
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 12_3) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
-            viewport={"width": 1320, "height": 850},
-            extra_http_headers={"Accept-Language": "en-US,en;q=0.9"},
-            ignore_https_errors=True   # <--- This is crucial for Bright Data proxies!
-        )
-        page = await context.new_page()
-        # Stealth and browser humanization
-        stealth = Stealth()
-        await stealth.apply_stealth_async(page)
-        search_url = f"https://www.google.com/search?q={query.replace(' ', '+')}&hl=en"
+async def extract_ai_overview(page, query, proxy):
+    search_url = f"https://www.google.com/search?q={query.replace(' ', '+')}&hl=en"
+    started = time.monotonic()
+    with metrics.stage("navigate", "playwright"):
         await page.goto(search_url, timeout=60000)
-        await page.wait_for_load_state("networkidle")
-        await asyncio.sleep(random.uniform(3, 6))
-        # CAPTCHA check and solve
+    with metrics.stage("ready", "playwright"):
+        state = await readiness.wait_playwright(page, started)
+    metrics.inc("scraper_pages_total", provider="playwright", state=state)
+    logging.info(f"Page ready ({state}) for '{query}' after {time.monotonic() - started:.1f}s")
+    await DWELL_PACING.async_sleep()
+    # CAPTCHA check and solve
+    with metrics.stage("captcha", "playwright"):
         captcha_attempted = await solve_recaptcha(page, query, proxy)
-        if captcha_attempted:
-            await asyncio.sleep(random.uniform(4, 7))
-        # --- AI Overview selectors / you may need to update these as Google changes UI!
-        selectors = [
-            'div[data-md="311"]',
-            'div[data-attrid*="ai_overview"]',
-            'div:has(span:has-text("AI-powered overview"))',
-            'div[aria-label*="AI Overview"]',
-            'div:has-text("AI-powered overview")',
-        ]
+    if captcha_attempted:
+        await readiness.wait_playwright(page)
+    # --- AI Overview selectors / you may need to update these as Google changes UI!
+    selectors = [
+        'div[data-md="311"]',
+        'div[data-attrid*="ai_overview"]',
+        'div:has(span:has-text("AI-powered overview"))',
+        'div[aria-label*="AI Overview"]',
+        'div:has-text("AI-powered overview")',
+    ]
+    with metrics.stage("extract", "playwright"):
         ai_block = None
         for sel in selectors:
             try:
@@ -140,64 +164,248 @@ async def fetch_ai_overview(query):
                     break
             except Exception:
                 continue
-        result = None
-        if ai_block:
-            ai_html = await ai_block.inner_html()
-            ai_text = await ai_block.inner_text()
-            links = await ai_block.query_selector_all("a")
-            hyperlinks = []
-            for link in links:
-                href = await link.get_attribute("href")
-                text = await link.inner_text()
-                hyperlinks.append({'url': href, 'text': text})
-            result = {
-                "searchQuery": query,
-                "extractedAt": datetime.datetime.now().isoformat(),
-                "raw_html": ai_html,
-                "plain_text": ai_text,
-                "hyperlinks": hyperlinks,
-                "proxy_used": proxy['server']
-            }
-            logging.info(f"AI Overview fetched for '{query}'")
-        else:
-            logging.warning(f"No AI Overview found for '{query}'; saving debug files.")
-            await page.screenshot(path=f'debug_{query.replace(" ","_")}.png')
-            with open(f'debug_{query.replace(" ","_")}.html', "w", encoding="utf-8") as f:
-                f.write(await page.content())
-        await context.close()
-        await browser.close()
-        return result
+    result = None
+    if ai_block:
+        ai_html = await ai_block.inner_html()
+        ai_text = await ai_block.inner_text()
+        links = await ai_block.query_selector_all("a")
+        hyperlinks = []
+        for link in links:
+            href = await link.get_attribute("href")
+            text = await link.inner_text()
+            hyperlinks.append({'url': href, 'text': text})
+        result = {
+            "searchQuery": query,
+            "extractedAt": datetime.datetime.now().isoformat(),
+            "raw_html": ai_html,
+            "plain_text": ai_text,
+            "hyperlinks": hyperlinks,
+            "proxy_used": proxy['server'],
+            "fetch_method": "browser"
+        }
+        logging.info(f"AI Overview fetched for '{query}'")
+    else:
+        logging.warning(f"No AI Overview found for '{query}'; saving debug files.")
+        await page.screenshot(path=f'debug_{query.replace(" ","_")}.png')
+        with open(f'debug_{query.replace(" ","_")}.html', "w", encoding="utf-8") as f:
+            f.write(await page.content())
+    return result
 
-async def main():
-    # Load existing results
-    if os.path.isfile(JSON_FILE):
-        with open(JSON_FILE, "r", encoding="utf-8") as f:
+async def extract_ai_overview_http(query, proxy):
+    """
+    Fetch the SERP without a browser, judged like extract_ai_overview
+
+    Returns:
+        tuple: (done, result); done is False when the page needs a browser to render
+    """
+    fetch = functools.partial(
+        fetch_overview_http, query, proxy,
+        verify=False,   # Bright Data proxies, as with ignore_https_errors in the browser
+        selectors=HTTP_SELECTORS, min_html_length=0, require_marker=False, fallback_min_length=None
+    )
+    with metrics.stage("http_fetch", "playwright"):
+        http = await asyncio.get_running_loop().run_in_executor(None, fetch)
+    metrics.inc("scraper_pages_total", provider="playwright_http", state=http["status"])
+    if http["status"] not in (FOUND, NOT_FOUND):
+        logging.info(f"HTTP fetch inconclusive ({http['status']}) for '{query}'; escalating to browser")
+        return False, None
+    if http["status"] == NOT_FOUND:
+        logging.warning(f"No AI Overview found for '{query}' (HTTP); saving debug HTML.")
+        with open(f'debug_{query.replace(" ","_")}.html', "w", encoding="utf-8") as f:
+            f.write(http["page_html"])
+        return True, None
+    logging.info(f"AI Overview fetched for '{query}' (HTTP)")
+    return True, {
+        "searchQuery": query,
+        "extractedAt": datetime.datetime.now().isoformat(),
+        "raw_html": http["ai_html"],
+        "plain_text": http["ai_text"],
+        "hyperlinks": overview_hyperlinks(http["ai_html"]),
+        "proxy_used": proxy['server'],
+        "fetch_method": "http"
+    }
+
+class BrowserPool:
+    """
+    One Chromium per proxy, each serving many isolated BrowserContexts.
+
+    Queries are pulled from an asyncio queue by a pool of workers; a per-proxy
+    semaphore bounds how many contexts are open on each browser at once.
+    """
+    def __init__(self, proxies=None, contexts_per_proxy=CONTEXTS_PER_PROXY, headless=False):
+        self.proxies = [parse_proxy(p) for p in (proxies or BRIGHTDATA_PROXIES)]
+        self.contexts_per_proxy = contexts_per_proxy
+        self.headless = headless
+        self.browsers = []
+        self._playwright = None
+        self._next = 0
+        self.pages_loaded = 0
+        self.http_fetches = 0
+        self.busy_seconds = 0.0
+
+    async def __aenter__(self):
+        self._playwright = await async_playwright().start()
+        for proxy in self.proxies:
+            browser = await self._playwright.chromium.launch(
+                headless=self.headless,   # For debug; if stable change to True for headless
+                proxy=proxy
+            )
+            self.browsers.append({
+                "browser": browser,
+                "proxy": proxy,
+                "slots": asyncio.Semaphore(self.contexts_per_proxy)
+            })
+            logging.info(f"Launched browser for proxy {proxy['server']}")
+        return self
+
+    async def __aexit__(self, *exc):
+        for entry in self.browsers:
+            await entry["browser"].close()
+        await self._playwright.stop()
+
+    def _pick_browser(self):
+        # Prefer a browser with a free context slot, rotating the starting point
+        count = len(self.browsers)
+        for offset in range(count):
+            entry = self.browsers[(self._next + offset) % count]
+            if not entry["slots"].locked():
+                self._next = (self._next + offset + 1) % count
+                return entry
+        entry = self.browsers[self._next]
+        self._next = (self._next + 1) % count
+        return entry
+
+    async def fetch(self, query):
+        entry = self._pick_browser()
+        if HTTP_FIRST:
+            done, result = await extract_ai_overview_http(query, entry["proxy"])
+            if done:
+                self.http_fetches += 1
+                return result
+        async with entry["slots"]:
+            proxy = entry["proxy"]
+            logging.info(f"Using proxy {proxy['server']} for '{query}'")
+            context = await entry["browser"].new_context(
+                user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 12_3) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
+                viewport={"width": 1320, "height": 850},
+                extra_http_headers={"Accept-Language": "en-US,en;q=0.9"},
+                ignore_https_errors=True   # <--- This is crucial for Bright Data proxies!
+            )
+            traffic = PageTraffic()
+            await install_playwright_blocking(context, BLOCKING_PROFILE, traffic)
             try:
-                data = json.load(f)
-            except Exception:
-                data = []
-    else:
-        data = []
+                page = await context.new_page()
+                # Stealth and browser humanization
+                stealth = Stealth()
+                await stealth.apply_stealth_async(page)
+                return await extract_ai_overview(page, query, proxy)
+            finally:
+                await context.close()
+                self.pages_loaded += 1
+                bandwidth.record(traffic)
+                logging.info(f"Page traffic for '{query}': {traffic}")
+
+    async def run(self, queries, on_result=None):
+        """
+        Fetch every query through the pool
+
+        Args:
+            queries (list): Search queries
+            on_result (callable, optional): Called with (query, result) as each page finishes
+
+        Returns:
+            list: One result (or None) per query, in input order
+        """
+        queue = asyncio.Queue()
+        for index, query in enumerate(queries):
+            queue.put_nowait((index, query))
+        results = [None] * len(queries)
+
+        async def worker():
+            while True:
+                try:
+                    index, query = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    results[index] = await self.fetch(query)
+                except Exception as e:
+                    logging.error(f"Error fetching '{query}': {e}")
+                if on_result:
+                    on_result(query, results[index])
+
+        start = time.monotonic()
+        pages_before = self.pages_loaded
+        http_before = self.http_fetches
+        workers = len(self.browsers) * self.contexts_per_proxy
+        await asyncio.gather(*(worker() for _ in range(min(workers, len(queries)))))
+        elapsed = time.monotonic() - start
+        self.busy_seconds += elapsed
+
+        pages = self.pages_loaded - pages_before
+        logging.info(f"Loaded {pages} pages in {elapsed:.1f}s "
+                     f"({self.pages_per_minute(pages, elapsed):.1f} pages/min), "
+                     f"{self.http_fetches - http_before} queries answered over HTTP")
+        return results
+
+    @staticmethod
+    def pages_per_minute(pages, seconds):
+        return pages * 60 / seconds if seconds else 0.0
+
+    def get_throughput(self):
+        return {
+            "pages_loaded": self.pages_loaded,
+            "http_fetches": self.http_fetches,
+            "seconds": round(self.busy_seconds, 1),
+            "pages_per_minute": round(self.pages_per_minute(self.pages_loaded, self.busy_seconds), 1)
+        }
+
+async def fetch_ai_overview(query):
+    """Single-query helper: one browser, one context"""
+    async with BrowserPool(proxies=[random.choice(BRIGHTDATA_PROXIES)], contexts_per_proxy=1) as pool:
+        return await pool.fetch(query)
+
+async def main():
+    # Append-only results store (imports the old JSON array on first run)
+    sink = open_result_sink(JSON_FILE, LEGACY_JSON_FILE)
+    print("Enter your Google queries (one per line). Type 'done' or an empty line to start:")
+    queries = []
     while True:
-        user_query = input("\nEnter a Google query (or 'exit' to stop): ").strip()
-        if user_query.lower() in ('exit', 'quit', ''):
-            print("Goodbye!"); break
-        print(f"\n[LOG] Requesting for: {user_query}")
-        try:
-            result = await fetch_ai_overview(user_query)
-            if result:
-                print("HTML preview:\n", result["raw_html"][:500])
-                data.append(result)
-                with open(JSON_FILE, "w", encoding="utf-8") as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
-                print(f"Saved to {JSON_FILE}.\n")
-            else:
-                print("No AI Overview captured.\n")
-            logging.info("Sleeping random time before next request.")
-            await asyncio.sleep(random.uniform(13, 27))
-        except Exception as e:
-            print(f"Error: {e} (see {LOGFILE})")
-            logging.error(str(e))
+        user_query = input("> ").strip()
+        if user_query.lower() in ('done', 'exit', 'quit', ''):
+            break
+        queries.append(user_query)
+    # Resume: skip queries that already have a stored result
+    done = completed_queries(JSON_FILE)
+    skipped = [q for q in queries if q in done]
+    if skipped:
+        print(f"Skipping {len(skipped)} queries already in {JSON_FILE}")
+    queries = [q for q in queries if q not in done]
+    if not queries:
+        sink.close()
+        print("Goodbye!"); return
+
+    def save_result(query, result):
+        if result:
+            print(f"[{query}] HTML preview:\n", result["raw_html"][:500])
+            sink.write(result)
+            print(f"Saved to {JSON_FILE}.\n")
+        else:
+            print(f"[{query}] No AI Overview captured.\n")
+
+    try:
+        async with BrowserPool() as pool:
+            await pool.run(queries, on_result=save_result)
+            throughput = pool.get_throughput()
+        print(f"Done: {throughput['pages_loaded']} pages at {throughput['pages_per_minute']} pages/min, "
+              f"{throughput['http_fetches']} queries answered over HTTP")
+        logging.info(f"Time to page ready: {readiness.get_stats()}")
+        logging.info(f"Bandwidth: {bandwidth.get_stats()}")
+    except Exception as e:
+        print(f"Error: {e} (see {LOGFILE})")
+        logging.error(str(e))
+    finally:
+        sink.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Queue-backed batch mode for AI Overview collection.
+
+    python ai_overview_batch.py queries.txt --processes 4     # enqueue, then work
+    python ai_overview_batch.py --processes 4                 # join as extra workers (any machine)
+    python -m common.job_queue status|export|retry-failed     # from Codes/
+
+Each worker process leases jobs from the shared SQLite queue, routes them
+through ProviderRouter and acks each result into the queue. Paid API responses
+go through the shared ResponseCache, so a job re-run after a crashed worker's
+lease expires doesn't pay for the same query twice.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.providers import ProviderRouter, default_providers, HIT, MISS
+from common.job_queue import JobQueue, DEFAULT_QUEUE_PATH, DEFAULT_QUEUE, read_queries, worker_id
+from common.response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+LEASE_BATCH = 5
+IDLE_POLL_SECONDS = 10
+
+def setup_logging():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s')
+
+def run_worker(db_path, queue, strategy):
+    setup_logging()
+    jobs = JobQueue(db_path)
+    cache = ResponseCache()
+    router = ProviderRouter(default_providers(cache), strategy=strategy)
+    owner = worker_id()
+    done = 0
+
+    while True:
+        leased = jobs.lease(owner, queue, limit=LEASE_BATCH)
+        if not leased:
+            progress = jobs.get_progress(queue)
+            if progress["pending"] + progress["leased"] + progress["expired"] == 0:
+                break
+            # Other workers still hold leases; pick their jobs up if those leases expire
+            time.sleep(IDLE_POLL_SECONDS)
+            continue
+
+        for index, (job_id, query) in enumerate(leased):
+            if not jobs.extend(job_id, owner):
+                logger.warning(f"Lost the lease on '{query}', skipping")
+                continue
+            record = router.route(query)
+            if record["status"] in (HIT, MISS):
+                jobs.ack(job_id, owner, record)
+                done += 1
+            elif not record["attempts"]:
+                # No provider could even be tried (quota gone / unavailable): hand everything back
+                for rest_id, _ in leased[index:]:
+                    jobs.nack(rest_id, owner, record["error"], refund_attempt=True)
+                logger.error(f"No usable provider left; worker {owner} stopping")
+                jobs.close()
+                cache.close()
+                return
+            else:
+                jobs.nack(job_id, owner, record["error"])
+
+    logger.info(f"Worker {owner} finished: {done} jobs done. Provider stats: {json.dumps(router.get_stats())}")
+    jobs.close()
+    cache.close()
+
+def main():
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Collect AI Overviews from a shared job queue")
+    parser.add_argument("queries", nargs="?", help="File with one query per line to enqueue first")
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--strategy", default="cheapest", choices=["cheapest", "fastest"])
+    parser.add_argument("--db", default=DEFAULT_QUEUE_PATH)
+    parser.add_argument("--queue", default=DEFAULT_QUEUE)
+    args = parser.parse_args()
+
+    jobs = JobQueue(args.db)
+    if args.queries:
+        queries = read_queries(args.queries)
+        logger.info(f"Enqueued {jobs.enqueue(queries, args.queue)} new of {len(queries)} queries")
+    logger.info(f"Queue '{args.queue}' before: {jobs.get_progress(args.queue)}")
+
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(args.db, args.queue, args.strategy), name=f"worker-{n}")
+        for n in range(args.processes)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    logger.info(f"Queue '{args.queue}' after: {jobs.get_progress(args.queue)}")
+    logger.info(f"Export results with: python -m common.job_queue --db {args.db} --queue {args.queue} export results.jsonl")
+    jobs.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import os
+import sys
+import json
+import logging
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.providers import ProviderRouter, default_providers
+from common.result_store import open_result_sink
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+JSON_FILE = 'ai_overview_results_router.jsonl'
+
+def main():
+    strategy = sys.argv[1] if len(sys.argv) > 1 else "cheapest"
+    router = ProviderRouter(default_providers(), strategy=strategy)
+
+    # Append-only results store
+    sink = open_result_sink(JSON_FILE)
+
+    while True:
+        user_query = input("\nEnter a Google query (or 'exit' to stop): ").strip()
+        if user_query.lower() in ('exit', 'quit', ''):
+            break
+
+        record = router.route(user_query)
+        if record["status"] == "hit":
+            print(f"AI Overview via {record['provider']}:\n{record['ai_text'][:500]}")
+        else:
+            print(f"No AI Overview ({record['status']}, tried: {', '.join(record['attempts']) or 'none'})")
+
+        sink.write(record)
+        print(f"Saved output for '{user_query}' to {JSON_FILE}")
+
+    sink.close()
+    logger.info(f"Provider stats: {json.dumps(router.get_stats(), indent=2)}")
+    print("Goodbye!")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
 import os
 import json
 from dotenv import load_dotenv
-import requests
 import datetime
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.transport import get_session, connection_stats
+from common.result_store import open_result_sink
+from common.response_cache import ResponseCache
+from common.blob_store import BlobStore
 
 # Load ScraperAPI key from .env
 load_dotenv()
@@ -10,19 +15,13 @@ SCRAPERAPI_KEY = os.getenv("SCRAPERAPI_KEY")
 if not SCRAPERAPI_KEY:
     raise ValueError("Please set SCRAPERAPI_KEY in your .env file")
 
-JSON_FILE = 'ai_overview_results_scraperapi.json'
+API_URL = "https://api.scraperapi.com/structured/google/search"
+JSON_FILE = 'ai_overview_results_scraperapi.jsonl'
+LEGACY_JSON_FILE = 'ai_overview_results_scraperapi.json'
+# Raw SERP payloads, content-addressed and compressed; records keep only full_serp_ref
+BLOB_ROOT = 'serp_blobs'
 
-# Load existing results if available
-if os.path.isfile(JSON_FILE):
-    with open(JSON_FILE, 'r', encoding='utf-8') as f:
-        try:
-            data = json.load(f)
-        except Exception:
-            data = []
-else:
-    data = []
-
-def fetch_google_ai_overview(query, country='us', lang='en'):
+def fetch_google_ai_overview(query, country='us', lang='en', cache=None, blobs=None):
     params = {
         "api_key": SCRAPERAPI_KEY,
         "autoparse": "true",
@@ -30,14 +29,23 @@ def fetch_google_ai_overview(query, country='us', lang='en'):
         "query": query,
         "hl": lang
     }
-    api_url = "https://api.scraperapi.com/structured/google/search"
 
-    resp = requests.get(api_url, params=params)
-    if resp.status_code != 200:
-        print(f"Error: {resp.status_code} {resp.text}")
-        return None
+    def fetch_serp():
+        resp = get_session().get(API_URL, params=params)
+        if resp.status_code != 200:
+            print(f"Error: {resp.status_code} {resp.text}")
+            return None
+        return resp.json()
 
-    serp = resp.json()
+    if cache:
+        # Cache hit skips the paid ScraperAPI call
+        serp, from_cache = cache.fetch("scraperapi", query, fetch_serp, gl=country, hl=lang)
+        if from_cache:
+            print("(served from response cache)")
+    else:
+        serp = fetch_serp()
+    if serp is None:
+        return None
     # The AI Overview will usually be in another field in the JSON.
     # Print all top-level fields for inspection if needed:
     # print(json.dumps(serp, indent=2))
@@ -61,22 +69,34 @@ def fetch_google_ai_overview(query, country='us', lang='en'):
         print("No explicit AI overview detected; saving full SERP JSON for manual inspection.")
         ai_overview = None # let the record be flagged
 
-    return {
+    record = {
         "searchQuery": query,
         "extractedAt": datetime.datetime.now().isoformat(),
-        "full_serp": serp,
         "ai_overview": ai_overview
     }
+    if blobs:
+        # Written once per distinct payload; load it back with blobs.load_field(record)
+        record["full_serp_ref"] = blobs.put(serp)
+    else:
+        record["full_serp"] = serp
+    return record
 
 def main():
+    # Append-only results store (imports the old JSON array on first run)
+    sink = open_result_sink(JSON_FILE, LEGACY_JSON_FILE)
+    cache = ResponseCache()
+    blobs = BlobStore(BLOB_ROOT)
     while True:
         user_query = input("\nEnter a Google query (or 'exit' to stop): ").strip()
         if user_query.lower() in ('exit', 'quit', ''):
+            print(f"Connection reuse per host: {json.dumps(connection_stats.snapshot(), indent=2)}")
+            print(f"Raw payload store: {blobs.get_stats()}")
+            sink.close()
             print("Goodbye!")
             break
 
         print(f"Fetching Google AI Overview (via ScraperAPI) for: '{user_query}'")
-        record = fetch_google_ai_overview(user_query)
+        record = fetch_google_ai_overview(user_query, cache=cache, blobs=blobs)
         if record is None:
             print("No data returned (API error or limit hit).")
             continue
@@ -84,11 +104,9 @@ def main():
         if record['ai_overview']:
             print("AI Overview: ", str(record['ai_overview'])[:500], "...")
         else:
-            print("No AI Overview found for this query. See 'full_serp' field in output for further details.")
+            print(f"No AI Overview found for this query. Raw SERP stored as {record['full_serp_ref']} in {BLOB_ROOT}/.")
 
-        data.append(record)
-        with open(JSON_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        sink.write(record)
         print(f"Saved output for '{user_query}' to {JSON_FILE}\n")
 
 if __name__ == "__main__":
@@ -2,16 +2,24 @@ import time
 import logging
 import os
 import json
-import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import requests
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.transport import get_session, log_connection_stats
+from common.response_cache import ResponseCache
+from common.rate_limit import AsyncTokenBucket
+from common.quota_ledger import BudgetExceeded, get_ledger
+from common.metrics import metrics
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class GoogleAIOverviewScraper:
-    def __init__(self, max_queries=20):
+    def __init__(self, max_queries=20, cache=None):
         # Load environment variables
         load_dotenv()
         
@@ -36,6 +44,21 @@ class GoogleAIOverviewScraper:
         
         # Track processed queries
         self.processed_queries = set()
+        
+        # API endpoint
+        self.api_endpoint = "https://serpapi.com/search"
+        
+        # Shared keep-alive HTTP session
+        self.session = get_session()
+        
+        # Optional ResponseCache; hits skip the paid API call
+        self.cache = cache
+        
+        # Monthly SerpApi budget shared with every other process using the key
+        self.ledger = get_ledger()
+        
+        # Guards query_count, processed_queries and metadata when queries run concurrently
+        self._lock = threading.Lock()
     
     def check_quota(self):
         """Check if we've reached the query limit"""
@@ -55,22 +78,31 @@ class GoogleAIOverviewScraper:
         Returns:
             dict: AI Overview content and links
         """
-        # Skip if already processed
-        if query in self.processed_queries:
-            logger.info(f"Query '{query}' already processed. Skipping.")
-            return {"skipped": True}
-        
-        self.processed_queries.add(query)
-        
-        # Check if we've reached the query limit
-        if not self.check_quota():
-            return {"quota_exceeded": True}
+        with self._lock:
+            # Skip if already processed
+            if query in self.processed_queries:
+                logger.info(f"Query '{query}' already processed. Skipping.")
+                return {"skipped": True}
+            
+            self.processed_queries.add(query)
         
-        logger.info(f"Searching for: '{query}' [Query {self.query_count + 1}/{self.max_queries}]")
+        # Why a paid request was not made, if fetch_response returns None
+        failure = {}
         
-        try:
-            # Increment query counter
-            self.query_count += 1
+        def fetch_response():
+            # Quota check and counter increment happen atomically so
+            # concurrent workers can never exceed max_queries
+            with self._lock:
+                # Check if we've reached the query limit
+                if not self.check_quota():
+                    failure["quota_exceeded"] = True
+                    return None
+                
+                # Increment query counter
+                self.query_count += 1
+                query_number = self.query_count
+            
+            logger.info(f"Searching for: '{query}' [Query {query_number}/{self.max_queries}]")
             
             # Prepare the API request
             params = {
@@ -82,22 +114,51 @@ class GoogleAIOverviewScraper:
                 "hl": "en"
             }
             
-            # Make the request
-            response = requests.get("https://serpapi.com/search", params=params)
+            # Make the request, reserved against the shared SerpApi budget (refunded on failure)
+            try:
+                with self.ledger.spend("serpapi") as reservation:
+                    with metrics.stage("request", "serpapi"):
+                        response = self.session.get(self.api_endpoint, params=params)
+                    if response.status_code != 200:
+                        reservation.refund()
+            except BudgetExceeded as e:
+                logger.warning(f"{e}. Stopping further requests.")
+                with self._lock:
+                    self.results["metadata"]["quota_limited"] = True
+                failure["quota_exceeded"] = True
+                return None
+            
+            metrics.inc("scraper_requests_total", provider="serpapi", status=response.status_code)
             
             # Check for errors
             if response.status_code != 200:
                 logger.error(f"API request failed with status code: {response.status_code}")
-                return {"error": f"HTTP {response.status_code}"}
+                failure["error"] = f"HTTP {response.status_code}"
+                return None
             
             # Parse the response
-            data = response.json()
+            with metrics.stage("decode", "serpapi"):
+                return response.json()
+        
+        try:
+            # A cache hit skips the paid request and doesn't count against the quota
+            if self.cache:
+                data, from_cache = self.cache.fetch("serpapi_answers", query, fetch_response, gl="us", hl="en")
+            else:
+                data, from_cache = fetch_response(), False
+            
+            if data is None:
+                return failure
+            if from_cache:
+                logger.info(f"Using cached response for '{query}'")
             
             # Update metadata
-            self.results["metadata"]["total_queries"] += 1
+            with self._lock:
+                self.results["metadata"]["total_queries"] += 1
             
             # Extract AI Overview
-            ai_overview = self._extract_ai_overview_from_response(data)
+            with metrics.stage("extract", "serpapi"):
+                ai_overview = self._extract_ai_overview_from_response(data)
             
             if ai_overview:
                 logger.info(f"Found AI Overview for '{query}'")
@@ -205,16 +266,45 @@ class GoogleAIOverviewScraper:
             logger.error(f"Error extracting AI overview: {e}")
             return None
     
-    def process_queries(self, queries):
-        """Process a list of queries to extract AI Overviews"""
-        for query in queries:
-            if not self.check_quota():
-                break
-                
-            self.search_and_extract_ai_overview(query)
+    def process_queries(self, queries, max_concurrency=10, requests_per_second=5):
+        """
+        Process a list of queries to extract AI Overviews
+        
+        Args:
+            queries (list): The search queries
+            max_concurrency (int, optional): Maximum number of requests in flight
+            requests_per_second (float, optional): Token-bucket rate limit for new requests
             
-            # Add a delay between requests to avoid rate limiting
-            time.sleep(1 + random.random())  # 1-2 seconds
+        Returns:
+            list: One result dict per query, in the same order as `queries`
+        """
+        return asyncio.run(self.process_queries_async(queries, max_concurrency, requests_per_second))
+    
+    async def process_queries_async(self, queries, max_concurrency=10, requests_per_second=5):
+        """Async batch mode: run queries concurrently under a concurrency limit and rate limiter"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+        bucket = AsyncTokenBucket(requests_per_second)
+        loop = asyncio.get_running_loop()
+        overviews_before = len(self.results["ai_overviews"])
+        
+        async def run_query(executor, query):
+            async with semaphore:
+                # Don't wait for a token once the quota is gone; the call would be refused anyway.
+                # It still runs on the executor, never on the event loop other queries share
+                if self.query_count < self.max_queries:
+                    await bucket.acquire()
+                return await loop.run_in_executor(executor, self.search_and_extract_ai_overview, query)
+        
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            results = await asyncio.gather(*(run_query(executor, query) for query in queries))
+        
+        # Workers append overviews in completion order; store them in input order instead
+        self.results["ai_overviews"][overviews_before:] = [
+            result["ai_overview"] for result in results if "ai_overview" in result
+        ]
+        
+        logger.info(f"Batch finished: {len(queries)} queries, {self.query_count}/{self.max_queries} quota used")
+        return results
     
     def save_results(self, filename="google_ai_overviews.json"):
         """Save search results to a JSON file"""
@@ -223,7 +313,7 @@ class GoogleAIOverviewScraper:
         self.results["metadata"]["queries_limit"] = self.max_queries
         self.results["metadata"]["total_overviews"] = len(self.results["ai_overviews"])
         
-        with open(filename, 'w', encoding='utf-8') as f:
+        with metrics.stage("save", "serpapi"), open(filename, 'w', encoding='utf-8') as f:
             json.dump(self.results, f, indent=2, ensure_ascii=False)
         
         logger.info(f"Results saved to {filename}")
@@ -256,7 +346,7 @@ class GoogleAIOverviewScraper:
                 "hl": "en"
             }
             
-            response = requests.get("https://serpapi.com/search", params=params)
+            response = self.session.get(self.api_endpoint, params=params)
             
             if response.status_code == 200:
                 logger.info("Connection to SerpAPI successful!")
@@ -277,8 +367,8 @@ class GoogleAIOverviewScraper:
 
 def main():
     try:
-        # Initialize the scraper with a limit of 20 queries
-        scraper = GoogleAIOverviewScraper(max_queries=20)
+        # Initialize the scraper with a limit of 20 queries and an on-disk response cache
+        scraper = GoogleAIOverviewScraper(max_queries=20, cache=ResponseCache())
         
         # Test the connection first
         if not scraper.test_connection():
@@ -316,6 +406,8 @@ def main():
         with open("google_ai_overviews_summary.json", 'w', encoding='utf-8') as f:
             json.dump(summary, f, indent=2, ensure_ascii=False)
         
+        log_connection_stats(logger)
+        logger.info(f"Response cache: {scraper.cache.get_stats()}")
         logger.info("Search completed successfully!")
         
     except Exception as e:
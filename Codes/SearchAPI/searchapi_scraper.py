@@ -2,16 +2,30 @@ import requests
 import json
 import time
 import logging
+import threading
 import os
 from dotenv import load_dotenv
-from urllib.parse import urlparse
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.transport import get_session, log_connection_stats
+from common.rate_limit import TokenBucket, QuotaExhausted, get_limiter
+from common.pagination import fetch_pages
+from common.quota_ledger import BudgetExceeded, get_ledger
+from common.metrics import metrics
+from common.search_records import SearchItem, to_json
+from common.url_index import UrlIndex, DEFAULT_REFRESH_DAYS
+from common.url_classifier import classify_url
+from common.columnar_export import export_site_results
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Also write the run as partitioned Parquet tables under this directory (needs pyarrow); None = JSON only
+COLUMNAR_ROOT = None
+
 class SearchAPIScraper:
-    def __init__(self, max_queries=50):
+    def __init__(self, max_queries=50, requests_per_second=4, skip_fresh=False):
         # Load environment variables
         load_dotenv()
         
@@ -25,6 +39,21 @@ class SearchAPIScraper:
         # API endpoint
         self.api_endpoint = "https://www.searchapi.io/api/v1/search"
         
+        # Shared keep-alive HTTP session
+        self.session = get_session()
+        
+        # Request budget for parallel page fetches
+        self.rate_limiter = TokenBucket(rate=requests_per_second)
+        
+        # Per-provider AIMD concurrency limit; retries 429/5xx with backoff, honoring Retry-After
+        self.limiter = get_limiter("searchapi")
+        
+        # Daily/monthly budget shared with every other process using this API key
+        self.ledger = get_ledger()
+        
+        # Guards counters shared by parallel page fetches
+        self._lock = threading.Lock()
+        
         # Target website
         self.target_site = "mykitsch.com"
         
@@ -54,6 +83,14 @@ class SearchAPIScraper:
         self.discovered_categories = set()
         self.discovered_collections = set()
         self.discovered_products = set()
+        
+        # URLs and query runs persisted across runs
+        self.url_index = UrlIndex()
+        
+        # Opt-in: skip queries run less than DEFAULT_REFRESH_DAYS ago. Their results
+        # are not reloaded, so the saved JSON then only holds what this run fetched
+        self.skip_fresh = skip_fresh
+        self.skipped_fresh = 0
     
     def check_quota(self):
         """Check if we've reached the query limit"""
@@ -75,9 +112,41 @@ class SearchAPIScraper:
         Returns:
             dict: Search results
         """
-        # Check if we've reached the query limit
-        if not self.check_quota():
-            return {"quota_exceeded": True}
+        data = self._request_search(query, num_results, page)
+        self._store_search_data(data)
+        return data
+    
+    def is_fresh(self, query):
+        """True if skipping fresh queries and an earlier run executed the query within DEFAULT_REFRESH_DAYS"""
+        if not self.skip_fresh:
+            return False
+        last_run = self.url_index.last_run(query)
+        return last_run is not None and time.time() - last_run < DEFAULT_REFRESH_DAYS * 86400
+    
+    def search_if_stale(self, query):
+        """Run a query unless its results from an earlier run are still fresh"""
+        if self.is_fresh(query):
+            logger.info(f"Skipping '{query}' (still fresh in the URL index)")
+            self.skipped_fresh += 1
+            return None
+        
+        data = self.search(query)
+        if 'organic_results' in data:
+            self.url_index.record_query(query, 1, len(data['organic_results']))
+        return data
+    
+    def _request_search(self, query, num_results=10, page=1):
+        """Make one API request without touching stored results (safe to call from worker threads)"""
+        # Quota check and counter increment happen atomically so parallel
+        # page fetches can never exceed max_queries
+        with self._lock:
+            # Check if we've reached the query limit
+            if not self.check_quota():
+                return {"quota_exceeded": True}
+            
+            # Increment query counter
+            self.query_count += 1
+            query_number = self.query_count
         
         # Prepare parameters
         params = {
@@ -92,73 +161,87 @@ class SearchAPIScraper:
             'hl': 'en'
         }
         
-        logger.info(f"Searching for: '{query}' (page: {page}, num: {num_results}) [Query {self.query_count + 1}/{self.max_queries}]")
+        logger.info(f"Searching for: '{query}' (page: {page}, num: {num_results}) [Query {query_number}/{self.max_queries}]")
         
         try:
-            # Increment query counter
-            self.query_count += 1
-            
             # Make the API request
-            response = requests.get(self.api_endpoint, params=params)
+            # Each attempt, retries included, is reserved against the shared budget; refunded unless the provider answered
+            send = self.ledger.metered("searchapi", lambda: self.session.get(self.api_endpoint, params=params))
+            with metrics.stage("request", "searchapi"):
+                response = self.limiter.call(send)
+            
+            metrics.inc("scraper_requests_total", provider="searchapi", status=response.status_code)
             
             # Check for API errors
             if response.status_code != 200:
                 error_info = response.json() if response.text else {"error": "Unknown error"}
                 logger.error(f"API error ({response.status_code}): {error_info}")
                 
-                # Check for quota exceeded error
+                # Still throttled after every retry: skip this request, keep the run going
                 if response.status_code == 429:
-                    logger.error("API quota exceeded. Stopping further requests.")
-                    self.results["metadata"]["quota_limited"] = True
-                    return {"quota_exceeded": True}
+                    logger.error("Still rate limited after retries; skipping this request.")
                 
                 return {"error": error_info}
             
             # Parse the response
-            data = response.json()
+            with metrics.stage("decode", "searchapi"):
+                data = response.json()
             
             # Update metadata
-            self.results["metadata"]["total_queries"] += 1
+            with self._lock:
+                self.results["metadata"]["total_queries"] += 1
             
             # Check if there are search results
             if 'organic_results' in data:
-                result_count = len(data['organic_results'])
-                logger.info(f"Found {result_count} results")
-                self.results["metadata"]["total_results"] += result_count
-                
-                # Process and store the results
-                for item in data['organic_results']:
-                    processed_item = self._process_search_item(item)
-                    
-                    # Only add if it's from the target site
-                    if self.target_site in processed_item.get("displayLink", ""):
-                        self.results["search_results"].append(processed_item)
-                        
-                        # Categorize the result
-                        self._categorize_result(processed_item)
-                
                 return data
             else:
                 logger.warning(f"No results found for '{query}'")
                 return {"organic_results": []}
                 
+        except (QuotaExhausted, BudgetExceeded) as e:
+            logger.error(f"{e}. Stopping further requests.")
+            self.results["metadata"]["quota_limited"] = True
+            return {"quota_exceeded": True}
         except requests.exceptions.RequestException as e:
             logger.error(f"API request error: {e}")
             return {"error": str(e)}
     
+    def _store_search_data(self, data):
+        """Process and store the organic results of a search response"""
+        if not data.get('organic_results'):
+            return
+        
+        result_count = len(data['organic_results'])
+        metrics.inc("scraper_items_total", result_count, provider="searchapi")
+        logger.info(f"Found {result_count} results")
+        self.results["metadata"]["total_results"] += result_count
+        
+        # Process and store the results
+        for item in data['organic_results']:
+            with metrics.stage("process_item", "searchapi"):
+                processed_item = self._process_search_item(item)
+            
+            # Only add if it's from the target site
+            if self.target_site in processed_item.get("displayLink", ""):
+                self.results["search_results"].append(processed_item)
+                
+                # Categorize the result
+                with metrics.stage("categorize", "searchapi"):
+                    self._categorize_result(processed_item)
+    
     def _process_search_item(self, item):
         """Process a single search result item"""
-        processed = {
-            "title": item.get("title", ""),
-            "link": item.get("link", ""),
-            "snippet": item.get("snippet", ""),
-            "displayLink": item.get("displayed_link", ""),
-            "position": item.get("position", 0)
-        }
+        processed = SearchItem(
+            title=item.get("title", ""),
+            link=item.get("link", ""),
+            snippet=item.get("snippet", ""),
+            displayLink=item.get("displayed_link", ""),
+            position=item.get("position", 0)
+        )
         
         # Add thumbnail if available
         if "thumbnail" in item:
-            processed["image"] = item["thumbnail"]
+            processed.image = item["thumbnail"]
         
         # Add rich snippet data if available
         if "rich_snippet" in item:
@@ -166,7 +249,7 @@ class SearchAPIScraper:
             
             if "detected_extensions" in rich_data:
                 extensions = rich_data["detected_extensions"]
-                processed["rich_data"] = {
+                processed.rich_data = {
                     "rating": extensions.get("rating"),
                     "reviews": extensions.get("reviews"),
                     "price": None
@@ -179,15 +262,15 @@ class SearchAPIScraper:
                         attributes[attr["name"]] = attr["value"]
                         # Look for price information
                         if attr["name"].lower() in ["price", "cost"]:
-                            if "rich_data" not in processed:
-                                processed["rich_data"] = {}
-                            processed["rich_data"]["price"] = attr["value"]
+                            if processed.rich_data is None:
+                                processed.rich_data = {}
+                            processed.rich_data["price"] = attr["value"]
                 
-                processed["attributes"] = attributes
+                processed.attributes = attributes
         
         # Add sitelinks if available
         if "sitelinks" in item:
-            processed["sitelinks"] = item["sitelinks"]
+            processed.sitelinks = item["sitelinks"]
         
         return processed
     
@@ -201,138 +284,127 @@ class SearchAPIScraper:
         
         self.processed_urls.add(url)
         
-        # Extract path from URL
-        parsed_url = urlparse(url)
-        path = parsed_url.path.strip('/')
-        
-        # Categorize based on URL pattern
-        if path.startswith('collections'):
-            # It's a collection
-            parts = path.split('/')
-            if len(parts) >= 2:
-                collection_name = parts[1]
-                if collection_name not in self.discovered_collections:
-                    self.discovered_collections.add(collection_name)
-                    
-                    # Store in collections
-                    if collection_name not in self.results["collections"]:
-                        self.results["collections"][collection_name] = {
-                            "name": collection_name,
-                            "url": url,
-                            "title": result.get("title", ""),
-                            "description": result.get("snippet", ""),
-                            "products": []
-                        }
-                    
-                    # If it's a product within a collection
-                    if len(parts) >= 4 and parts[2] == "products":
-                        product_name = parts[3]
-                        if product_name not in self.discovered_products:
-                            self.discovered_products.add(product_name)
-                            self.results["collections"][collection_name]["products"].append({
-                                "name": product_name,
-                                "url": url,
-                                "title": result.get("title", "")
-                            })
-        
-        elif path.startswith('products'):
+        # Persist first-seen / last-seen so later runs know which sections are stale
+        if url:
+            self.url_index.upsert(url, result.get("title", ""), result.get("snippet", ""))
+        
+        # Match the URL against the site's route table
+        classified = classify_url(url)
+        kind = classified.kind
+        
+        if kind in ("collection", "product") and classified.collection:
+            # It's a collection, or a product within a collection
+            collection_name = classified.collection
+            self.discovered_collections.add(collection_name)
+            
+            # Store in collections
+            if collection_name not in self.results["collections"]:
+                self.results["collections"][collection_name] = {
+                    "name": collection_name,
+                    "url": url,
+                    "title": result.get("title", ""),
+                    "description": result.get("snippet", ""),
+                    "products": []
+                }
+            
+            # If it's a product within a collection
+            if kind == "product" and classified.name not in self.discovered_products:
+                product_name = classified.name
+                self.discovered_products.add(product_name)
+                self.results["collections"][collection_name]["products"].append({
+                    "name": product_name,
+                    "url": url,
+                    "title": result.get("title", "")
+                })
+        
+        elif kind == "product":
             # It's a product
-            parts = path.split('/')
-            if len(parts) >= 2:
-                product_name = parts[1]
-                if product_name not in self.discovered_products:
-                    self.discovered_products.add(product_name)
-                    
-                    product_info = {
-                        "name": product_name,
-                        "url": url,
-                        "title": result.get("title", ""),
-                        "description": result.get("snippet", ""),
-                        "image": result.get("image", "")
-                    }
-                    
-                    # Add rich data if available
-                    if "rich_data" in result:
-                        product_info["price"] = result["rich_data"].get("price")
-                        product_info["rating"] = result["rich_data"].get("rating")
-                        product_info["reviews"] = result["rich_data"].get("reviews")
-                    
-                    # Add attributes if available
-                    if "attributes" in result:
-                        product_info["attributes"] = result["attributes"]
-                    
-                    self.results["products"][product_name] = product_info
-        
-        elif path.startswith('pages'):
+            product_name = classified.name
+            if product_name not in self.discovered_products:
+                self.discovered_products.add(product_name)
+                
+                product_info = {
+                    "name": product_name,
+                    "url": url,
+                    "title": result.get("title", ""),
+                    "description": result.get("snippet", ""),
+                    "image": result.get("image", "")
+                }
+                
+                # Add rich data if available
+                if "rich_data" in result:
+                    product_info["price"] = result["rich_data"].get("price")
+                    product_info["rating"] = result["rich_data"].get("rating")
+                    product_info["reviews"] = result["rich_data"].get("reviews")
+                
+                # Add attributes if available
+                if "attributes" in result:
+                    product_info["attributes"] = result["attributes"]
+                
+                self.results["products"][product_name] = product_info
+        
+        elif kind == "page":
             # It's a page
-            parts = path.split('/')
-            if len(parts) >= 2:
-                page_name = parts[1]
-                if page_name not in self.results["pages"]:
-                    self.results["pages"][page_name] = {
-                        "name": page_name,
-                        "url": url,
-                        "title": result.get("title", ""),
-                        "description": result.get("snippet", "")
-                    }
-        
-        elif path and path not in self.results["categories"]:
+            page_name = classified.name
+            if page_name not in self.results["pages"]:
+                self.results["pages"][page_name] = {
+                    "name": page_name,
+                    "url": url,
+                    "title": result.get("title", ""),
+                    "description": result.get("snippet", "")
+                }
+        
+        elif kind in ("home", "search", "listing"):
+            # The homepage, a search page or the list of all collections / products / pages
+            pass
+        
+        elif classified.path not in self.results["categories"]:
             # It might be a category or other page
-            self.results["categories"][path] = {
-                "name": path,
+            self.results["categories"][classified.path] = {
+                "name": classified.path,
                 "url": url,
                 "title": result.get("title", ""),
                 "description": result.get("snippet", "")
             }
     
-    def search_multiple_pages(self, query, total_results=100):
+    def search_multiple_pages(self, query, total_results=100, max_parallel=3):
         """
         Search multiple pages to get more results
         
+        Pages are requested speculatively in parallel (within the rate limiter's
+        budget); once a page comes back short or empty, later pages that haven't
+        started are cancelled. Results are merged by page number.
+        
         Args:
             query (str): The search query
             total_results (int, optional): Total number of results to fetch
+            max_parallel (int, optional): Pages in flight at once (1 = sequential)
             
         Returns:
             list: Combined search results
         """
-        all_results = []
         results_per_page = 100  # SearchAPI allows up to 100 results per page
         pages_needed = min(5, (total_results + results_per_page - 1) // results_per_page)  # Limit to 5 pages
         
-        for page in range(1, pages_needed + 1):
-            # Check if we've reached the query limit
-            if not self.check_quota():
-                break
-                
-            logger.info(f"Fetching page {page} of {pages_needed}")
-            
-            # Make the search request
-            response = self.search(
-                query=query,
-                num_results=results_per_page,
-                page=page
-            )
-            
+        logger.info(f"Fetching {pages_needed} pages for '{query}' ({max_parallel} in parallel)")
+        
+        def fetch_page(page):
+            return self._request_search(query=query, num_results=results_per_page, page=page)
+        
+        def is_last_page(response):
+            # Errors, quota exhaustion and short pages end the sweep
+            return len(response.get('organic_results', [])) < results_per_page
+        
+        all_results = []
+        pages = list(range(1, pages_needed + 1))
+        for page, response in fetch_pages(fetch_page, pages, is_last_page, max_parallel, self.rate_limiter):
             # Check if there was an error or quota exceeded
             if 'error' in response or 'quota_exceeded' in response:
                 break
             
-            # Check if there are results
-            if 'organic_results' in response:
-                all_results.extend(response['organic_results'])
-                
-                # If we got fewer results than requested, there are no more pages
-                if len(response['organic_results']) < results_per_page:
-                    break
-            else:
-                # No more results
-                break
-            
-            # Respect API rate limits
-            if page < pages_needed:
-                logger.info("Waiting 1 second before next request...")
-                time.sleep(1)
+            # Store in page order so results stay deterministic
+            self._store_search_data(response)
+            all_results.extend(response['organic_results'])
         
         logger.info(f"Total results fetched: {len(all_results)}")
         return all_results
@@ -342,7 +414,7 @@ class SearchAPIScraper:
         # Priority 1: Main site overview
         if self.check_quota():
             logger.info("Priority 1: Getting site overview...")
-            self.search(f"site:{self.target_site}")
+            self.search_if_stale(f"site:{self.target_site}")
         
         # Priority 2: Key product categories
         key_categories = [
@@ -356,7 +428,7 @@ class SearchAPIScraper:
             if not self.check_quota():
                 break
             logger.info(f"Priority 2: Searching {category}...")
-            self.search(category)
+            self.search_if_stale(category)
         
         # Priority 3: Specific product types
         product_types = [
@@ -371,27 +443,39 @@ class SearchAPIScraper:
             if not self.check_quota():
                 break
             logger.info(f"Priority 3: Searching for {product_type}...")
-            self.search(product_type)
-        
-        # Priority 4: Explore discovered collections
-        collections_to_explore = list(self.discovered_collections)[:10]  # Limit to top 10
+            self.search_if_stale(product_type)
+        
+        # Priority 4: Explore collections discovered in this run, then ones known from
+        # an earlier run, leaving out ones explored recently (with skip_fresh)
+        known = {section.partition('/')[2] for section in self.url_index.sections(self.target_site)
+                 if section.startswith('collections/')}
+        collections_to_explore = [
+            collection for collection in sorted(self.discovered_collections) + sorted(known - self.discovered_collections)
+            if not self.is_fresh(f"site:{self.target_site}/collections/{collection}")
+        ][:10]  # Limit to top 10
         for collection in collections_to_explore:
             if not self.check_quota():
                 break
             logger.info(f"Priority 4: Exploring collection {collection}...")
-            self.search(f"site:{self.target_site}/collections/{collection}")
+            self.search_if_stale(f"site:{self.target_site}/collections/{collection}")
     
-    def save_results(self, filename="kitsch_site_data.json"):
-        """Save search results to a JSON file"""
+    def save_results(self, filename="kitsch_site_data.json", columnar_root=None):
+        """Save search results to a JSON file, and optionally as Parquet tables under columnar_root"""
         # Convert sets to lists for JSON serialization
         self.results["metadata"]["discovered_collections"] = list(self.discovered_collections)
         self.results["metadata"]["discovered_products"] = list(self.discovered_products)
         self.results["metadata"]["processed_urls"] = list(self.processed_urls)
+        self.results["metadata"]["url_index"] = self.url_index.get_stats(self.target_site)
+        self.url_index.flush()
         self.results["metadata"]["queries_used"] = self.query_count
         self.results["metadata"]["queries_limit"] = self.max_queries
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(self.results, f, indent=2, ensure_ascii=False)
+        with metrics.stage("save", "searchapi"), open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.results, f, indent=2, ensure_ascii=False, default=to_json)
+        
+        if columnar_root:
+            with metrics.stage("columnar_export", "searchapi"):
+                export_site_results(self.results, "searchapi", columnar_root)
         
         logger.info(f"Results saved to {filename}")
         return filename
@@ -407,7 +491,9 @@ class SearchAPIScraper:
             "products_found": len(self.results["products"]),
             "categories_found": len(self.results["categories"]),
             "pages_found": len(self.results["pages"]),
-            "unique_urls": len(self.processed_urls)
+            "unique_urls": len(self.processed_urls),
+            "new_urls": self.url_index.new_urls,
+            "queries_skipped_fresh": self.skipped_fresh
         }
         
         return summary
@@ -429,7 +515,7 @@ class SearchAPIScraper:
         
         try:
             # Make the API request
-            response = requests.get(self.api_endpoint, params=params)
+            response = self.session.get(self.api_endpoint, params=params)
             
             # Print full response for debugging
             logger.info(f"Response status code: {response.status_code}")
@@ -459,7 +545,7 @@ class SearchAPIScraper:
 def main():
     try:
         # Initialize the scraper with a limit of 50 queries
-        scraper = SearchAPIScraper(max_queries=50)
+        scraper = SearchAPIScraper(max_queries=50, skip_fresh="--skip-fresh" in sys.argv)
         
         # Test the API connection first (counts as 1 query)
         if not scraper.test_api_connection():
@@ -470,7 +556,7 @@ def main():
         scraper.execute_prioritized_searches()
         
         # Save the results
-        results_file = scraper.save_results("kitsch_searchapi_data.json")
+        results_file = scraper.save_results("kitsch_searchapi_data.json", columnar_root=COLUMNAR_ROOT)
         
         # Generate and display summary
         summary = scraper.get_results_summary()
@@ -482,12 +568,15 @@ def main():
         logger.info(f"Products found: {summary['products_found']}")
         logger.info(f"Categories found: {summary['categories_found']}")
         logger.info(f"Pages found: {summary['pages_found']}")
-        logger.info(f"Unique URLs: {summary['unique_urls']}")
+        logger.info(f"Unique URLs: {summary['unique_urls']} ({summary['new_urls']} never seen before)")
+        logger.info(f"Queries skipped as still fresh: {summary['queries_skipped_fresh']}")
         
         # Save summary
         with open("kitsch_searchapi_summary.json", 'w', encoding='utf-8') as f:
             json.dump(summary, f, indent=2, ensure_ascii=False)
         
+        log_connection_stats(logger)
+        logger.info(f"Throttling: {scraper.limiter.get_stats()}")
         logger.info("Search completed successfully!")
         
     except Exception as e:
@@ -1,21 +1,40 @@
+import os
+import sys
 import random
-from time import sleep
-import json
+from time import monotonic
 import datetime
-from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 import undetected_chromedriver as uc
-from bs4 import BeautifulSoup          # Add this for fallback parsing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.browser_pool import DriverPool
+from common.result_store import open_result_sink
+from common.readiness import ReadinessDetector, PacingPolicy
+from common.resource_blocking import BandwidthStats, apply_chrome_options, enable_selenium_blocking, collect_selenium_traffic
+from common.metrics import metrics
+from common.serp_html import fetch_overview_http, find_overview_block_in_browser, extract_overview_fallback, FOUND, NOT_FOUND
 
 PROXIES = []   # Leave empty or add proxies like "user:pass@host:port"
 
-JSON_FILE = 'ai_overview_results_selenium.json'
+# Warm browser pool: one long-lived driver per slot, recycled after MAX_PAGES_PER_DRIVER loads
+POOL_SIZE = 2
+MAX_PAGES_PER_DRIVER = 25
 
-try:
-    with open(JSON_FILE, 'r', encoding='utf-8') as f:
-        results = json.load(f)
-except Exception:
-    results = []
+# Try a plain HTTP fetch + lxml parse first; only start a browser when the page needs JS
+HTTP_FIRST = True
+
+# Wait for the SERP to show an overview / no-overview / CAPTCHA state instead of a fixed sleep
+readiness = ReadinessDetector(timeout=15)
+
+# Human-like jitter, independent of readiness: dwell on a ready page, and pause between queries
+DWELL_PACING = PacingPolicy(0.5, 2)
+QUERY_PACING = PacingPolicy(10, 22)
+
+# Drop images, fonts, media and trackers (see common.resource_blocking.PROFILES); proxy bandwidth is metered
+BLOCKING_PROFILE = "lean"
+bandwidth = BandwidthStats()
+
+JSON_FILE = 'ai_overview_results_selenium.jsonl'
+LEGACY_JSON_FILE = 'ai_overview_results_selenium.json'
 
 def make_chrome_options(proxy):
     chrome_options = Options()
@@ -31,71 +50,100 @@ def make_chrome_options(proxy):
     )
     if proxy:
         chrome_options.add_argument(f'--proxy-server=http://{proxy}')
-    return chrome_options
-
-def fallback_bs4_html_parse(page_html):
-    """If normal selectors fail, do a soup search for blocks containing Gemini/SGE cues."""
-    soup = BeautifulSoup(page_html, "html.parser")
-    for div in soup.find_all("div"):
-        t = div.get_text(separator="\n") or ""
-        if (
-            ("AI Overview" in t or "Gemini" in t or "SGE" in t or "AI-powered overview" in t)
-            and len(t) > 40
-        ):
-            # Remove all script/style children
-            [s.decompose() for s in div.find_all(["script", "style"])]
-            return str(div), t
-    return None, None
+    return apply_chrome_options(chrome_options, BLOCKING_PROFILE)
+
+def create_driver(proxy):
+    driver = uc.Chrome(options=make_chrome_options(proxy), use_subprocess=True)
+    return enable_selenium_blocking(driver, BLOCKING_PROFILE)
+
+driver_pool = None
+
+def get_driver_pool():
+    global driver_pool
+    if driver_pool is None:
+        driver_pool = DriverPool(create_driver, PROXIES, size=POOL_SIZE, max_pages=MAX_PAGES_PER_DRIVER)
+    return driver_pool
 
 def get_overview_block(driver):
-    # Try all known CSS selector patterns for 2024/2025 SGE/Gemini/AI Overview UI
-    selectors = [
-        'div[data-md="311"]',
-        'div[data-attrid*="ai_overview"]',
-        'div[aria-label*="AI Overview"]',
-        'div[data-attrid*="sgx"]',
-        'div[data-attrid*="synth"]',
-        'div[class^="wDYxhc"]',
-        'div[data-ved]',                # Sometimes the parent has this and contains the box at top of SERP
-    ]
-    for sel in selectors:
-        try:
-            elems = driver.find_elements(By.CSS_SELECTOR, sel)
-            for el in elems:
-                html = el.get_attribute("outerHTML")
-                txt = el.text
-                # Ensure it's a substantial block, with plausible SGE/Gemini cues, not just a geometry box
-                if (
-                    html and len(html) > 200 and
-                    any(s in txt for s in ["AI Overview", "Gemini", "SGE", "AI-powered overview", "Generated by"])
-                ):
-                    return html, txt
-        except Exception:
-            continue
-    # Fallback: HTML search for "AI Overview", "Gemini", etc. in divs
-    return fallback_bs4_html_parse(driver.page_source)
+    # All known selector patterns for 2024/2025 SGE/Gemini/AI Overview UI (OVERVIEW_SELECTORS),
+    # evaluated in-page in one round-trip; requires a substantial block with SGE/Gemini cues
+    try:
+        html, txt, _ = find_overview_block_in_browser(driver, min_html_length=200)
+        if html:
+            return html, txt
+    except Exception as e:
+        print(f"In-page selector search failed: {e}")
+    # Fallback: smallest div whose text has "AI Overview", "Gemini", etc.
+    return extract_overview_fallback(driver.page_source, min_length=40)
 
-def scrape_ai_overview(query):
+def scrape_ai_overview_http(query):
+    """Fetch the SERP without a browser; returns None when the page needs a browser to render"""
     proxy = random.choice(PROXIES) if PROXIES else None
-    chrome_options = make_chrome_options(proxy)
-    driver = uc.Chrome(options=chrome_options, use_subprocess=True)
+    with metrics.stage("http_fetch", "selenium"):
+        http = fetch_overview_http(query, proxy)
+    metrics.inc("scraper_pages_total", provider="selenium_http", state=http["status"])
+    if http["status"] not in (FOUND, NOT_FOUND):
+        print(f"HTTP fetch inconclusive ({http['status']}) for: {query}; escalating to browser")
+        return None
+    result = {
+        "searchQuery": query,
+        "proxy": proxy,
+        "extractedAt": datetime.datetime.now().isoformat(),
+        "ai_html": http["ai_html"],
+        "ai_text": http["ai_text"],
+        "fetch_method": "http"
+    }
+    if http["status"] == FOUND:
+        ai_txt = http["ai_text"]
+        print(f"\nAI Overview found for: {query} (HTTP, proxy: {proxy})")
+        print(f"Summary snippet:\n{'-'*40}\n{ai_txt[:800]}{'...' if len(ai_txt)>800 else ''}\n{'-'*40}")
+    else:
+        print(f"NO AI Overview found for: {query} (HTTP, proxy: {proxy})")
+        debugfile = f"debug_{query.replace(' ', '_')}.html"
+        with open(debugfile, "w", encoding='utf-8') as f:
+            f.write(http["page_html"])
+        print(f"Debug HTML of page saved as {debugfile}")
+    return result
+
+def scrape_ai_overview(query):
+    if HTTP_FIRST:
+        result = scrape_ai_overview_http(query)
+        if result:
+            return result
+    pool = get_driver_pool()
+    slot = pool.checkout()
+    driver, proxy = slot.driver, slot.proxy
+    recycle = False
     result = {
         "searchQuery": query,
         "proxy": proxy,
         "extractedAt": datetime.datetime.now().isoformat(),
         "ai_html": None,
-        "ai_text": None
+        "ai_text": None,
+        "fetch_method": "browser"
     }
     try:
         url = f"https://www.google.com/search?q={query.replace(' ', '+')}&hl=en"
-        driver.get(url)
-        sleep(random.uniform(6, 11))
+        started = monotonic()
+        with metrics.stage("navigate", "selenium"):
+            driver.get(url)
+        with metrics.stage("ready", "selenium"):
+            state = readiness.wait_selenium(driver, started)
+        metrics.inc("scraper_pages_total", provider="selenium", state=state)
+        print(f"Page ready ({state}) after {monotonic() - started:.1f}s")
+        DWELL_PACING.sleep()
+        traffic = collect_selenium_traffic(driver)
+        bandwidth.record(traffic)
+        print(f"Page traffic: {traffic}")
         # Note: CAPTCHAs will be missed in headless; you'll need 2captcha or manual solve if running non-headless
         if "recaptcha" in driver.page_source.lower() or "i'm not a robot" in driver.page_source.lower():
             print("CAPTCHA encountered! Skipping this run.")
             result["ai_text"] = "CAPTCHA encountered"
+            # This browser/proxy is flagged; start a fresh one next time
+            recycle = True
         else:
-            ai_html, ai_txt = get_overview_block(driver)
+            with metrics.stage("extract", "selenium"):
+                ai_html, ai_txt = get_overview_block(driver)
             if ai_html:
                 print(f"\nAI Overview found for: {query} (proxy: {proxy})")
                 print(f"Summary snippet:\n{'-'*40}\n{ai_txt[:800]}{'...' if len(ai_txt)>800 else ''}\n{'-'*40}")
@@ -110,22 +158,30 @@ def scrape_ai_overview(query):
     except Exception as e:
         print(f"Error: {e}")
         result["ai_text"] = f"Error: {e}"
+        # The driver may have crashed; don't hand it to the next query
+        recycle = True
     finally:
-        driver.quit()
+        pool.checkin(slot, recycle=recycle)
     return result
 
 def main():
+    # Append-only results store (imports the old JSON array on first run)
+    sink = open_result_sink(JSON_FILE, LEGACY_JSON_FILE)
     while True:
         user_query = input("\nEnter a Google query (or 'exit' to stop): ").strip()
         if user_query.lower() in ('exit', 'quit', ''):
+            if driver_pool is not None:
+                print(f"Browser pool metrics: {driver_pool.get_metrics()}")
+                print(f"Time to page ready: {readiness.get_stats()}")
+                print(f"Bandwidth: {bandwidth.get_stats()}")
+                driver_pool.close()
+            sink.close()
             print("Goodbye!")
             break
         record = scrape_ai_overview(user_query)
-        results.append(record)
-        with open(JSON_FILE, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+        sink.write(record)
         print("Result saved. Sleeping before next request...")
-        sleep(random.uniform(10, 22))
+        QUERY_PACING.sleep()
 
 if __name__ == "__main__":
     main()
@@ -1,29 +1,26 @@
-import json
 import datetime
 from serpapi import GoogleSearch
 import os
+import sys
 from dotenv import load_dotenv
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.result_store import open_result_sink
+from common.response_cache import ResponseCache
+from common.quota_ledger import BudgetExceeded, get_ledger
 
-# --- Load your SerpApi key securely
-load_dotenv()
-api_key = os.getenv("SERPAPI_API_KEY")
-if not api_key:
-    print("ERROR: Please set SERPAPI_API_KEY in your .env file")
-    exit(1)
+JSON_FILE = 'ai_overview_results.jsonl'
+LEGACY_JSON_FILE = 'ai_overview_results.json'
 
-JSON_FILE = 'ai_overview_results.json'
+# SerpApi reports an empty SERP through its error field; that is an answer, not a failure
+NO_RESULTS_ERROR = "hasn't returned any results"
 
-# Load or start new JSON array
-if os.path.isfile(JSON_FILE):
-    with open(JSON_FILE, 'r', encoding='utf-8') as f:
-        try:
-            data = json.load(f)
-        except Exception:
-            data = []
-else:
-    data = []
+class SerpApiError(Exception):
+    """SerpApi answered with an error payload (bad key, account out of searches, ...)"""
+    @property
+    def out_of_searches(self):
+        return "run out of searches" in str(self)
 
-def extract_ai_overview_full(query, api_key):
+def extract_ai_overview_full(query, api_key, cache=None):
     params = {
         "engine": "google",
         "q": query,
@@ -31,8 +28,28 @@ def extract_ai_overview_full(query, api_key):
         "hl": "en",
         "gl": "us"
     }
-    search = GoogleSearch(params)
-    results = search.get_dict()
+
+    def paid_search():
+        # Reserved against the shared SerpApi budget (raises BudgetExceeded); refunded on an error payload
+        with get_ledger().spend("serpapi") as reservation:
+            results = GoogleSearch(params).get_dict()
+            if "error" in results:
+                reservation.refund()
+            return results
+
+    if cache:
+        # Cache hit skips the paid SerpApi call; error payloads are never cached
+        results, from_cache = cache.fetch(
+            "serpapi", query, paid_search,
+            gl="us", hl="en", cacheable=lambda r: "error" not in r
+        )
+        if from_cache:
+            print("(served from response cache)")
+    else:
+        results = paid_search()
+    error = results.get('error')
+    if error and NO_RESULTS_ERROR not in error:
+        raise SerpApiError(error)
     ai_overview = results.get('ai_overview')
     if not ai_overview:
         return None
@@ -46,22 +63,45 @@ def extract_ai_overview_full(query, api_key):
     full_window.update(ai_overview)
     return full_window
 
-while True:
-    user_query = input("\nEnter a Google query (or 'exit' to stop): ").strip()
-    if user_query.lower() in ('exit', 'quit', ''):
-        print("Goodbye!")
-        break
-    print(f"Fetching full AI Overview window for: {user_query} ...")
-    result = extract_ai_overview_full(user_query, api_key)
-    if not result:
-        print("No AI Overview returned for this query.")
-        continue
+def main():
+    # --- Load your SerpApi key securely
+    load_dotenv()
+    api_key = os.getenv("SERPAPI_API_KEY")
+    if not api_key:
+        print("ERROR: Please set SERPAPI_API_KEY in your .env file")
+        exit(1)
+
+    # Append-only results store (imports the old JSON array on first run)
+    sink = open_result_sink(JSON_FILE, LEGACY_JSON_FILE)
+    cache = ResponseCache()
+
+    while True:
+        user_query = input("\nEnter a Google query (or 'exit' to stop): ").strip()
+        if user_query.lower() in ('exit', 'quit', ''):
+            sink.close()
+            print(f"Response cache: {cache.get_stats()}")
+            cache.close()
+            print("Goodbye!")
+            break
+        print(f"Fetching full AI Overview window for: {user_query} ...")
+        try:
+            result = extract_ai_overview_full(user_query, api_key, cache)
+        except BudgetExceeded as e:
+            print(f"{e}. Check with: python -m common.quota_ledger status")
+            continue
+        except SerpApiError as e:
+            print(f"SerpApi error: {e}")
+            continue
+        if not result:
+            print("No AI Overview returned for this query.")
+            continue
+
+        print(f"=== AI Overview WINDOW keys: {list(result.keys())}")
+        print("Sample of summary/text/HTML:\n", result.get('summary', '')[:400] or result.get('text', '')[:400])
+        print("\nSaving full AI Overview...")
 
-    print(f"=== AI Overview WINDOW keys: {list(result.keys())}")
-    print("Sample of summary/text/HTML:\n", result.get('summary', '')[:400] or result.get('text', '')[:400])
-    print("\nSaving full AI Overview...")
+        sink.write(result)
+        print(f"Saved AI Overview window for '{user_query}' in {JSON_FILE}.\n")
 
-    data.append(result)
-    with open(JSON_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    print(f"Saved AI Overview window for '{user_query}' in {JSON_FILE}.\n")
+if __name__ == "__main__":
+    main()
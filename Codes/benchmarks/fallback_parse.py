@@ -0,0 +1,73 @@
+"""
+Benchmark the marker-text fallback extractor against the old BeautifulSoup loop.
+
+Runs both over saved debug_*.html pages (written by the Selenium scrapers when
+no overview is found) and reports per-page timings and the overall speedup.
+
+    python benchmarks/fallback_parse.py debug_*.html [--repeat 3]
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.serp_html import extract_overview_fallback
+
+MARKERS = ["AI Overview", "Gemini", "SGE", "AI-powered overview", "Generated by"]
+
+
+def bs4_fallback(page_html, min_length=40):
+    """The previous fallback_bs4_html_parse: get_text() on every div, quadratic in nesting depth"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(page_html, "html.parser")
+    for div in soup.find_all("div"):
+        t = div.get_text(separator="\n") or ""
+        if any(m in t for m in MARKERS) and len(t) > min_length:
+            [s.decompose() for s in div.find_all(["script", "style"])]
+            return str(div), t
+    return None, None
+
+
+def best_time(fn, page_html, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(page_html)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare fallback AI Overview extractors on saved SERPs")
+    parser.add_argument("files", nargs="*", help="Saved SERP HTML (default: debug_*.html in the current directory)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    files = args.files or sorted(glob.glob("debug_*.html"))
+    if not files:
+        print("No HTML files to benchmark (save some with the Selenium scrapers first)")
+        return 1
+
+    total_old = total_new = 0.0
+    print(f"{'file':40} {'KB':>7} {'bs4 s':>9} {'lxml s':>9} {'speedup':>8}  found")
+    for path in files:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            page_html = f.read()
+        old_time, (old_html, _) = best_time(bs4_fallback, page_html, args.repeat)
+        new_time, (new_html, _) = best_time(extract_overview_fallback, page_html, args.repeat)
+        total_old += old_time
+        total_new += new_time
+        found = f"{'y' if old_html else 'n'}/{'y' if new_html else 'n'}"
+        print(f"{os.path.basename(path)[:40]:40} {len(page_html) / 1024:7.0f} "
+              f"{old_time:9.3f} {new_time:9.3f} {old_time / max(new_time, 1e-9):7.1f}x  {found}")
+
+    print(f"\nTotal: bs4 {total_old:.3f}s, lxml {total_new:.3f}s, "
+          f"speedup {total_old / max(total_new, 1e-9):.1f}x over {len(files)} pages")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""
+Local mock of the search APIs, replaying recorded payloads.
+
+Serves the four paid endpoints the scrapers call, so they can be exercised
+and benchmarked without API keys:
+
+    /customsearch/v1             Google Custom Search JSON API
+    /api/v1/search               SearchAPI.io
+    /search                      SerpApi
+    /structured/google/search    ScraperAPI structured Google search
+
+Responses are built from the checked-in results: organic results from
+SearchAPI/searchio/kitsch_searchapi_data.json, AI Overviews from
+SerpAPI/serp-io/google_ai_overviews.json and full SERPs from
+ScraperAPI/ai_overview_results_scraperapi.json. The payload for a query is
+picked by a hash of the query, so the same query always gets the same answer.
+
+Faults are configurable: a latency distribution, a random error rate
+(HTTP 500) and periodic 429 bursts with a Retry-After header.
+
+    python benchmarks/mock_server.py --port 8599 --latency lognormal:80:0.5 \\
+        --error-rate 0.02 --burst-every 30 --burst-for 2
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+from collections import Counter
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+CODES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+SEARCHAPI_DATA = os.path.join(CODES_DIR, "SearchAPI", "searchio", "kitsch_searchapi_data.json")
+SERPAPI_DATA = os.path.join(CODES_DIR, "SerpAPI", "serp-io", "google_ai_overviews.json")
+SCRAPERAPI_DATA = os.path.join(CODES_DIR, "ScraperAPI", "ai_overview_results_scraperapi.json")
+
+CSE_PATH = "/customsearch/v1"
+SEARCHAPI_PATH = "/api/v1/search"
+SERPAPI_PATH = "/search"
+SCRAPERAPI_PATH = "/structured/google/search"
+
+
+def parse_latency(spec):
+    """
+    Latency distribution spec -> callable returning seconds
+
+        fixed:MS | uniform:MIN_MS:MAX_MS | lognormal:MEDIAN_MS:SIGMA | exp:MEAN_MS
+    """
+    name, _, args = spec.partition(':')
+    values = [float(value) for value in args.split(':') if value]
+    if name == "fixed":
+        return lambda: values[0] / 1000
+    if name == "uniform":
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if name == "lognormal":
+        median, sigma = values
+        return lambda: random.lognormvariate(0, sigma) * median / 1000
+    if name == "exp":
+        return lambda: random.expovariate(1000 / values[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class MockConfig:
+    def __init__(self, latency="fixed:0", error_rate=0.0, burst_every=0, burst_for=0, retry_after=1, seed=None):
+        """
+        Args:
+            latency (str, optional): Distribution spec for parse_latency
+            error_rate (float, optional): Share of requests answered with HTTP 500
+            burst_every (float, optional): Seconds between 429 bursts (0 = no bursts)
+            burst_for (float, optional): Length of each burst in seconds
+            retry_after (int, optional): Retry-After value sent with the 429s
+            seed (int, optional): Seed for the fault and latency draws
+        """
+        self.latency = latency
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.burst_every = burst_every
+        self.burst_for = burst_for
+        self.retry_after = retry_after
+        if seed is not None:
+            random.seed(seed)
+
+
+class Payloads:
+    """Recorded responses, reshaped per provider"""
+    def __init__(self):
+        with open(SEARCHAPI_DATA, 'r', encoding='utf-8') as f:
+            self.organic = json.load(f)["search_results"]
+        with open(SERPAPI_DATA, 'r', encoding='utf-8') as f:
+            self.overviews = json.load(f)["ai_overviews"]
+        with open(SCRAPERAPI_DATA, 'r', encoding='utf-8') as f:
+            self.serps = json.load(f)
+
+    @staticmethod
+    def _pick(items, query):
+        return items[zlib.crc32(query.encode('utf-8')) % len(items)]
+
+    def _window(self, query, offset, count):
+        """`count` organic results starting at `offset`, rotated per query"""
+        start = zlib.crc32(query.encode('utf-8')) % len(self.organic)
+        return [self.organic[(start + i) % len(self.organic)] for i in range(offset, min(offset + count, len(self.organic)))]
+
+    def custom_search(self, params):
+        query = params.get("q", "")
+        num = int(params.get("num", 10))
+        start = int(params.get("start", 1))
+        items = [{
+            "title": result.get("title", ""),
+            "link": result.get("link", ""),
+            "snippet": result.get("snippet", ""),
+            "htmlSnippet": result.get("snippet", ""),
+            "displayLink": urlparse(result.get("link", "")).netloc,
+            "formattedUrl": result.get("link", "")
+        } for result in self._window(query, start - 1, num)]
+        queries = {"request": [{"searchTerms": query, "startIndex": start, "count": len(items)}]}
+        # The real API stops at 100 results
+        if start - 1 + num < min(100, len(self.organic)):
+            queries["nextPage"] = [{"startIndex": start + num}]
+        return {"kind": "customsearch#search", "queries": queries, "items": items}
+
+    def searchapi(self, params):
+        query = params.get("q", "")
+        num = int(params.get("num", 10))
+        page = int(params.get("page", 1))
+        results = self._window(query, (page - 1) * num, num)
+        return {
+            "search_parameters": {"engine": "google", "q": query, "page": page},
+            "organic_results": [{
+                "title": result.get("title", ""),
+                "link": result.get("link", ""),
+                "snippet": result.get("snippet", ""),
+                "displayed_link": result.get("displayLink", ""),
+                "position": i + 1
+            } for i, result in enumerate(results)]
+        }
+
+    def serpapi(self, params):
+        query = params.get("q", "")
+        overview = self._pick(self.overviews, query)
+        links = overview.get("links", [])
+        return {
+            "search_metadata": {"status": "Success"},
+            "search_parameters": {"engine": "google", "q": query},
+            "ai_overview": {
+                "text_blocks": [{"type": "paragraph", "snippet": overview.get("content", "")}],
+                "references": [{"index": i, "link": link} for i, link in enumerate(links)]
+            },
+            "answer_box": {"snippet": overview.get("content", ""), "link": links[0] if links else ""},
+            "organic_results": self._window(query, 0, 10)
+        }
+
+    def scraperapi(self, params):
+        record = self._pick(self.serps, params.get("query", ""))
+        serp = dict(record.get("full_serp") or {})
+        if record.get("ai_overview"):
+            serp["ai_overview"] = record["ai_overview"]
+        return serp
+
+
+class MockProviderServer:
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        """
+        Args:
+            config (MockConfig, optional): Latency and fault settings
+            port (int, optional): 0 picks a free port; see .url once started
+        """
+        self.config = config or MockConfig()
+        self.payloads = Payloads()
+        self.started = time.monotonic()
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self.routes = {
+            CSE_PATH: self.payloads.custom_search,
+            SEARCHAPI_PATH: self.payloads.searchapi,
+            SERPAPI_PATH: self.payloads.serpapi,
+            SCRAPERAPI_PATH: self.payloads.scraperapi,
+        }
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def in_burst(self):
+        """True while a periodic 429 burst is active"""
+        config = self.config
+        if not config.burst_every or not config.burst_for:
+            return False
+        return (time.monotonic() - self.started) % config.burst_every < config.burst_for
+
+    def respond(self, path, params):
+        """(status, headers, body) for one request, after the simulated latency"""
+        config = self.config
+        time.sleep(config.sample_latency())
+        route = self.routes.get(path)
+        if route is None:
+            status, headers, body = 404, {}, {"error": f"Unknown endpoint {path}"}
+        elif self.in_burst():
+            status, headers = 429, {"Retry-After": str(config.retry_after)}
+            body = {"error": {"code": 429, "message": "Rate limit exceeded (mock burst)"}}
+        elif config.error_rate and random.random() < config.error_rate:
+            status, headers, body = 500, {}, {"error": {"code": 500, "message": "Backend error (mock)"}}
+        else:
+            status, headers, body = 200, {}, route(params)
+        with self._lock:
+            self.counts[(path, status)] += 1
+        return status, headers, body
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, like the real APIs; headers and body go out as separate
+            # writes, so Nagle would add a delayed-ACK stall to every response
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+                status, headers, body = server.respond(parsed.path, params)
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-provider-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def get_stats(self):
+        """Requests served per endpoint and status"""
+        with self._lock:
+            return {f"{path} {status}": count for (path, status), count in sorted(self.counts.items())}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_fault_arguments(parser):
+    parser.add_argument("--latency", default="fixed:0",
+                        help="fixed:MS, uniform:MIN:MAX, lognormal:MEDIAN:SIGMA or exp:MEAN (milliseconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with HTTP 500")
+    parser.add_argument("--burst-every", type=float, default=0, help="Seconds between 429 bursts (0 = none)")
+    parser.add_argument("--burst-for", type=float, default=0, help="Length of each 429 burst in seconds")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--seed", type=int)
+
+
+def config_from_args(args):
+    return MockConfig(args.latency, args.error_rate, args.burst_every, args.burst_for, args.retry_after, args.seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve recorded search API payloads locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8599)
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = MockProviderServer(config_from_args(args), args.host, args.port)
+    print(f"Mock providers on {server.url}: {', '.join(server.routes)}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps(server.get_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
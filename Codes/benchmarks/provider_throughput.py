@@ -0,0 +1,235 @@
+"""
+End-to-end throughput benchmark of the API scrapers against the local mock server.
+
+Each scraper runs the same query list against benchmarks/mock_server.py in a
+fresh process and reports queries/sec, p50/p95/p99 latency per query, the
+success rate and peak RSS. Nothing reaches the real APIs: the keys are
+replaced with dummies, and the quota ledger and URL index live in a
+throwaway directory.
+
+    python benchmarks/provider_throughput.py --queries 200 --latency lognormal:80:0.5
+    python benchmarks/provider_throughput.py --error-rate 0.05 --burst-every 20 --burst-for 1
+    python benchmarks/provider_throughput.py --json current.json --baseline baseline.json
+
+With --baseline, the run fails (exit code 1) if any scraper's queries/sec
+drops, or its p95 rises, by more than --tolerance against the saved run.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import contextlib
+import importlib.util
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mock_server import (MockProviderServer, add_fault_arguments, config_from_args,
+                         CSE_PATH, SEARCHAPI_PATH, SERPAPI_PATH, SCRAPERAPI_PATH, CODES_DIR)
+
+DUMMY_ENV = {
+    "GOOGLE_SEARCH_API_KEY": "mock-key",
+    "GOOGLE_SEARCH_ENGINE_ID": "mock-cx",
+    "SEARCHAPI_KEY": "mock-key",
+    "SERPAPI_KEY": "mock-key",
+    "SERPAPI_API_KEY": "mock-key",
+    "SCRAPERAPI_KEY": "mock-key",
+}
+
+# High enough that the client-side token buckets never throttle the benchmark
+UNTHROTTLED_RPS = 10000
+UNLIMITED = 10 ** 9
+
+
+def _search_scraper(path, endpoint_path, **kwargs):
+    def build(module, base_url):
+        scraper = module.GoogleSearchScraper(requests_per_second=UNTHROTTLED_RPS, **kwargs)
+        scraper.api_endpoint = base_url + endpoint_path
+        return scraper.search
+    return path, build
+
+
+def _searchapi_scraper(module, base_url):
+    scraper = module.SearchAPIScraper(max_queries=UNLIMITED, requests_per_second=UNTHROTTLED_RPS)
+    scraper.api_endpoint = base_url + SEARCHAPI_PATH
+    return scraper.search
+
+
+def _ai_overview_scraper(module, base_url):
+    scraper = module.GoogleAIOverviewScraper(max_queries=UNLIMITED)
+    scraper.api_endpoint = base_url + SERPAPI_PATH
+    return scraper.search_and_extract_ai_overview
+
+
+def _scraperapi(module, base_url):
+    module.API_URL = base_url + SCRAPERAPI_PATH
+    return module.fetch_google_ai_overview
+
+
+# name -> (script path relative to Codes/, builder(module, base_url) -> run(query))
+SCENARIOS = {
+    "google-custom": _search_scraper("Google Custom JSON/google-custom.py", CSE_PATH),
+    "google_search_scraper": _search_scraper("Google Custom JSON/google_search_scraper.py", CSE_PATH,
+                                             max_queries=UNLIMITED),
+    "limit": _search_scraper("Google Custom JSON/limit.py", CSE_PATH),
+    "searchapi_scraper": ("SearchAPI/searchapi_scraper.py", _searchapi_scraper),
+    "search_ai-overview": ("SearchAPI/search_ai-overview.py", _ai_overview_scraper),
+    "scraperapi": ("ScraperAPI/scraperapi.py", _scraperapi),
+}
+
+
+def load_script(path):
+    """Import a script by file path (several have dashes in their names)"""
+    name = "bench_" + os.path.splitext(os.path.basename(path))[0].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(name, os.path.join(CODES_DIR, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def succeeded(result):
+    if not isinstance(result, dict):
+        return False
+    return not any(key in result for key in ("error", "quota_exceeded", "skipped"))
+
+
+def percentile(sorted_values, share):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(share * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def run_scenario(name, base_url, queries, threads, workdir):
+    """Runs in a fresh process, so imports, singletons and peak RSS are per scraper"""
+    os.chdir(workdir)
+    path, build = SCENARIOS[name]
+    module = load_script(path)
+    # The scripts configure INFO logging at import; per-request lines (including the
+    # errors the mock injects on purpose) would dominate the timings and the output
+    logging.getLogger().setLevel(logging.CRITICAL)
+    run = build(module, base_url)
+    devnull = open(os.devnull, 'w')
+
+    def timed(query):
+        start = time.perf_counter()
+        # scraperapi.py prints its progress
+        with contextlib.redirect_stdout(devnull):
+            result = run(query)
+        return time.perf_counter() - start, succeeded(result)
+
+    started = time.perf_counter()
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            outcomes = list(executor.map(timed, queries))
+    else:
+        outcomes = [timed(query) for query in queries]
+    elapsed = time.perf_counter() - started
+    devnull.close()
+
+    latencies = sorted(latency for latency, _ in outcomes)
+    ok = sum(1 for _, success in outcomes if success)
+    return {
+        "scraper": name,
+        "queries": len(queries),
+        "succeeded": ok,
+        "success_rate": ok / len(queries) if queries else 0.0,
+        "queries_per_sec": len(queries) / elapsed if elapsed else None,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Regressions against a saved run: lower queries/sec or higher p95 beyond tolerance"""
+    previous = {row["scraper"]: row for row in baseline["results"]}
+    regressions = []
+    for row in results:
+        old = previous.get(row["scraper"])
+        if not old:
+            continue
+        if row["queries_per_sec"] < old["queries_per_sec"] * (1 - tolerance):
+            regressions.append(f"{row['scraper']}: {old['queries_per_sec']:.1f} -> {row['queries_per_sec']:.1f} queries/sec")
+        if row["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{row['scraper']}: p95 {old['p95_ms']:.1f} -> {row['p95_ms']:.1f} ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every API scraper against the local mock server")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per scraper")
+    parser.add_argument("--threads", type=int, default=1, help="Concurrent queries per scraper")
+    parser.add_argument("--only", nargs="+", choices=sorted(SCENARIOS), help="Benchmark a subset of scrapers")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--baseline", help="Results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression (0.2 = 20%%)")
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    queries = [f"kitsch hair accessories {n}" for n in range(args.queries)]
+    names = args.only or list(SCENARIOS)
+    results = []
+
+    with tempfile.TemporaryDirectory(prefix="provider_bench_") as workdir:
+        # Dummy keys win over any .env file (load_dotenv doesn't override), and the
+        # quota ledger is a throwaway copy so benchmarks never spend real budget
+        os.environ.update(DUMMY_ENV)
+        os.environ["QUOTA_LEDGER_PATH"] = os.path.join(workdir, "quota_ledger.sqlite3")
+        from common.quota_ledger import QuotaLedger, DEFAULT_BUDGETS
+        ledger = QuotaLedger(os.environ["QUOTA_LEDGER_PATH"])
+        for provider in DEFAULT_BUDGETS:
+            ledger.set_budget(provider, None, None)
+        ledger.close()
+
+        with MockProviderServer(config_from_args(args)) as server:
+            context = multiprocessing.get_context("spawn")
+            for name in names:
+                with context.Pool(1) as pool:
+                    row = pool.apply(run_scenario, (name, server.url, queries, args.threads, workdir))
+                results.append(row)
+                print(f"{row['scraper']:22} {row['queries_per_sec']:9.1f} q/s  "
+                      f"p50 {row['p50_ms']:8.1f} ms  p95 {row['p95_ms']:8.1f} ms  p99 {row['p99_ms']:8.1f} ms  "
+                      f"ok {row['success_rate']:6.1%}  peak RSS {row['peak_rss_mb'] or 0:7.1f} MB")
+            served = server.get_stats()
+
+    print(f"Mock server: {json.dumps(served)}")
+    report = {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "settings": {"queries": args.queries, "threads": args.threads, "latency": args.latency,
+                     "error_rate": args.error_rate, "burst_every": args.burst_every, "burst_for": args.burst_for},
+        "results": results
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
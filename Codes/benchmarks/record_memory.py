@@ -0,0 +1,100 @@
+"""
+Memory benchmark: processed search items as dicts vs the slotted records.
+
+Builds N search_results items (default 100k) both ways from the checked-in
+outputs of limit.py, google-custom.py and searchapi_scraper.py. Every item is
+decoded from its own JSON text, so no strings are shared between items, just
+as with live API responses. For each representation it reports the retained
+memory (tracemalloc, after the source dicts are freed), bytes per item and
+the time to serialize the list. It also checks that the records serialize to
+exactly the same JSON as the dicts.
+
+    python benchmarks/record_memory.py [--items 100000]
+"""
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.search_records import SearchItem, to_json
+from mock_server import CODES_DIR
+
+SEED_FILES = [
+    os.path.join(CODES_DIR, "Google Custom JSON", "google", "kitsch_limited_data2.json"),
+    os.path.join(CODES_DIR, "Google Custom JSON", "google", "kitsch_search_results.json"),
+    os.path.join(CODES_DIR, "SearchAPI", "searchio", "kitsch_searchapi_data.json"),
+]
+
+
+def load_seeds():
+    """search_results items of the seed files, each as its JSON text"""
+    seeds = []
+    for path in SEED_FILES:
+        with open(path, 'r', encoding='utf-8') as f:
+            seeds.extend(json.dumps(item) for item in json.load(f)["search_results"])
+    return seeds
+
+
+def build_dicts(seeds, count):
+    return [json.loads(seeds[i % len(seeds)]) for i in range(count)]
+
+
+def build_records(seeds, count):
+    return [SearchItem.from_dict(json.loads(seeds[i % len(seeds)])) for i in range(count)]
+
+
+def measure(build, seeds, count):
+    """(items, retained bytes, build seconds)"""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    items = build(seeds, count)
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return items, retained, elapsed
+
+
+def dump_seconds(items, **kwargs):
+    started = time.perf_counter()
+    json.dumps({"search_results": items}, indent=2, ensure_ascii=False, **kwargs)
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare memory of dict and slotted search result items")
+    parser.add_argument("--items", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    seeds = load_seeds()
+    mismatched = sum(1 for text in seeds
+                     if json.dumps(SearchItem.from_dict(json.loads(text)), default=to_json) != text)
+    if mismatched:
+        print(f"{mismatched}/{len(seeds)} seed items serialize differently as records")
+        return 1
+
+    dicts, dict_bytes, dict_build = measure(build_dicts, seeds, args.items)
+    dict_dump = dump_seconds(dicts)
+    del dicts
+    records, record_bytes, record_build = measure(build_records, seeds, args.items)
+    record_dump = dump_seconds(records, default=to_json)
+    del records
+
+    print(f"{args.items} items from {len(seeds)} seed results; JSON output identical")
+    print(f"{'':8} {'MB':>9} {'B/item':>8} {'build s':>8} {'dump s':>8}")
+    for name, size, build, dump in (("dicts", dict_bytes, dict_build, dict_dump),
+                                    ("records", record_bytes, record_build, record_dump)):
+        print(f"{name:8} {size / 2 ** 20:9.1f} {size / args.items:8.0f} {build:8.2f} {dump:8.2f}")
+    print(f"Memory per 100k results: {dict_bytes * 100000 / args.items / 2 ** 20:.1f} MB -> "
+          f"{record_bytes * 100000 / args.items / 2 ** 20:.1f} MB ({1 - record_bytes / dict_bytes:.0%} less)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+Content-addressed, compressed store for raw provider payloads.
+
+Result records used to embed the whole SERP JSON (scraperapi.py's full_serp),
+so the results file was mostly raw payload and every reader held all of it in
+memory. Here a payload is serialized canonically, hashed (SHA-256) and written
+once under blobs/<first 2 hex>/<hash>.json.zst; the record only keeps the
+"sha256:<hash>" reference and the payload is loaded on demand with get().
+Identical payloads are stored once.
+
+zstd needs the zstandard package; without it blobs are written with zlib
+(.json.z) and both kinds stay readable.
+
+    python -m common.blob_store migrate results.jsonl [--field full_serp] [--root serp_blobs]
+    python -m common.blob_store stats [--root serp_blobs]
+"""
+import os
+import sys
+import json
+import zlib
+import hashlib
+import logging
+import argparse
+import tempfile
+import tracemalloc
+
+from common.result_store import ResultSink, iter_results
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOB_ROOT = "serp_blobs"
+REF_PREFIX = "sha256:"
+
+
+def _canonical(payload):
+    return json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+class BlobStore:
+    def __init__(self, root=DEFAULT_BLOB_ROOT, level=10):
+        """
+        Args:
+            root (str, optional): Directory holding the blobs
+            level (int, optional): zstd compression level
+        """
+        self.root = root
+        self.level = level
+        self.counters = {"written": 0, "deduplicated": 0, "raw_bytes": 0, "stored_bytes": 0}
+        os.makedirs(root, exist_ok=True)
+        if zstandard:
+            self._compressor = zstandard.ZstdCompressor(level=level)
+            self._decompressor = zstandard.ZstdDecompressor()
+
+    def _path(self, digest, ext):
+        return os.path.join(self.root, digest[:2], f"{digest}.json.{ext}")
+
+    def _find(self, digest):
+        for ext in ("zst", "z"):
+            path = self._path(digest, ext)
+            if os.path.isfile(path):
+                return path, ext
+        return None, None
+
+    def put(self, payload):
+        """Store a payload (once) and return its "sha256:<hash>" reference"""
+        data = _canonical(payload)
+        digest = hashlib.sha256(data).hexdigest()
+        if self._find(digest)[0]:
+            self.counters["deduplicated"] += 1
+            return REF_PREFIX + digest
+
+        if zstandard:
+            ext, blob = "zst", self._compressor.compress(data)
+        else:
+            ext, blob = "z", zlib.compress(data, 9)
+        path = self._path(digest, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        self.counters["written"] += 1
+        self.counters["raw_bytes"] += len(data)
+        self.counters["stored_bytes"] += len(blob)
+        return REF_PREFIX + digest
+
+    def get(self, ref):
+        """Load the payload behind a reference; raises KeyError if it isn't stored"""
+        digest = ref[len(REF_PREFIX):] if ref.startswith(REF_PREFIX) else ref
+        path, ext = self._find(digest)
+        if path is None:
+            raise KeyError(ref)
+        with open(path, "rb") as f:
+            blob = f.read()
+        if ext == "zst":
+            if not zstandard:
+                raise RuntimeError(f"{path} is zstd-compressed; install the zstandard package to read it")
+            data = self._decompressor.decompress(blob)
+        else:
+            data = zlib.decompress(blob)
+        return json.loads(data)
+
+    def load_field(self, record, field="full_serp"):
+        """Lazily resolve record[field], whether it is inline (old records) or a <field>_ref"""
+        if field in record:
+            return record[field]
+        ref = record.get(f"{field}_ref")
+        return self.get(ref) if ref else None
+
+    def get_stats(self):
+        """Blobs on disk plus this process's write/dedup counters"""
+        blobs = 0
+        disk_bytes = 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith((".json.zst", ".json.z")):
+                    blobs += 1
+                    disk_bytes += os.path.getsize(os.path.join(directory, name))
+        raw = self.counters["raw_bytes"]
+        return dict(
+            self.counters,
+            blobs=blobs,
+            disk_bytes=disk_bytes,
+            compression_ratio=round(raw / self.counters["stored_bytes"], 1) if self.counters["stored_bytes"] else None,
+            codec="zstd" if zstandard else "zlib"
+        )
+
+
+def _load_all(path):
+    """Peak Python heap while holding every record of a JSONL store"""
+    tracemalloc.start()
+    records = list(iter_results(path))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return peak
+
+
+def migrate(path, store, field="full_serp", output=None):
+    """
+    Move an inline payload field of every record into the blob store
+
+    The store is rewritten through a temp file and os.replace, like
+    result_store.compact.
+
+    Returns:
+        dict: records moved, and disk / RAM before and after
+    """
+    output = output or path
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output)), suffix=".jsonl.tmp")
+    os.close(fd)
+    moved = 0
+    blobs_before = store.get_stats()["disk_bytes"]
+    try:
+        with ResultSink(tmp_path, fsync_every=1000) as sink:
+            for record in iter_results(path):
+                if record.get(field) is not None:
+                    record[f"{field}_ref"] = store.put(record.pop(field))
+                    moved += 1
+                sink.write(record)
+        report = {
+            "records_moved": moved,
+            "jsonl_bytes_before": os.path.getsize(path),
+            "jsonl_bytes_after": os.path.getsize(tmp_path),
+            "blob_bytes_added": store.get_stats()["disk_bytes"] - blobs_before,
+            "ram_bytes_before": _load_all(path),
+            "ram_bytes_after": _load_all(tmp_path)
+        }
+        os.replace(tmp_path, output)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return report
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Manage the raw payload blob store")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate_cmd = commands.add_parser("migrate", help="Move inline payloads out of a JSONL store")
+    migrate_cmd.add_argument("path")
+    migrate_cmd.add_argument("--field", default="full_serp")
+    migrate_cmd.add_argument("--output")
+    migrate_cmd.add_argument("--root", default=DEFAULT_BLOB_ROOT)
+
+    stats_cmd = commands.add_parser("stats", help="Blob count and size on disk")
+    stats_cmd.add_argument("--root", default=DEFAULT_BLOB_ROOT)
+
+    args = parser.parse_args(argv)
+    store = BlobStore(args.root)
+    if args.command == "migrate":
+        report = migrate(args.path, store, args.field, args.output)
+        disk_after = report["jsonl_bytes_after"] + report["blob_bytes_added"]
+        logger.info(f"Moved {report['records_moved']} '{args.field}' payloads into {args.root}")
+        logger.info(f"Disk: {report['jsonl_bytes_before']:,} -> {disk_after:,} bytes (records + blobs)")
+        logger.info(f"RAM to load all records: {report['ram_bytes_before']:,} -> {report['ram_bytes_after']:,} bytes")
+    else:
+        logger.info(f"Blob store {args.root}: {store.get_stats()}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
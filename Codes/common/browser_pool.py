@@ -0,0 +1,124 @@
+"""
+Warm pool of long-lived browser drivers for the Selenium scrapers.
+
+Starting undetected Chrome costs several seconds and hundreds of MB, so instead
+of one browser per query the pool keeps N drivers alive, each bound to one
+proxy. Queries check a driver out and hand it back; a driver is recycled (quit
+and restarted on next use) after max_pages page loads, after a crash, or when
+the caller saw a CAPTCHA on it.
+"""
+import time
+import queue
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PooledDriver:
+    """One pool slot: a proxy and the (lazily started) driver bound to it"""
+    def __init__(self, slot_id, proxy):
+        self.slot_id = slot_id
+        self.proxy = proxy
+        self.driver = None
+        self.pages = 0
+
+
+class DriverPool:
+    def __init__(self, create_driver, proxies=None, size=2, max_pages=25, prewarm=False):
+        """
+        Args:
+            create_driver (callable): proxy -> new driver (proxy may be None)
+            proxies (list, optional): Proxy strings; slots are assigned round-robin
+            size (int, optional): Number of drivers kept alive
+            max_pages (int, optional): Page loads before a driver is recycled
+            prewarm (bool, optional): Start every driver up front instead of on first use
+        """
+        self.create_driver = create_driver
+        self.max_pages = max_pages
+        self._idle = queue.Queue()
+        self._slots = []
+        self._lock = threading.Lock()
+        self.metrics = {
+            "checkouts": 0,
+            "warm_hits": 0,
+            "cold_starts": 0,
+            "recycled": 0,
+            "startup_seconds": []
+        }
+
+        proxies = proxies or [None]
+        for slot_id in range(size):
+            slot = PooledDriver(slot_id, proxies[slot_id % len(proxies)])
+            self._slots.append(slot)
+            if prewarm:
+                self._start(slot)
+            self._idle.put(slot)
+
+    def _start(self, slot):
+        start = time.monotonic()
+        slot.driver = self.create_driver(slot.proxy)
+        slot.pages = 0
+        elapsed = time.monotonic() - start
+        with self._lock:
+            self.metrics["cold_starts"] += 1
+            self.metrics["startup_seconds"].append(elapsed)
+        logger.info(f"Started browser for slot {slot.slot_id} (proxy: {slot.proxy}) in {elapsed:.1f}s")
+
+    def _quit(self, slot):
+        if slot.driver is not None:
+            try:
+                slot.driver.quit()
+            except Exception as e:
+                logger.warning(f"Error quitting browser in slot {slot.slot_id}: {e}")
+        slot.driver = None
+        slot.pages = 0
+
+    def checkout(self, timeout=None):
+        """Take an idle driver, starting it if the slot is cold. Blocks while all are in use."""
+        slot = self._idle.get(timeout=timeout)
+        try:
+            warm = slot.driver is not None
+            if not warm:
+                self._start(slot)
+        except Exception:
+            # Keep the slot in the pool so the next checkout retries the start
+            self._idle.put(slot)
+            raise
+
+        with self._lock:
+            self.metrics["checkouts"] += 1
+            if warm:
+                self.metrics["warm_hits"] += 1
+        slot.pages += 1
+        return slot
+
+    def checkin(self, slot, recycle=False):
+        """Return a driver to the pool; recycle it on request or once it hit max_pages"""
+        if recycle or slot.pages >= self.max_pages:
+            reason = "requested" if recycle else f"{slot.pages} pages served"
+            logger.info(f"Recycling browser in slot {slot.slot_id} ({reason})")
+            self._quit(slot)
+            with self._lock:
+                self.metrics["recycled"] += 1
+        self._idle.put(slot)
+
+    def get_metrics(self):
+        """Pool hit rate and browser startup times"""
+        with self._lock:
+            startups = self.metrics["startup_seconds"]
+            checkouts = self.metrics["checkouts"]
+            return {
+                "checkouts": checkouts,
+                "warm_hits": self.metrics["warm_hits"],
+                "hit_rate": round(self.metrics["warm_hits"] / checkouts, 3) if checkouts else 0.0,
+                "cold_starts": self.metrics["cold_starts"],
+                "recycled": self.metrics["recycled"],
+                "avg_startup_seconds": round(sum(startups) / len(startups), 2) if startups else None,
+                "max_startup_seconds": round(max(startups), 2) if startups else None
+            }
+
+    def close(self):
+        """Quit every driver in the pool"""
+        for slot in self._slots:
+            self._quit(slot)
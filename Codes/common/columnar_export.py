@@ -0,0 +1,304 @@
+"""
+Columnar (Parquet) export of site-discovery results and AI Overview citations.
+
+save_results writes one nested, indented JSON document per run, which
+analytics has to parse in full. This flattens a run into typed tables:
+
+    results       one row per stored search result
+    products      one row per product in the catalog
+    collections   one row per collection
+    citations     one row per source cited by an AI Overview
+
+Each table is a Hive-partitioned Parquet dataset under <root>/<table>/,
+partitioned by run_date and provider. Low-cardinality string columns are
+dictionary-encoded and pages are zstd-compressed. A query over months of runs
+then opens only the matching partitions and reads only the columns it needs:
+
+    import pyarrow.dataset as ds
+    ds.dataset("columnar/products", partitioning="hive").to_table(
+        columns=["name", "price"], filter=ds.field("provider") == "searchapi")
+
+Re-exporting a run overwrites its own file instead of adding a duplicate.
+Needs pyarrow.
+
+    python -m common.columnar_export site kitsch_searchapi_data.json --provider searchapi [--root columnar]
+    python -m common.columnar_export overviews Selenium/ai_overview_results_selenium.jsonl ... [--root columnar]
+"""
+import os
+import re
+import sys
+import json
+import zlib
+import logging
+import argparse
+import datetime
+
+from common.result_store import iter_results
+from common.url_classifier import classify_url, canonicalize
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COLUMNAR_ROOT = "columnar"
+PARTITION_COLUMNS = ["run_date", "provider"]
+
+# Repeated values (domains, kinds, brands, run ids...) that dictionary encoding shrinks;
+# free text (titles, snippets, URLs) is left plain
+DICTIONARY_COLUMNS = ["run_id", "domain", "section", "kind", "og_type", "currency", "availability",
+                      "brand", "collection", "query"]
+
+PRICE_PATTERN = re.compile(r'\d+(?:[.,]\d+)?')
+
+
+def _schemas():
+    string, int32, float64 = pa.string(), pa.int32(), pa.float64()
+    common = [("run_id", string), ("run_date", string), ("provider", string)]
+    return {
+        "results": pa.schema(common + [
+            ("position", int32), ("title", string), ("link", string), ("domain", string),
+            ("section", string), ("kind", string), ("snippet", string), ("image", string),
+            ("description", string), ("og_type", string), ("price", float64), ("currency", string),
+            ("availability", string),
+        ]),
+        "products": pa.schema(common + [
+            ("name", string), ("url", string), ("title", string), ("description", string),
+            ("image", string), ("price", float64), ("currency", string), ("availability", string),
+            ("sku", string), ("brand", string), ("collection", string),
+        ]),
+        "collections": pa.schema(common + [
+            ("name", string), ("url", string), ("title", string), ("description", string),
+            ("product_count", int32),
+        ]),
+        "citations": pa.schema(common + [
+            ("query", string), ("extracted_at", pa.timestamp("us")), ("has_overview", pa.bool_()),
+            ("position", int32), ("url", string), ("domain", string), ("title", string),
+        ]),
+    }
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Columnar export needs pyarrow (pip install pyarrow)")
+
+
+def parse_price(value):
+    """"$1,299.00" / "12.5" / 12 -> float, or None"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = PRICE_PATTERN.search((value or "").replace(",", "") if isinstance(value, str) else "")
+    return float(match.group()) if match else None
+
+
+def _domain(url):
+    return canonicalize(url or "")[0]
+
+
+def _run_keys(timestamp):
+    """Run id and partition date from a "%Y-%m-%d %H:%M:%S" metadata timestamp"""
+    timestamp = timestamp or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return timestamp, timestamp[:10]
+
+
+def site_rows(results, provider):
+    """
+    Flatten one save_results document into table rows
+
+    Returns:
+        dict: table name -> list of row dicts
+    """
+    run_id, run_date = _run_keys(results.get("metadata", {}).get("timestamp"))
+    base = {"run_id": run_id, "run_date": run_date, "provider": provider}
+    tables = {"results": [], "products": [], "collections": []}
+
+    for position, item in enumerate(results.get("search_results", []), 1):
+        link = item.get("link", "")
+        classified = classify_url(link)
+        metadata = item.get("metadata") or {}
+        offer = item.get("structured_offer") or item.get("product_info") or {}
+        tables["results"].append(dict(
+            base,
+            position=item.get("position") or position,
+            title=item.get("title"),
+            link=link,
+            domain=classified.site,
+            section=classified.section,
+            kind=classified.kind,
+            snippet=item.get("snippet"),
+            image=item.get("image") or metadata.get("image") or None,
+            description=metadata.get("description") or None,
+            og_type=metadata.get("type") or None,
+            price=parse_price(offer.get("price") or metadata.get("price") or (item.get("rich_data") or {}).get("price")),
+            currency=offer.get("currency") or metadata.get("currency") or None,
+            availability=offer.get("availability") or metadata.get("availability") or None,
+        ))
+
+    for name, product in results.get("products", {}).items():
+        tables["products"].append(dict(
+            base,
+            name=product.get("name") or name,
+            url=product.get("url"),
+            title=product.get("title"),
+            description=product.get("description"),
+            image=product.get("image") or None,
+            price=parse_price(product.get("price")),
+            currency=product.get("currency") or None,
+            availability=product.get("availability") or None,
+            sku=product.get("sku") or None,
+            brand=product.get("brand") or None,
+            collection=product.get("collection"),
+        ))
+
+    for name, collection in results.get("collections", {}).items():
+        tables["collections"].append(dict(
+            base,
+            name=collection.get("name") or name,
+            url=collection.get("url"),
+            title=collection.get("title"),
+            description=collection.get("description"),
+            product_count=len(collection.get("products", [])),
+        ))
+    return tables
+
+
+def _timestamp(value):
+    try:
+        return datetime.datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def citation_rows(record):
+    """Rows for one AI Overview record; an overview without sources still gets one row"""
+    if "has_overview" not in record:
+        # Raw scraper record; lxml is only needed on this path
+        from common.overview_parser import parse_record
+        record = parse_record(record)
+    extracted_at = _timestamp(record.get("extractedAt"))
+    base = {
+        "run_id": record.get("extractedAt"),
+        "run_date": extracted_at.strftime("%Y-%m-%d") if extracted_at else "unknown",
+        "provider": record.get("source") or "unknown",
+        "query": record.get("searchQuery"),
+        "extracted_at": extracted_at,
+        "has_overview": record.get("has_overview", False),
+    }
+    sources = record.get("sources") or []
+    if not sources:
+        return [dict(base, position=None, url=None, domain=None, title=None)]
+    return [
+        dict(base, position=source.get("position"), url=source.get("url"),
+             domain=source.get("domain") or _domain(source.get("url")), title=source.get("title"))
+        for source in sources
+    ]
+
+
+def _answers_rows(document):
+    """Rows for search_ai-overview.py's {"ai_overviews": [{query, content, links}]} document"""
+    run_id, run_date = _run_keys(document.get("metadata", {}).get("timestamp"))
+    rows = []
+    for overview in document.get("ai_overviews", []):
+        base = {"run_id": run_id, "run_date": run_date, "provider": "serpapi_answers",
+                "query": (overview.get("query") or "").strip().strip('",'),
+                "extracted_at": _timestamp(run_id), "has_overview": bool(overview.get("content"))}
+        for position, link in enumerate(overview.get("links") or [None], 1):
+            rows.append(dict(base, position=position if link else None, url=link,
+                             domain=_domain(link) if link else None, title=None))
+    return rows
+
+
+def write_table(rows, root, table):
+    """
+    Append rows to the <root>/<table> dataset, one file per (run, partition)
+
+    Returns:
+        int: Rows written
+    """
+    _require_pyarrow()
+    if not rows:
+        return 0
+    schema = _schemas()[table]
+    arrow_table = pa.Table.from_pylist(rows, schema=schema)
+    runs = sorted({row["run_id"] or "" for row in rows})
+    # File names derive from the run ids, so re-exporting the same runs replaces their files
+    if len(runs) == 1:
+        run_tag = re.sub(r'[^0-9A-Za-z]+', '', runs[0])
+    else:
+        run_tag = f"batch{zlib.crc32(chr(0).join(runs).encode('utf-8')):08x}"
+    pq.write_to_dataset(
+        arrow_table,
+        root_path=os.path.join(root, table),
+        partition_cols=PARTITION_COLUMNS,
+        basename_template=f"{run_tag}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        use_dictionary=[name for name in DICTIONARY_COLUMNS if name in schema.names and name not in PARTITION_COLUMNS],
+        compression="zstd",
+    )
+    return len(rows)
+
+
+def export_site_results(results, provider, root=DEFAULT_COLUMNAR_ROOT):
+    """
+    Write a save_results document (dict, or path to its JSON file) as Parquet tables
+
+    Returns:
+        dict: Rows written per table
+    """
+    if isinstance(results, str):
+        with open(results, 'r', encoding='utf-8') as f:
+            results = json.load(f)
+    written = {table: write_table(rows, root, table) for table, rows in site_rows(results, provider).items()}
+    logger.info(f"Columnar export to {root}/: {written}")
+    return written
+
+
+def export_overviews(paths, root=DEFAULT_COLUMNAR_ROOT):
+    """
+    Write the AI Overview citations of result stores (JSONL, raw or normalized) or
+    search_ai-overview.py JSON documents to the citations table
+
+    Returns:
+        int: Rows written
+    """
+    rows = []
+    for path in paths:
+        if path.endswith(".json"):
+            with open(path, 'r', encoding='utf-8') as f:
+                document = json.load(f)
+            if isinstance(document, dict):
+                rows.extend(_answers_rows(document))
+            else:
+                for record in document:
+                    rows.extend(citation_rows(record))
+        else:
+            for record in iter_results(path):
+                rows.extend(citation_rows(record))
+    written = write_table(rows, root, "citations")
+    logger.info(f"Wrote {written} citation rows to {root}/citations")
+    return written
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Export results to partitioned Parquet tables")
+    parser.add_argument("--root", default=DEFAULT_COLUMNAR_ROOT)
+    commands = parser.add_subparsers(dest="command", required=True)
+    site_cmd = commands.add_parser("site", help="A save_results JSON file -> results, products, collections")
+    site_cmd.add_argument("path")
+    site_cmd.add_argument("--provider", required=True, help="e.g. google_cse or searchapi")
+    overviews_cmd = commands.add_parser("overviews", help="AI Overview result stores -> citations")
+    overviews_cmd.add_argument("paths", nargs="+")
+    args = parser.parse_args(argv)
+
+    if args.command == "site":
+        export_site_results(args.path, args.provider, args.root)
+    else:
+        export_overviews(args.paths, args.root)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
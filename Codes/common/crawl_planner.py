@@ -0,0 +1,185 @@
+"""
+Query planner for site-discovery crawls.
+
+Discovery issues many overlapping `site:` queries. The planner tracks how many
+previously unseen URLs each executed query returned (its marginal yield) and
+predicts the yield of the remaining ones. Queries predicted to return only
+already-seen URLs are skipped, the rest run best-first, and the number of API
+requests saved is reported at the end of the run.
+
+A prediction of 0 comes from one of three rules:
+    - the same query already ran this run
+    - a sweep over the same or an enclosing path ran to the end
+      (returned fewer results than requested), so every URL under it is known
+    - the same terms over an enclosing path returned no new URLs
+Otherwise the prediction is the running mean yield of queries over that path.
+
+Given a persistent history (common.url_index.UrlIndex), a query that already
+ran within `refresh_after` seconds in an earlier run is predicted 0 as well,
+so refresh crawls only re-run stale or never-run queries.
+
+A query whose request failed (an error page, a 429, a spent quota) teaches
+the planner nothing: it neither marks its path as swept nor counts as run,
+here or in the history, so a transient failure can't end the crawl early.
+"""
+import re
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+SITE_PATTERN = re.compile(r'site:(\S+)')
+
+
+class PlannedQuery:
+    """A candidate query; `results` > 10 means a multi-page sweep"""
+    def __init__(self, query, results=10, results_per_page=10):
+        self.query = query
+        self.results = results
+        self.results_per_page = results_per_page
+        self.pages = max(1, (results + results_per_page - 1) // results_per_page)
+
+        match = SITE_PATTERN.search(query)
+        site = match.group(1) if match else ""
+        _, _, path = site.partition('/')
+        self.scope = '/' + path.strip('/') if path.strip('/') else '/'
+        self.terms = " ".join(sorted(SITE_PATTERN.sub("", query).lower().split()))
+        self.key = (self.scope, self.terms, self.pages)
+
+    def __repr__(self):
+        return f"PlannedQuery({self.query!r}, results={self.results})"
+
+
+def _within(scope, enclosing):
+    """True if path scope lies under (or equals) the enclosing scope"""
+    if enclosing == '/':
+        return True
+    return scope == enclosing or scope.startswith(enclosing + '/')
+
+
+class CrawlPlanner:
+    def __init__(self, min_yield=0.05, smoothing=0.5, history=None, refresh_after=None):
+        """
+        Args:
+            min_yield (float, optional): Skip queries whose predicted share of new URLs is below this
+            smoothing (float, optional): Weight of the newest observation in the per-path running mean
+            history (UrlIndex, optional): Remembers when each query last ran, across runs
+            refresh_after (float, optional): Seconds before a query recorded in history is worth re-running
+        """
+        self.min_yield = min_yield
+        self.smoothing = smoothing
+        self.history = history
+        self.refresh_after = refresh_after
+        self.seen_urls = set()
+        self.executed = {}
+        self.exhausted_scopes = set()
+        self.scope_yield = {}
+        self.term_yield = {}
+        self.skipped = []
+        self.failed = []
+        self.requests_used = 0
+
+    def predict_yield(self, planned):
+        """Predicted share of previously unseen URLs this query would return"""
+        if planned.key in self.executed:
+            return 0.0, "already run"
+
+        if self.history is not None and self.refresh_after:
+            last_run = self.history.last_run(planned.query, planned.pages)
+            if last_run is not None and time.time() - last_run < self.refresh_after:
+                return 0.0, f"ran {(time.time() - last_run) / 3600:.1f}h ago, still fresh"
+
+        for scope in self.exhausted_scopes:
+            if _within(planned.scope, scope):
+                return 0.0, f"{scope} already swept to the end"
+
+        if planned.terms:
+            for (scope, terms), new_share in self.term_yield.items():
+                if terms == planned.terms and new_share == 0.0 and _within(planned.scope, scope):
+                    return 0.0, f"'{terms}' over {scope} found nothing new"
+
+        # Mean yield of the closest enclosing path with history; unknown paths are worth trying
+        best = None
+        for scope, mean in self.scope_yield.items():
+            if _within(planned.scope, scope) and (best is None or len(scope) > len(best[0])):
+                best = (scope, mean)
+        return (best[1] if best else 1.0), "estimate"
+
+    def record(self, planned, urls, requests_used=None, failed=False):
+        """
+        Update yield statistics with the URLs a query returned
+
+        Args:
+            failed (bool, optional): The query stopped on a failed request; its URLs
+                                     still count as seen, but nothing else is learned
+        """
+        urls = [url for url in urls if url]
+        new_urls = [url for url in urls if url not in self.seen_urls]
+        self.seen_urls.update(urls)
+        new_share = len(new_urls) / len(urls) if urls else 0.0
+
+        if requests_used is None:
+            # Pagination stops after the first short (or failed) page
+            requests_used = min(planned.pages, len(urls) // planned.results_per_page + 1)
+        self.requests_used += requests_used
+        if failed:
+            # A partial list is not a short last page: don't mark the path swept or the query fresh
+            self.failed.append(planned.query)
+            logger.warning(f"'{planned.query}' failed after {len(urls)} URLs; it can run again later")
+            return new_urls
+
+        self.executed[planned.key] = new_share
+        if planned.terms:
+            self.term_yield[(planned.scope, planned.terms)] = new_share
+        elif len(urls) < planned.results:
+            # A bare sweep whose last page came back short has listed everything under its path
+            self.exhausted_scopes.add(planned.scope)
+
+        if self.history is not None:
+            self.history.record_query(planned.query, planned.pages, len(urls))
+
+        previous = self.scope_yield.get(planned.scope, new_share)
+        self.scope_yield[planned.scope] = self.smoothing * new_share + (1 - self.smoothing) * previous
+
+        logger.info(f"'{planned.query}': {len(new_urls)} new of {len(urls)} URLs")
+        return new_urls
+
+    def run(self, queries, execute):
+        """
+        Execute queries best-predicted-yield first, skipping predicted-redundant ones
+
+        Args:
+            queries (list): PlannedQuery candidates
+            execute (callable): PlannedQuery -> list of result URLs, or None if any
+                                request failed (nothing is learned from it)
+        """
+        pending = list(queries)
+        while pending:
+            # Re-score every step: each executed query changes the predictions
+            scored = [(self.predict_yield(planned), index) for index, planned in enumerate(pending)]
+            (predicted, reason), index = max(scored, key=lambda item: (item[0][0], -item[1]))
+            planned = pending.pop(index)
+
+            if predicted < self.min_yield:
+                self.skipped.append({"query": planned.query, "reason": reason, "requests_saved": planned.pages})
+                logger.info(f"Skipping '{planned.query}' ({reason})")
+                continue
+
+            urls = execute(planned)
+            if urls is None:
+                self.record(planned, [], failed=True)
+            else:
+                self.record(planned, urls)
+
+    def get_report(self):
+        """Requests spent and saved this run"""
+        saved = sum(skip["requests_saved"] for skip in self.skipped)
+        return {
+            "queries_executed": len(self.executed),
+            "queries_skipped": len(self.skipped),
+            "queries_failed": len(self.failed),
+            "requests_used": self.requests_used,
+            "requests_saved": saved,
+            "unique_urls": len(self.seen_urls),
+            "skipped": self.skipped
+        }
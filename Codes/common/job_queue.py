@@ -0,0 +1,251 @@
+"""
+SQLite-backed job queue with leases, for sharing one query backlog between workers.
+
+A producer enqueues queries (duplicates are ignored, so re-running it is
+safe). Workers lease a batch of jobs for a visibility timeout, execute them
+and ack each one together with its result record in the same transaction,
+which doubles as the progress checkpoint. A worker that dies simply stops
+renewing its leases; once they expire the jobs become visible again and
+another worker picks them up. Jobs that fail max_attempts times are parked as
+"failed" instead of looping forever.
+
+Any number of processes can share the database file, on one machine or on
+several machines mounting it from a filesystem with working POSIX locks.
+
+    python -m common.job_queue enqueue queries.txt [--queue ai_overview] [--db jobs.sqlite3]
+    python -m common.job_queue status [--queue ai_overview]
+    python -m common.job_queue export results.jsonl [--queue ai_overview]
+    python -m common.job_queue retry-failed [--queue ai_overview]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import logging
+import argparse
+
+from common.result_store import ResultSink
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_PATH = "jobs.sqlite3"
+DEFAULT_QUEUE = "ai_overview"
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+def worker_id():
+    """Unique per process and machine"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    def __init__(self, path=DEFAULT_QUEUE_PATH, visibility_timeout=300, max_attempts=3):
+        """
+        Args:
+            path (str, optional): SQLite database shared by producer and workers
+            visibility_timeout (float, optional): Seconds a lease lasts before the job is handed out again
+            max_attempts (int, optional): Leases per job before it is marked failed
+        """
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                queue TEXT NOT NULL,
+                query TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                UNIQUE (queue, query)
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (queue, status, lease_expires)")
+
+    def _transaction(self):
+        """BEGIN IMMEDIATE takes the write lock up front, so two workers can't lease the same row"""
+        db = self._db
+
+        class Transaction:
+            def __enter__(self):
+                db.execute("BEGIN IMMEDIATE")
+                return db
+
+            def __exit__(self, exc_type, *exc):
+                db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+        return Transaction()
+
+    def enqueue(self, queries, queue=DEFAULT_QUEUE):
+        """Add queries; ones already in the queue (in any state) are skipped. Returns the number added."""
+        now = time.time()
+        with self._transaction() as db:
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO jobs (queue, query, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                [(queue, query, now, now) for query in queries]
+            )
+            return db.total_changes - before
+
+    def lease(self, owner, queue=DEFAULT_QUEUE, limit=1):
+        """
+        Lease up to `limit` ready jobs: pending ones, or leased ones whose lease expired
+
+        Returns:
+            list: (job_id, query) pairs now owned by `owner`
+        """
+        now = time.time()
+        with self._transaction() as db:
+            # Expired leases that already used every attempt are parked instead of re-leased
+            db.execute(
+                "UPDATE jobs SET status = ?, error = 'lease expired on last attempt', updated_at = ? "
+                "WHERE queue = ? AND status = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, now, queue, LEASED, now, self.max_attempts)
+            )
+            rows = db.execute(
+                "SELECT id, query FROM jobs WHERE queue = ? AND "
+                "(status = ? OR (status = ? AND lease_expires < ?)) ORDER BY id LIMIT ?",
+                (queue, PENDING, LEASED, now, limit)
+            ).fetchall()
+            db.executemany(
+                "UPDATE jobs SET status = ?, lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                [(LEASED, owner, now + self.visibility_timeout, now, job_id) for job_id, _ in rows]
+            )
+        return rows
+
+    def extend(self, job_id, owner):
+        """Renew a lease for long-running work; False if the lease was lost to another worker"""
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = ?",
+                (now + self.visibility_timeout, now, job_id, owner, LEASED)
+            )
+            return cursor.rowcount == 1
+
+    def ack(self, job_id, owner, result=None):
+        """Mark a job done and checkpoint its result; False if the lease was lost meanwhile"""
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, lease_owner = NULL, "
+                "lease_expires = NULL, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = ?",
+                (DONE, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 now, job_id, owner, LEASED)
+            )
+            return cursor.rowcount == 1
+
+    def nack(self, job_id, owner, error=None, retry=True, refund_attempt=False):
+        """
+        Give a job back after a failure
+
+        Args:
+            retry (bool, optional): Make it pending again (until max_attempts), else mark it failed
+            refund_attempt (bool, optional): Don't count this lease against max_attempts
+                                             (e.g. the provider's quota ran out, not the job's fault)
+        """
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND lease_owner = ? AND status = ?",
+                (job_id, owner, LEASED)
+            ).fetchone()
+            if row is None:
+                return False
+            attempts = row[0] - 1 if refund_attempt else row[0]
+            status = PENDING if retry and attempts < self.max_attempts else FAILED
+            db.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, error = ?, lease_owner = NULL, "
+                "lease_expires = NULL, updated_at = ? WHERE id = ?",
+                (status, attempts, error, now, job_id)
+            )
+            return True
+
+    def retry_failed(self, queue=DEFAULT_QUEUE):
+        """Reset failed jobs to pending with a fresh attempt budget; returns how many"""
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, updated_at = ? WHERE queue = ? AND status = ?",
+                (PENDING, time.time(), queue, FAILED)
+            )
+            return cursor.rowcount
+
+    def get_progress(self, queue=DEFAULT_QUEUE):
+        """Job counts per status, with expired leases reported separately"""
+        now = time.time()
+        rows = self._db.execute(
+            "SELECT CASE WHEN status = ? AND lease_expires < ? THEN 'expired' ELSE status END, COUNT(*) "
+            "FROM jobs WHERE queue = ? GROUP BY 1",
+            (LEASED, now, queue)
+        ).fetchall()
+        progress = {PENDING: 0, LEASED: 0, "expired": 0, DONE: 0, FAILED: 0}
+        progress.update(dict(rows))
+        progress["total"] = sum(count for status, count in rows)
+        return progress
+
+    def iter_results(self, queue=DEFAULT_QUEUE):
+        """Yield the checkpointed result record of every done job, in enqueue order"""
+        cursor = self._db.execute(
+            "SELECT result FROM jobs WHERE queue = ? AND status = ? AND result IS NOT NULL ORDER BY id",
+            (queue, DONE)
+        )
+        for (result,) in cursor:
+            yield json.loads(result)
+
+    def close(self):
+        self._db.close()
+
+
+def read_queries(path):
+    """One query per line; blank lines and #-comments are skipped"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Manage the shared query queue")
+    parser.add_argument("--db", default=DEFAULT_QUEUE_PATH)
+    parser.add_argument("--queue", default=DEFAULT_QUEUE)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_cmd = commands.add_parser("enqueue", help="Load queries from a file (one per line)")
+    enqueue_cmd.add_argument("path")
+    commands.add_parser("status", help="Job counts per status")
+    export_cmd = commands.add_parser("export", help="Write the results of done jobs to JSONL")
+    export_cmd.add_argument("output")
+    commands.add_parser("retry-failed", help="Give failed jobs a fresh attempt budget")
+
+    args = parser.parse_args(argv)
+    jobs = JobQueue(args.db)
+    if args.command == "enqueue":
+        queries = read_queries(args.path)
+        logger.info(f"Enqueued {jobs.enqueue(queries, args.queue)} of {len(queries)} queries into '{args.queue}'")
+    elif args.command == "export":
+        with ResultSink(args.output, fsync_every=1000) as sink:
+            for record in jobs.iter_results(args.queue):
+                sink.write(record)
+        logger.info(f"Exported {sink.written} results to {args.output}")
+    elif args.command == "retry-failed":
+        logger.info(f"Re-queued {jobs.retry_failed(args.queue)} failed jobs")
+    logger.info(f"Queue '{args.queue}': {jobs.get_progress(args.queue)}")
+    jobs.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
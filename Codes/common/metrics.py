@@ -0,0 +1,211 @@
+"""
+Per-stage timing and counters for the scrapers, exported in Prometheus text format.
+
+Code wraps each stage of a request (network call, JSON decoding, item
+processing, categorization, saving) in a timer labelled with the stage and
+the provider:
+
+    with metrics.stage("decode", "google_cse"):
+        data = response.json()
+    metrics.inc("scraper_requests_total", provider="google_cse", status=200)
+
+Metrics are off unless one of these is set, and when off stage() returns a
+shared no-op context manager, so the instrumentation costs a method call:
+
+    SCRAPER_METRICS_FILE=metrics.prom   write the metrics at exit (node_exporter textfile format)
+    SCRAPER_METRICS_PORT=9108           serve them at http://localhost:9108/metrics while running
+"""
+import os
+import atexit
+import bisect
+import logging
+import threading
+from time import perf_counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans a JSON decode (sub-millisecond) up to a browser page load
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HELP = {
+    "scraper_stage_seconds": "Time spent per scraper stage",
+    "scraper_stage_errors_total": "Stages that raised an exception",
+    "scraper_requests_total": "Provider responses by HTTP status",
+    "scraper_items_total": "Search result items processed",
+    "scraper_pages_total": "Browser and HTTP-first page loads by readiness state",
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _NullStage:
+    """What stage() returns while metrics are disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("registry", "labels", "started")
+
+    def __init__(self, registry, labels):
+        self.registry = registry
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.registry._observe("scraper_stage_seconds", self.labels, perf_counter() - self.started)
+        if exc_type is not None:
+            self.registry._inc("scraper_stage_errors_total", self.labels, 1)
+        return False
+
+
+class MetricsRegistry:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def stage(self, stage, provider):
+        """Context manager timing one stage into scraper_stage_seconds{stage, provider}"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, (("provider", provider), ("stage", stage)))
+
+    def inc(self, name, amount=1, **labels):
+        if self.enabled:
+            self._inc(name, tuple(sorted((key, str(value)) for key, value in labels.items())), amount)
+
+    def observe(self, name, value, **labels):
+        if self.enabled:
+            self._observe(name, tuple(sorted((key, str(value)) for key, value in labels.items())), value)
+
+    def _inc(self, name, labels, amount):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def _observe(self, name, labels, value):
+        key = (name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            histograms = [(key, list(h.buckets), list(h.counts), h.sum, h.count) for key, h in histograms]
+
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), buckets, counts, total, count in histograms:
+            describe(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', repr(float(bound))))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the metrics atomically, so a scraping textfile collector never sees half a file"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve /metrics from a background thread"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.render().encode('utf-8')
+                self.send_response(200 if self.path.startswith("/metrics") else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+
+
+def configure_from_env(registry):
+    """Enable the registry if SCRAPER_METRICS_FILE or SCRAPER_METRICS_PORT is set"""
+    path = os.getenv("SCRAPER_METRICS_FILE")
+    port = os.getenv("SCRAPER_METRICS_PORT")
+    if not (path or port):
+        return registry
+    registry.enabled = True
+    if path:
+        atexit.register(registry.write, path)
+    if port:
+        try:
+            registry.serve(int(port))
+        except OSError as e:
+            logger.warning(f"Metrics endpoint on port {port} unavailable: {e}")
+    return registry
+
+
+metrics = configure_from_env(MetricsRegistry())
@@ -0,0 +1,242 @@
+"""
+Normalize stored AI Overview results from every scraper into one compact record.
+
+Each scraper stores something different: selenium.py raw ai_html/ai_text,
+test_pw.py raw_html/plain_text/hyperlinks, scraperapi.py its ai_overview next
+to the raw SERP (full_serp, or a full_serp_ref into the blob store),
+serp-api.py SerpApi's ai_overview fields merged into the record. parse_record
+turns any of them into:
+
+    {
+        "searchQuery", "extractedAt", "source",
+        "has_overview": bool,
+        "summary": [paragraph, ...],
+        "lists": [[item, ...], ...],
+        "sources": [{"position", "title", "url", "domain"}, ...],
+        "links": [{"url", "text"}, ...]
+    }
+
+HTML goes through XPath expressions compiled once per process; JSON payloads
+are read from their text_blocks/references. Backfills run in a process pool:
+
+    python -m common.overview_parser Selenium/ai_overview_results_selenium.jsonl \\
+        Playwright/ai_overview_results_playwright.jsonl -o normalized.jsonl [--workers 8]
+"""
+import os
+import sys
+import logging
+import argparse
+from itertools import islice
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ProcessPoolExecutor
+
+import lxml.html
+from lxml import etree
+
+from common.providers import extract_text_and_links
+from common.result_store import ResultSink, iter_results
+
+logger = logging.getLogger(__name__)
+
+_BLOCK_TAGS = ["p", "div", "h1", "h2", "h3", "h4", "h5", "h6", "li", "ul", "ol", "table"]
+_HAS_BLOCK = " or ".join(f".//{tag}" for tag in _BLOCK_TAGS)
+_PARAGRAPH_TAGS = " or ".join(f"self::{tag}" for tag in ["p", "div", "h1", "h2", "h3", "h4", "h5", "h6"])
+
+# Leaf text blocks (no block-level descendants) outside of lists, in document order
+PARAGRAPHS = etree.XPath(f"//*[{_PARAGRAPH_TAGS}][not(ancestor::ul or ancestor::ol)][not({_HAS_BLOCK})]")
+# Outermost lists only; nested lists are flattened into their parent's items
+LISTS = etree.XPath("//ul[not(ancestor::ul or ancestor::ol)] | //ol[not(ancestor::ul or ancestor::ol)]")
+LIST_ITEMS = etree.XPath("./li")
+ANCHORS = etree.XPath("//a[@href]")
+
+# Headings and UI chrome that aren't part of the summary
+NOISE_TEXT = {"AI Overview", "AI-powered overview", "Show more", "Show all", "Learn more",
+              "Generative AI is experimental."}
+
+INTERNAL_HOSTS = ("google.com", "gstatic.com", "googleusercontent.com")
+
+
+def _clean(text):
+    return " ".join((text or "").split())
+
+
+def _real_url(href):
+    """Unwrap Google /url?q= redirects; None for relative or non-http links"""
+    if href.startswith("/url?") or "google.com/url?" in href:
+        target = parse_qs(urlsplit(href).query).get("q") or parse_qs(urlsplit(href).query).get("url")
+        href = target[0] if target else href
+    return href if href.startswith("http") else None
+
+
+def _domain(url):
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def _is_internal(url):
+    host = urlsplit(url).hostname or ""
+    return any(host == h or host.endswith("." + h) for h in INTERNAL_HOSTS)
+
+
+def _add_link(links, sources, url, text):
+    """Record an outbound link; the first link to each external domain becomes a cited source"""
+    if not url or _is_internal(url):
+        return
+    if url not in {link["url"] for link in links}:
+        links.append({"url": url, "text": text})
+    domain = _domain(url)
+    if domain not in {source["domain"] for source in sources}:
+        sources.append({"position": len(sources) + 1, "title": text, "url": url, "domain": domain})
+
+
+def parse_html(overview_html):
+    """
+    Structure an AI Overview HTML block (or fragment)
+
+    Returns:
+        dict: summary, lists, sources and links
+    """
+    root = lxml.html.fromstring(overview_html)
+    etree.strip_elements(root, "script", "style", "noscript", with_tail=False)
+
+    summary = []
+    for el in PARAGRAPHS(root):
+        text = _clean(el.text_content())
+        # A block made only of links is a row of citation chips, not prose
+        if text == _clean("".join(a.text_content() for a in el.iter("a"))):
+            continue
+        if text not in NOISE_TEXT and (not summary or summary[-1] != text):
+            summary.append(text)
+
+    lists = []
+    for el in LISTS(root):
+        items = [_clean(li.text_content()) for li in LIST_ITEMS(el)]
+        items = [item for item in items if item]
+        if items:
+            lists.append(items)
+
+    links, sources = [], []
+    for a in ANCHORS(root):
+        text = _clean(a.text_content()) or a.get("aria-label") or ""
+        _add_link(links, sources, _real_url(a.get("href")), text)
+
+    return {"summary": summary, "lists": lists, "sources": sources, "links": links}
+
+
+def parse_payload(payload):
+    """
+    Structure a JSON AI Overview (SerpApi text_blocks/references, or any nested dict)
+
+    Returns:
+        dict: summary, lists, sources and links
+    """
+    summary, lists, links, sources = [], [], [], []
+    blocks = payload.get("text_blocks") if isinstance(payload, dict) else None
+
+    if blocks:
+        for block in blocks:
+            if block.get("type") == "list" or "list" in block:
+                items = [_clean(" ".join(filter(None, [item.get("title"), item.get("snippet")])))
+                         for item in block.get("list", [])]
+                items = [item for item in items if item]
+                if items:
+                    lists.append(items)
+            text = _clean(block.get("snippet"))
+            if text and text not in NOISE_TEXT:
+                summary.append(text)
+        for reference in payload.get("references", []):
+            _add_link(links, sources, reference.get("link"), reference.get("title") or reference.get("source") or "")
+    else:
+        # Unknown shape (e.g. ScraperAPI's generative block): text fields become paragraphs
+        text, urls = extract_text_and_links(payload)
+        summary = [line for line in (_clean(t) for t in text.split("\n")) if line and line not in NOISE_TEXT]
+        for url in urls:
+            _add_link(links, sources, url, "")
+
+    return {"summary": summary, "lists": lists, "sources": sources, "links": links}
+
+
+def detect_source(record):
+    if "ai_html" in record:
+        return "selenium"
+    if "raw_html" in record:
+        return "playwright"
+    if "full_serp" in record or "full_serp_ref" in record:
+        return "scraperapi"
+    return "serpapi"
+
+
+def parse_record(record):
+    """Normalize one stored result record from any scraper"""
+    source = detect_source(record)
+    parsed = {"summary": [], "lists": [], "sources": [], "links": []}
+    try:
+        if source == "selenium" and record.get("ai_html"):
+            parsed = parse_html(record["ai_html"])
+        elif source == "playwright" and record.get("raw_html"):
+            parsed = parse_html(record["raw_html"])
+            for link in record.get("hyperlinks") or []:
+                _add_link(parsed["links"], parsed["sources"], _real_url(link.get("url") or ""), _clean(link.get("text")))
+        elif source == "scraperapi" and record.get("ai_overview"):
+            parsed = parse_payload(record["ai_overview"])
+        elif source == "serpapi":
+            parsed = parse_payload(record)
+    except (etree.ParserError, ValueError) as e:
+        logger.warning(f"Could not parse {source} record for '{record.get('searchQuery')}': {e}")
+
+    return {
+        "searchQuery": record.get("searchQuery"),
+        "extractedAt": record.get("extractedAt"),
+        "source": source,
+        "has_overview": bool(parsed["summary"] or parsed["lists"]),
+        **parsed
+    }
+
+
+def normalize_files(paths, output, workers=None, chunksize=32):
+    """
+    Parse every record of one or more JSONL stores in a process pool
+
+    Records are submitted in bounded batches so a large backfill never sits in
+    memory all at once; output order matches input order.
+
+    Returns:
+        tuple: (records written, records with an overview)
+    """
+    workers = workers or os.cpu_count() or 1
+    batch_size = workers * chunksize * 4
+    written = with_overview = 0
+
+    def records():
+        for path in paths:
+            yield from iter_results(path)
+
+    source = records()
+    with ProcessPoolExecutor(max_workers=workers) as pool, ResultSink(output, fsync_every=1000) as sink:
+        while True:
+            batch = list(islice(source, batch_size))
+            if not batch:
+                break
+            for normalized in pool.map(parse_record, batch, chunksize=chunksize):
+                sink.write(normalized)
+                written += 1
+                with_overview += normalized["has_overview"]
+            logger.info(f"Normalized {written} records")
+    return written, with_overview
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Normalize stored AI Overview results")
+    parser.add_argument("inputs", nargs="+", help="JSONL result stores from any scraper")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--chunksize", type=int, default=32)
+    args = parser.parse_args(argv)
+
+    written, with_overview = normalize_files(args.inputs, args.output, args.workers, args.chunksize)
+    logger.info(f"Wrote {written} normalized records ({with_overview} with an overview) to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+Speculative parallel pagination.
+
+Instead of fetching page 1, sleeping, fetching page 2, ... the pages are
+requested concurrently (bounded by max_parallel and a rate limiter). As soon as
+a page turns out to be the last one, requests for later pages that haven't
+started yet are cancelled, and responses for pages past the end are dropped.
+Results are merged in page order regardless of completion order.
+"""
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+def fetch_pages(fetch_page, pages, is_last_page, max_parallel=4, rate_limiter=None):
+    """
+    Fetch pages concurrently and return them in page order
+
+    Args:
+        fetch_page (callable): page key -> response dict
+        pages (list): Page keys in order (e.g. start indexes or page numbers)
+        is_last_page (callable): response -> True when no later page can have results
+                                 (also True for error / quota responses)
+        max_parallel (int, optional): Pages in flight at once; 1 fetches sequentially
+        rate_limiter (TokenBucket, optional): Acquired before every request
+
+    Returns:
+        list: (page key, response) tuples in page order, ending with the last page
+    """
+    def run(page):
+        if rate_limiter:
+            rate_limiter.acquire()
+        return fetch_page(page)
+
+    responses = {}
+    last_index = len(pages) - 1
+    next_index = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as executor:
+        in_flight = {}
+
+        def fill_window():
+            nonlocal next_index
+            while next_index <= last_index and len(in_flight) < max_parallel:
+                in_flight[executor.submit(run, pages[next_index])] = next_index
+                next_index += 1
+
+        fill_window()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = in_flight.pop(future)
+                if future.cancelled():
+                    continue
+                responses[index] = future.result()
+                if index < last_index and is_last_page(responses[index]):
+                    last_index = index
+                    # Pages past the end: cancel the ones that haven't started
+                    for pending, pending_index in list(in_flight.items()):
+                        if pending_index > last_index and pending.cancel():
+                            del in_flight[pending]
+            fill_window()
+
+    return [(pages[i], responses[i]) for i in sorted(responses) if i <= last_index]
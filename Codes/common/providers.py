@@ -0,0 +1,442 @@
+"""
+Common AIOverviewProvider interface over the standalone scraper scripts, plus a
+router that sends each query to the cheapest (or fastest) healthy provider.
+
+Every provider returns the same normalized record:
+
+    {
+        "searchQuery": str,
+        "provider": str,
+        "extractedAt": ISO timestamp,
+        "status": "hit" | "miss" | "error" | "quota_exceeded",
+        "ai_text": str or None,
+        "ai_html": str or None,
+        "links": [str, ...],
+        "error": str or None,
+        "raw": backend-specific AI Overview payload (never the full SERP)
+    }
+"""
+import os
+import sys
+import time
+import asyncio
+import datetime
+import logging
+import threading
+import importlib.util
+from collections import deque
+
+from dotenv import load_dotenv
+
+from common.quota_ledger import BudgetExceeded
+
+logger = logging.getLogger(__name__)
+
+CODES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HIT = "hit"
+MISS = "miss"
+ERROR = "error"
+QUOTA_EXCEEDED = "quota_exceeded"
+
+
+class ProviderUnavailable(Exception):
+    """Raised when a provider cannot run at all (missing key, dependency or script)"""
+
+
+def load_script(relative_path, module_name):
+    """
+    Import one of the standalone scraper scripts by path
+
+    The scripts live in per-provider folders and some have names that are not
+    valid module names (serp-api.py, search_ai-overview.py), so they are loaded
+    from their file under a private module name.
+    """
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    path = os.path.join(CODES_DIR, relative_path)
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    except (Exception, SystemExit) as e:
+        raise ProviderUnavailable(f"Could not load {relative_path}: {e}") from e
+
+    sys.modules[module_name] = module
+    return module
+
+
+def extract_text_and_links(payload):
+    """Collect readable text and outbound links from a nested AI Overview payload"""
+    texts = []
+    links = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if isinstance(value, str):
+                    if key in ("link", "url", "href") and value.startswith("http"):
+                        links.append(value)
+                    elif key in ("text", "snippet", "summary", "answer", "content", "title"):
+                        texts.append(value)
+                else:
+                    walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+        elif isinstance(node, str):
+            texts.append(node)
+
+    walk(payload)
+    return "\n".join(t for t in texts if t.strip()), list(dict.fromkeys(links))
+
+
+class AIOverviewProvider:
+    """
+    Base class for AI Overview backends
+
+    Subclasses implement _fetch(query) and return (status, fields) where fields
+    holds any of ai_text, ai_html, links, error and raw.
+    """
+    name = None
+    # Estimated spend per request in USD (API price or proxy bandwidth)
+    cost_per_query = 0.0
+    # Latency prior in seconds, used until real measurements exist
+    expected_latency = 5.0
+
+    def __init__(self, cost_per_query=None, max_queries=None, cache=None):
+        if cost_per_query is not None:
+            self.cost_per_query = cost_per_query
+        # Per-run budget; None means the provider has no quota of its own
+        self.max_queries = max_queries
+        # Optional ResponseCache for providers whose scripts support one
+        self.cache = cache
+
+    def fetch(self, query):
+        """Fetch the AI Overview for a query and return a normalized record"""
+        record = {
+            "searchQuery": query,
+            "provider": self.name,
+            "extractedAt": datetime.datetime.now().isoformat(),
+            "status": ERROR,
+            "ai_text": None,
+            "ai_html": None,
+            "links": [],
+            "error": None,
+            "raw": None
+        }
+        try:
+            status, fields = self._fetch(query)
+        except ProviderUnavailable:
+            raise
+        except Exception as e:
+            status, fields = ERROR, {"error": str(e)}
+
+        record["status"] = status
+        record.update(fields)
+        return record
+
+    def _fetch(self, query):
+        raise NotImplementedError
+
+
+class SerpAPIProvider(AIOverviewProvider):
+    """serp-api.py: SerpAPI's google engine, reading the native ai_overview block"""
+    name = "serpapi"
+    cost_per_query = 0.015
+    expected_latency = 3.0
+
+    def _fetch(self, query):
+        module = load_script("SerpAPI/serp-api.py", "_serpapi_script")
+        load_dotenv()
+        api_key = os.getenv("SERPAPI_API_KEY")
+        if not api_key:
+            raise ProviderUnavailable("SERPAPI_API_KEY not set")
+
+        try:
+            result = module.extract_ai_overview_full(query, api_key, self.cache)
+        except BudgetExceeded:
+            return QUOTA_EXCEEDED, {}
+        except module.SerpApiError as e:
+            # A bad key or exhausted account must fall through to the next provider, not read as a miss
+            return (QUOTA_EXCEEDED if e.out_of_searches else ERROR), {"error": str(e)}
+        if not result:
+            return MISS, {}
+
+        overview = {k: v for k, v in result.items() if k not in ("searchQuery", "extractedAt")}
+        text, links = extract_text_and_links(overview)
+        return HIT, {"ai_text": text, "links": links, "raw": overview}
+
+
+class SerpAPIAnswersProvider(AIOverviewProvider):
+    """search_ai-overview.py: GoogleAIOverviewScraper (answer box / knowledge graph fallbacks)"""
+    name = "serpapi_answers"
+    cost_per_query = 0.015
+    expected_latency = 3.0
+
+    def __init__(self, cost_per_query=None, max_queries=20, cache=None):
+        super().__init__(cost_per_query, max_queries, cache)
+        self._scraper = None
+
+    def _fetch(self, query):
+        if self._scraper is None:
+            module = load_script("SearchAPI/search_ai-overview.py", "_search_ai_overview_script")
+            try:
+                self._scraper = module.GoogleAIOverviewScraper(max_queries=self.max_queries, cache=self.cache)
+            except ValueError as e:
+                raise ProviderUnavailable(str(e)) from e
+
+        # The scraper skips queries it has already seen, but retries and repeats
+        # routed here must really run (cache hits still cost nothing)
+        with self._scraper._lock:
+            self._scraper.processed_queries.discard(query)
+
+        response = self._scraper.search_and_extract_ai_overview(query)
+        if "ai_overview" in response:
+            overview = response["ai_overview"]
+            return HIT, {"ai_text": overview["content"], "links": overview["links"], "raw": overview}
+        if "quota_exceeded" in response:
+            return QUOTA_EXCEEDED, {}
+        if "error" in response:
+            return ERROR, {"error": str(response["error"])}
+        if "skipped" in response:
+            # Lost a race with a concurrent call for the same query: not an answer
+            return ERROR, {"error": "query skipped as already processed"}
+        return MISS, {}
+
+
+class ScraperAPIProvider(AIOverviewProvider):
+    """scraperapi.py: ScraperAPI structured Google search endpoint"""
+    name = "scraperapi"
+    cost_per_query = 0.0025
+    expected_latency = 8.0
+
+    def _fetch(self, query):
+        module = load_script("ScraperAPI/scraperapi.py", "_scraperapi_script")
+        record = module.fetch_google_ai_overview(query, cache=self.cache)
+        if record is None:
+            return ERROR, {"error": "ScraperAPI request failed"}
+        if not record["ai_overview"]:
+            return MISS, {}
+
+        text, links = extract_text_and_links(record["ai_overview"])
+        return HIT, {"ai_text": text, "links": links, "raw": record["ai_overview"]}
+
+
+class SeleniumProvider(AIOverviewProvider):
+    """selenium.py: undetected Chrome with CSS selectors and an lxml marker-text fallback"""
+    name = "selenium"
+    cost_per_query = 0.0
+    expected_latency = 20.0
+
+    def _fetch(self, query):
+        # Loaded under another name so it doesn't shadow the real selenium package
+        module = load_script("Selenium/selenium.py", "_selenium_script")
+        result = module.scrape_ai_overview(query)
+        if result["ai_html"]:
+            return HIT, {"ai_text": result["ai_text"], "ai_html": result["ai_html"]}
+        if result["ai_text"]:
+            # ai_text without html carries "CAPTCHA encountered" or "Error: ..."
+            return ERROR, {"error": result["ai_text"]}
+        return MISS, {}
+
+
+class PlaywrightProvider(AIOverviewProvider):
+    """test_pw.py: Playwright with stealth, 2Captcha and Bright Data residential proxies"""
+    name = "playwright"
+    # Residential proxy bandwidth for one SERP load
+    cost_per_query = 0.004
+    expected_latency = 25.0
+
+    def _fetch(self, query):
+        module = load_script("Playwright/test_pw.py", "_playwright_script")
+        result = asyncio.run(module.fetch_ai_overview(query))
+        if not result:
+            return MISS, {}
+        links = [link["url"] for link in result["hyperlinks"] if link.get("url")]
+        return HIT, {"ai_text": result["plain_text"], "ai_html": result["raw_html"], "links": links}
+
+
+class ProviderStats:
+    """Rolling latency / outcome window plus lifetime totals for one provider"""
+    def __init__(self, window=20):
+        self.recent = deque(maxlen=window)
+        self.calls = 0
+        self.hits = 0
+        self.errors = 0
+        self.cost_spent = 0.0
+        self.quota_exhausted = False
+        self.unavailable = False
+        self.unhealthy_until = 0.0
+
+    def record(self, status, latency, cost):
+        self.recent.append((status, latency))
+        self.calls += 1
+        self.cost_spent += cost
+        if status == HIT:
+            self.hits += 1
+        elif status == ERROR:
+            self.errors += 1
+        elif status == QUOTA_EXCEEDED:
+            self.quota_exhausted = True
+
+    def error_rate(self):
+        if not self.recent:
+            return 0.0
+        return sum(1 for status, _ in self.recent if status == ERROR) / len(self.recent)
+
+    def success_rate(self):
+        """Share of recent calls that returned an answer (hit or miss); Laplace-smoothed"""
+        ok = sum(1 for status, _ in self.recent if status in (HIT, MISS))
+        return (ok + 1) / (len(self.recent) + 2)
+
+    def hit_rate(self):
+        """Share of recent calls that found an AI Overview; Laplace-smoothed"""
+        hits = sum(1 for status, _ in self.recent if status == HIT)
+        return (hits + 1) / (len(self.recent) + 2)
+
+    def median_latency(self, prior):
+        latencies = sorted(latency for status, latency in self.recent if status != QUOTA_EXCEEDED)
+        if not latencies:
+            return prior
+        return latencies[len(latencies) // 2]
+
+
+class ProviderRouter:
+    """
+    Route each query to the best currently-healthy provider, falling back on failure
+
+    Strategies:
+        "cheapest": lowest expected cost per AI Overview hit
+                    (cost_per_query / hit_rate), ties broken by latency
+        "fastest":  lowest expected latency per successful answer
+                    (median latency / success_rate)
+
+    A provider is skipped when its quota is exhausted (it reported quota_exceeded
+    or used max_queries), or for `cooldown` seconds once its recent error rate
+    exceeds `error_budget`.
+    """
+    STRATEGIES = ("cheapest", "fastest")
+
+    def __init__(self, providers, strategy="cheapest", window=20, error_budget=0.5,
+                 min_samples=5, cooldown=300):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}', expected one of {self.STRATEGIES}")
+
+        self.providers = list(providers)
+        self.strategy = strategy
+        self.error_budget = error_budget
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.stats = {provider.name: ProviderStats(window) for provider in self.providers}
+        self._lock = threading.Lock()
+
+    def is_healthy(self, provider, now=None):
+        stats = self.stats[provider.name]
+        if stats.unavailable or stats.quota_exhausted:
+            return False
+        if provider.max_queries is not None and stats.calls >= provider.max_queries:
+            return False
+        return (now or time.monotonic()) >= stats.unhealthy_until
+
+    def _score(self, provider):
+        stats = self.stats[provider.name]
+        latency = stats.median_latency(provider.expected_latency)
+        if self.strategy == "cheapest":
+            return (provider.cost_per_query / stats.hit_rate(), latency)
+        return (latency / stats.success_rate(), provider.cost_per_query)
+
+    def ranked_providers(self):
+        """Healthy providers, best first"""
+        with self._lock:
+            now = time.monotonic()
+            healthy = [p for p in self.providers if self.is_healthy(p, now)]
+            return sorted(healthy, key=self._score)
+
+    def _record(self, provider, status, latency):
+        with self._lock:
+            stats = self.stats[provider.name]
+            stats.record(status, latency, provider.cost_per_query if status != QUOTA_EXCEEDED else 0.0)
+
+            if status == QUOTA_EXCEEDED:
+                logger.warning(f"Provider '{provider.name}' is out of quota; falling back")
+            elif len(stats.recent) >= self.min_samples and stats.error_rate() > self.error_budget:
+                stats.unhealthy_until = time.monotonic() + self.cooldown
+                # Start the next window fresh so the provider gets a fair retry after cooldown
+                stats.recent.clear()
+                logger.warning(f"Provider '{provider.name}' exceeded its error budget; "
+                               f"pausing it for {self.cooldown}s")
+
+    def route(self, query):
+        """
+        Fetch the AI Overview for a query, trying providers in ranked order
+
+        Returns:
+            dict: Normalized record from the first provider that answered (hit or miss),
+                  or the last failure with status "error" if every provider failed
+        """
+        attempts = []
+        for provider in self.ranked_providers():
+            logger.info(f"Routing '{query}' to {provider.name}")
+            start = time.monotonic()
+            try:
+                record = provider.fetch(query)
+            except ProviderUnavailable as e:
+                logger.error(f"Provider '{provider.name}' unavailable: {e}")
+                with self._lock:
+                    self.stats[provider.name].unavailable = True
+                continue
+
+            self._record(provider, record["status"], time.monotonic() - start)
+            attempts.append(provider.name)
+
+            if record["status"] in (HIT, MISS):
+                record["attempts"] = attempts
+                return record
+            logger.warning(f"{provider.name} failed for '{query}' ({record['status']}): {record['error']}")
+
+        logger.error(f"No healthy provider could answer '{query}'")
+        return {
+            "searchQuery": query,
+            "provider": None,
+            "extractedAt": datetime.datetime.now().isoformat(),
+            "status": ERROR,
+            "ai_text": None,
+            "ai_html": None,
+            "links": [],
+            "error": "All providers failed or are unavailable",
+            "raw": None,
+            "attempts": attempts
+        }
+
+    def get_stats(self):
+        """Per-provider rolling and lifetime statistics"""
+        with self._lock:
+            now = time.monotonic()
+            summary = {}
+            for provider in self.providers:
+                stats = self.stats[provider.name]
+                summary[provider.name] = {
+                    "healthy": self.is_healthy(provider, now),
+                    "calls": stats.calls,
+                    "hits": stats.hits,
+                    "errors": stats.errors,
+                    "success_rate": round(stats.success_rate(), 3),
+                    "median_latency": round(stats.median_latency(provider.expected_latency), 2),
+                    "cost_spent": round(stats.cost_spent, 4),
+                    "cost_per_hit": round(stats.cost_spent / stats.hits, 4) if stats.hits else None,
+                    "quota_exhausted": stats.quota_exhausted
+                }
+            return summary
+
+
+def default_providers(cache=None):
+    """All known providers, in the order the README ranks them; `cache` is shared by the paid APIs"""
+    return [
+        SerpAPIProvider(cache=cache),
+        SerpAPIAnswersProvider(cache=cache),
+        ScraperAPIProvider(cache=cache),
+        SeleniumProvider(),
+        PlaywrightProvider()
+    ]
@@ -0,0 +1,278 @@
+"""
+Shared quota ledger for the paid search APIs.
+
+check_quota in the scrapers only counts this process's requests
+(self.query_count), so parallel workers and back-to-back runs could blow
+through the provider's daily or monthly allotment. The ledger is one SQLite
+file shared by every process: a request first reserves a unit against the
+provider's daily and monthly budget (atomically, under SQLite's write lock),
+commits it once the provider answered and refunds it if the call failed.
+Reservations left behind by a crashed process stay counted, erring on the
+side of not overspending. Requests retried by common.rate_limit's limiter
+reserve once per attempt (QuotaLedger.metered).
+
+Periods are UTC calendar days and months. The file defaults to
+Codes/quota_ledger.sqlite3 so scripts started from any directory share it;
+QUOTA_LEDGER_PATH overrides it.
+
+    python -m common.quota_ledger status
+    python -m common.quota_ledger set-budget google_cse --daily 100
+"""
+import os
+import sys
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEDGER_PATH = os.getenv("QUOTA_LEDGER_PATH") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "quota_ledger.sqlite3"
+)
+
+# Free-tier allotments; None means no limit for that period. Override with set-budget.
+DEFAULT_BUDGETS = {
+    "google_cse": {"daily": 100, "monthly": None},
+    "searchapi": {"daily": None, "monthly": 100},
+    "serpapi": {"daily": None, "monthly": 250},
+}
+
+RESERVED = "reserved"
+COMMITTED = "committed"
+REFUNDED = "refunded"
+
+
+class BudgetExceeded(Exception):
+    """The provider's shared daily or monthly budget is used up"""
+
+
+def _periods(now=None):
+    now = time.gmtime(now)
+    return time.strftime("%Y-%m-%d", now), time.strftime("%Y-%m", now)
+
+
+class Reservation:
+    """One reserved unit; commits on normal exit from `with`, refunds on an exception or refund()"""
+    def __init__(self, ledger, reservation_id):
+        self.ledger = ledger
+        self.id = reservation_id
+        self.settled = False
+
+    def commit(self):
+        if not self.settled:
+            self.ledger.commit(self.id)
+            self.settled = True
+
+    def refund(self):
+        if not self.settled:
+            self.ledger.refund(self.id)
+            self.settled = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type:
+            self.refund()
+        else:
+            self.commit()
+
+
+class QuotaLedger:
+    def __init__(self, path=DEFAULT_LEDGER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS budgets (
+                provider TEXT PRIMARY KEY,
+                daily INTEGER,
+                monthly INTEGER
+            )
+        """)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS spend (
+                id INTEGER PRIMARY KEY,
+                provider TEXT NOT NULL,
+                day TEXT NOT NULL,
+                month TEXT NOT NULL,
+                status TEXT NOT NULL,
+                owner TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS spend_period ON spend (provider, month, day, status)")
+
+    def budget(self, provider):
+        """(daily, monthly) limits for a provider"""
+        row = self._db.execute("SELECT daily, monthly FROM budgets WHERE provider = ?", (provider,)).fetchone()
+        if row:
+            return row
+        default = DEFAULT_BUDGETS.get(provider, {})
+        return default.get("daily"), default.get("monthly")
+
+    def set_budget(self, provider, daily=None, monthly=None):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO budgets VALUES (?, ?, ?)", (provider, daily, monthly))
+
+    def _used(self, provider, day, month):
+        row = self._db.execute(
+            "SELECT COALESCE(SUM(day = ?), 0), COUNT(*) FROM spend "
+            "WHERE provider = ? AND month = ? AND status != ?",
+            (day, provider, month, REFUNDED)
+        ).fetchone()
+        return row[0], row[1]
+
+    def reserve(self, provider, owner=None):
+        """
+        Reserve one request against the provider's budgets
+
+        Returns:
+            int: Reservation id, to commit() or refund()
+
+        Raises:
+            BudgetExceeded: daily or monthly budget already used up
+        """
+        day, month = _periods()
+        daily, monthly = self.budget(provider)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                used_day, used_month = self._used(provider, day, month)
+                if daily is not None and used_day >= daily:
+                    raise BudgetExceeded(f"{provider} daily budget of {daily} requests used up ({day} UTC)")
+                if monthly is not None and used_month >= monthly:
+                    raise BudgetExceeded(f"{provider} monthly budget of {monthly} requests used up ({month})")
+                cursor = self._db.execute(
+                    "INSERT INTO spend (provider, day, month, status, owner, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (provider, day, month, RESERVED, owner or str(os.getpid()), time.time())
+                )
+                self._db.execute("COMMIT")
+                return cursor.lastrowid
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _settle(self, reservation_id, status):
+        with self._lock:
+            self._db.execute("UPDATE spend SET status = ? WHERE id = ? AND status = ?",
+                             (status, reservation_id, RESERVED))
+
+    def commit(self, reservation_id):
+        self._settle(reservation_id, COMMITTED)
+
+    def refund(self, reservation_id):
+        self._settle(reservation_id, REFUNDED)
+
+    def spend(self, provider, owner=None):
+        """
+        Reserve a unit for use as a context manager:
+
+            with ledger.spend("serpapi") as reservation:
+                response = ...
+                if response.status_code != 200:
+                    reservation.refund()
+        """
+        return Reservation(self, self.reserve(provider, owner))
+
+    def metered(self, provider, send, owner=None):
+        """
+        Wrap send() so each call is reserved against the provider's budget:
+
+            response = limiter.call(ledger.metered("searchapi", lambda: session.get(...)))
+
+        Inside AdaptiveLimiter.call every retry is its own reservation, and a retry
+        is refused with BudgetExceeded once the budget is used up. An attempt that
+        doesn't get a 200 (5xx, 429, connection error) is refunded: providers only
+        bill the requests they answer.
+        """
+        def attempt():
+            with self.spend(provider, owner) as reservation:
+                response = send()
+                if response.status_code != 200:
+                    reservation.refund()
+            return response
+        return attempt
+
+    def usage(self, provider):
+        """Used, in-flight and remaining requests for today and this month"""
+        day, month = _periods()
+        daily, monthly = self.budget(provider)
+        with self._lock:
+            used_day, used_month = self._used(provider, day, month)
+            in_flight = self._db.execute(
+                "SELECT COUNT(*) FROM spend WHERE provider = ? AND month = ? AND status = ?",
+                (provider, month, RESERVED)
+            ).fetchone()[0]
+        return {
+            "provider": provider,
+            "day": day,
+            "daily_used": used_day,
+            "daily_limit": daily,
+            "daily_remaining": max(0, daily - used_day) if daily is not None else None,
+            "month": month,
+            "monthly_used": used_month,
+            "monthly_limit": monthly,
+            "monthly_remaining": max(0, monthly - used_month) if monthly is not None else None,
+            "in_flight": in_flight
+        }
+
+    def report(self):
+        """usage() for every provider with a budget or any recorded spend"""
+        with self._lock:
+            providers = {row[0] for row in self._db.execute(
+                "SELECT provider FROM budgets UNION SELECT DISTINCT provider FROM spend"
+            )}
+        return [self.usage(provider) for provider in sorted(providers | set(DEFAULT_BUDGETS))]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger():
+    """Process-wide ledger on DEFAULT_LEDGER_PATH"""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = QuotaLedger()
+        return _ledger
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Inspect the shared API quota ledger")
+    parser.add_argument("--path", default=DEFAULT_LEDGER_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Remaining budget per provider")
+    budget_cmd = commands.add_parser("set-budget", help="Set a provider's daily / monthly request budget")
+    budget_cmd.add_argument("provider")
+    budget_cmd.add_argument("--daily", type=int)
+    budget_cmd.add_argument("--monthly", type=int)
+    args = parser.parse_args(argv)
+
+    ledger = QuotaLedger(args.path)
+    if args.command == "set-budget":
+        ledger.set_budget(args.provider, args.daily, args.monthly)
+
+    def fmt(used, limit, remaining):
+        return f"{used}/{limit} ({remaining} left)" if limit is not None else f"{used} (no limit)"
+
+    print(f"{'provider':12} {'today':>22} {'this month':>22} {'in flight':>10}")
+    for usage in ledger.report():
+        print(f"{usage['provider']:12} "
+              f"{fmt(usage['daily_used'], usage['daily_limit'], usage['daily_remaining']):>22} "
+              f"{fmt(usage['monthly_used'], usage['monthly_limit'], usage['monthly_remaining']):>22} "
+              f"{usage['in_flight']:>10}")
+    ledger.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""
+Rate limiters shared by the scrapers.
+
+TokenBucket / AsyncTokenBucket cap requests per second. AdaptiveLimiter caps
+requests in flight per provider with AIMD (additive increase on success,
+multiplicative decrease on throttling), honors Retry-After, retries transient
+failures with jittered exponential backoff, and tells transient throttling
+apart from real quota exhaustion so long batch runs slow down instead of
+stopping.
+"""
+import time
+import random
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: refills `rate` tokens per second up to `capacity`"""
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self):
+        """Block until a token is available and take it"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class AsyncTokenBucket:
+    """Async token bucket: refills `rate` tokens per second up to `capacity`"""
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# Retried with backoff; 429 additionally shrinks the concurrency limit
+TRANSIENT_STATUS = {429, 500, 502, 503, 504}
+
+# Phrases in a 429/403 body that mean the allotment is used up, not a burst limit
+QUOTA_PHRASES = ("per day", "daily limit", "dailylimitexceeded", "monthly",
+                 "plan limit", "out of searches", "run out of", "insufficient credits")
+
+# Per-provider AIMD settings, shared by every scraper instance in the process
+PROVIDER_LIMITS = {
+    "google_cse": {"initial": 4, "max_limit": 10},
+    "searchapi": {"initial": 3, "max_limit": 8},
+}
+
+
+class QuotaExhausted(Exception):
+    """The provider's request allotment is used up; retrying won't help"""
+
+
+def parse_retry_after(value):
+    """Retry-After header (delta-seconds or HTTP date) -> seconds, or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_quota_exhausted(response):
+    """Default classifier: a 429/403 whose body talks about a daily/monthly/plan quota"""
+    if response.status_code not in (403, 429):
+        return False
+    body = (response.text or "").lower()
+    return any(phrase in body for phrase in QUOTA_PHRASES)
+
+
+class AdaptiveLimiter:
+    def __init__(self, name, initial=4, min_limit=1, max_limit=16, decrease=0.5,
+                 max_retries=5, base_delay=1.0, max_delay=60.0, quota_check=is_quota_exhausted):
+        """
+        Args:
+            name (str): Provider name, for logs
+            initial (int, optional): Starting number of requests allowed in flight
+            min_limit (int, optional): Floor for the concurrency limit
+            max_limit (int, optional): Ceiling for the concurrency limit
+            decrease (float, optional): Multiplier applied to the limit on throttling
+            max_retries (int, optional): Retries per request for throttling / transient failures
+            base_delay (float, optional): First backoff delay in seconds (doubled per attempt, jittered)
+            max_delay (float, optional): Cap on a single backoff delay
+            quota_check (callable, optional): response -> True when the quota is really exhausted
+        """
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.quota_check = quota_check
+        self.in_flight = 0
+        self.exhausted = False
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.counters = {"requests": 0, "throttled": 0, "transient_errors": 0, "retries": 0,
+                         "quota_exhausted": 0, "gave_up": 0}
+        self._cond = threading.Condition()
+
+    def _acquire(self):
+        """Wait for a free slot and for any provider-wide Retry-After pause; returns the start time"""
+        with self._cond:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    self.counters["requests"] += 1
+                    return time.monotonic()
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    def _release(self, started, outcome="ok", retry_after=None):
+        """Free the slot and adapt the limit: +1/limit per success, *decrease on throttling"""
+        with self._cond:
+            self.in_flight -= 1
+            if outcome == "throttled":
+                # Requests already in flight when we backed off don't shrink the limit again
+                if started >= self.last_decrease:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self.last_decrease = time.monotonic()
+                    logger.warning(f"{self.name}: throttled, concurrency limit now {int(self.limit)}")
+                if retry_after:
+                    self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            elif outcome == "ok":
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def _count(self, key):
+        with self._cond:
+            self.counters[key] += 1
+
+    def _backoff(self, attempt, retry_after=None):
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+        time.sleep(max(delay, retry_after or 0))
+
+    def call(self, send):
+        """
+        Run send() under the concurrency limit, retrying throttling and transient failures
+
+        Args:
+            send (callable): Makes the request and returns a requests-style response
+
+        Returns:
+            The first non-transient response, or the last one once retries are used up
+
+        Raises:
+            QuotaExhausted: the provider reported its quota as used up (now or earlier)
+            OSError: connection errors (requests' RequestException) that outlived the retries
+        """
+        if self.exhausted:
+            raise QuotaExhausted(f"{self.name} quota exhausted earlier in this run")
+        for attempt in range(self.max_retries + 1):
+            started = self._acquire()
+            try:
+                response = send()
+            except OSError as e:
+                self._release(started, "error")
+                self._count("transient_errors")
+                if attempt == self.max_retries:
+                    self._count("gave_up")
+                    raise
+                logger.warning(f"{self.name}: request failed ({e}), retrying")
+                self._count("retries")
+                self._backoff(attempt)
+                continue
+            except Exception:
+                # Not transient (e.g. BudgetExceeded from a metered send): free the slot, no retry
+                self._release(started, "error")
+                raise
+
+            status = response.status_code
+            if self.quota_check(response):
+                self._release(started, "error")
+                self._count("quota_exhausted")
+                # Every later call fails fast instead of spending a request to learn the same thing
+                self.exhausted = True
+                raise QuotaExhausted(f"{self.name} quota exhausted ({status})")
+
+            if status not in TRANSIENT_STATUS:
+                self._release(started)
+                return response
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            self._release(started, "throttled" if status == 429 else "error", retry_after)
+            self._count("throttled" if status == 429 else "transient_errors")
+            if attempt == self.max_retries:
+                self._count("gave_up")
+                return response
+            logger.warning(f"{self.name}: HTTP {status}, retry {attempt + 1}/{self.max_retries}"
+                           + (f" after Retry-After {retry_after:.1f}s" if retry_after else ""))
+            self._count("retries")
+            self._backoff(attempt, retry_after)
+        return response
+
+    def get_stats(self):
+        with self._cond:
+            return dict(self.counters, concurrency_limit=int(self.limit))
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider, **overrides):
+    """Process-wide AdaptiveLimiter for a provider (PROVIDER_LIMITS defaults, then overrides)"""
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = AdaptiveLimiter(provider, **dict(PROVIDER_LIMITS.get(provider, {}), **overrides))
+        return _limiters[provider]
@@ -0,0 +1,188 @@
+"""
+Event-driven SERP readiness for the browser scrapers.
+
+The scrapers used to sleep a fixed random 5-11 s after every navigation (the
+Playwright one waited for networkidle and then slept again). Instead, a
+MutationObserver in the page reports as soon as the DOM settles into one of
+three definitive states, with a timeout as the upper bound:
+
+    overview     an AI Overview container with marker text is present
+    no_overview  organic results and the page footer rendered, no overview heading anywhere
+    captcha      Google's CAPTCHA / "unusual traffic" page
+
+An overview heading whose content is still streaming in keeps the wait going.
+Human-like jitter is a separate PacingPolicy so it can be tuned (or disabled)
+without touching readiness, and every wait is recorded in a time-to-state
+histogram.
+"""
+import time
+import random
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+OVERVIEW = "overview"
+NO_OVERVIEW = "no_overview"
+CAPTCHA = "captcha"
+TIMEOUT = "timeout"
+
+# Upper bucket bounds in seconds
+DEFAULT_BUCKETS = [0.5, 1, 2, 3, 5, 8, 13, 20]
+
+# Returns one of the states above, or null while the page is still rendering
+_STATE_FUNCTION = """
+function serpReadinessState() {
+    const markers = ["AI Overview", "Gemini", "SGE", "AI-powered overview", "Generated by"];
+    if (location.pathname.startsWith("/sorry") || document.querySelector(
+            '#captcha-form, form[action*="sorry"], iframe[src*="recaptcha"]')) {
+        return "captcha";
+    }
+    const containers = document.querySelectorAll(
+        'div[data-md="311"], div[data-attrid*="ai_overview"], div[aria-label*="AI Overview"], ' +
+        'div[data-attrid*="sgx"], div[data-attrid*="synth"]');
+    for (const el of containers) {
+        const text = el.innerText || "";
+        if (text.length > 100 && markers.some(m => text.includes(m))) return "overview";
+    }
+    const headings = document.querySelectorAll('h1, h2, h3, [role="heading"]');
+    for (const el of headings) {
+        if ((el.textContent || "").includes("AI Overview")) return null;   // still streaming in
+    }
+    if (document.querySelector('#rso') && document.querySelector('#botstuff, #foot, footer')) {
+        return "no_overview";
+    }
+    return null;
+}
+"""
+
+# Selenium execute_async_script: arguments[0] = timeout in ms, last argument = callback
+SELENIUM_WAIT_SCRIPT = _STATE_FUNCTION + """
+const timeoutMs = arguments[0];
+const done = arguments[arguments.length - 1];
+const initial = serpReadinessState();
+if (initial) { done(initial); return; }
+let timer = null;
+const observer = new MutationObserver(() => {
+    const state = serpReadinessState();
+    if (state) { observer.disconnect(); clearTimeout(timer); done(state); }
+});
+observer.observe(document.documentElement, {childList: true, subtree: true, characterData: true});
+timer = setTimeout(() => { observer.disconnect(); done("timeout"); }, timeoutMs);
+"""
+
+# Playwright wait_for_function predicate, re-evaluated on every DOM mutation
+PLAYWRIGHT_PREDICATE = "() => {" + _STATE_FUNCTION + " return serpReadinessState(); }"
+
+
+class PacingPolicy:
+    """Human-like random delay, kept separate from page readiness"""
+    def __init__(self, min_delay=0.0, max_delay=0.0):
+        """
+        Args:
+            min_delay (float, optional): Lower bound in seconds
+            max_delay (float, optional): Upper bound in seconds; 0 disables the delay
+        """
+        self.min_delay = min_delay
+        self.max_delay = max(min_delay, max_delay)
+
+    def delay(self):
+        return random.uniform(self.min_delay, self.max_delay) if self.max_delay > 0 else 0.0
+
+    def sleep(self):
+        time.sleep(self.delay())
+
+    async def async_sleep(self):
+        await asyncio.sleep(self.delay())
+
+    def __repr__(self):
+        return f"PacingPolicy({self.min_delay}, {self.max_delay})"
+
+
+class LatencyHistogram:
+    """Bucketed latencies plus count, mean and max"""
+    def __init__(self, buckets=None):
+        self.buckets = list(buckets or DEFAULT_BUCKETS)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def summary(self):
+        labels = [f"<={bound}s" for bound in self.buckets] + [f">{self.buckets[-1]}s"]
+        return {
+            "count": self.count,
+            "mean_seconds": round(self.total / self.count, 2) if self.count else None,
+            "max_seconds": round(self.max, 2),
+            "buckets": dict(zip(labels, self.counts))
+        }
+
+
+class ReadinessDetector:
+    def __init__(self, timeout=15.0, buckets=None):
+        """
+        Args:
+            timeout (float, optional): Seconds to wait for a definitive state
+            buckets (list, optional): Histogram bucket bounds in seconds
+        """
+        self.timeout = timeout
+        self.histograms = {
+            state: LatencyHistogram(buckets) for state in (OVERVIEW, NO_OVERVIEW, CAPTCHA, TIMEOUT)
+        }
+        self._lock = threading.Lock()
+
+    def record(self, state, seconds):
+        with self._lock:
+            self.histograms[state].observe(seconds)
+        logger.debug(f"Page ready ({state}) after {seconds:.2f}s")
+
+    def wait_selenium(self, driver, started=None):
+        """
+        Block until the loaded SERP reaches a definitive state
+
+        Args:
+            driver: Selenium WebDriver, right after driver.get()
+            started (float, optional): time.monotonic() before navigation, so the
+                                       histogram measures time-to-state from the request
+
+        Returns:
+            str: overview / no_overview / captcha / timeout
+        """
+        started = started if started is not None else time.monotonic()
+        remaining = max(0.1, self.timeout - (time.monotonic() - started))
+        driver.set_script_timeout(remaining + 5)
+        try:
+            state = driver.execute_async_script(SELENIUM_WAIT_SCRIPT, int(remaining * 1000)) or TIMEOUT
+        except Exception as e:
+            logger.warning(f"Readiness script failed: {e}")
+            state = TIMEOUT
+        self.record(state, time.monotonic() - started)
+        return state
+
+    async def wait_playwright(self, page, started=None):
+        """Playwright counterpart of wait_selenium, re-checking on every DOM mutation"""
+        started = started if started is not None else time.monotonic()
+        remaining = max(0.1, self.timeout - (time.monotonic() - started))
+        try:
+            handle = await page.wait_for_function(PLAYWRIGHT_PREDICATE, polling="mutation",
+                                                  timeout=remaining * 1000)
+            state = await handle.json_value()
+        except Exception as e:
+            if "Timeout" not in type(e).__name__:
+                logger.warning(f"Readiness wait failed: {e}")
+            state = TIMEOUT
+        self.record(state, time.monotonic() - started)
+        return state
+
+    def get_stats(self):
+        """Time-to-state histogram per outcome"""
+        with self._lock:
+            return {state: histogram.summary() for state, histogram in self.histograms.items()}
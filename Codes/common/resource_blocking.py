@@ -0,0 +1,292 @@
+"""
+Request blocking for browser SERP loads, with bandwidth accounting.
+
+Every SERP load used to pull images, fonts, media and third-party tracker
+scripts over metered residential proxies. A BlockingProfile decides per
+request (resource type + domain) whether to let it through; the Selenium
+scrapers apply it with CDP Network.setBlockedURLs plus Chrome's image content
+setting, the Playwright scraper with a context route. Both honor ALLOW_DOMAINS:
+CDP gets ordered allow/block URL patterns, which Chrome checks first-match-wins
+(older Chrome only takes a plain block list, without the allow entries).
+
+Bytes actually loaded are measured per page. Blocked requests never transfer
+anything, so bytes saved is estimated from the blocked request count per
+resource type times TYPICAL_BYTES.
+"""
+import json
+import logging
+import threading
+from fnmatch import fnmatch
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+TRACKER_DOMAINS = [
+    "doubleclick.net",
+    "googleadservices.com",
+    "googlesyndication.com",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "adservice.google.com",
+    "facebook.net",
+    "scorecardresearch.com",
+]
+
+# Never blocked, whatever the resource type rules say
+ALLOW_DOMAINS = ["www.google.com/recaptcha", "www.gstatic.com/recaptcha"]
+
+# File extensions for rule types Selenium can only match by URL (CDP has no resource type filter)
+TYPE_EXTENSIONS = {
+    "image": ["png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico"],
+    "font": ["woff", "woff2", "ttf", "otf", "eot"],
+    "media": ["mp4", "webm", "mp3", "m4a", "ogg"],
+    "stylesheet": ["css"],
+}
+
+# Rough transfer size per blocked request, for the bytes-saved estimate
+TYPICAL_BYTES = {
+    "image": 20000,
+    "font": 35000,
+    "media": 250000,
+    "stylesheet": 15000,
+    "script": 50000,
+    "other": 5000,
+}
+
+# CDP Network.* types -> Playwright resource types
+_CDP_TYPES = {"Image": "image", "Font": "font", "Media": "media", "Stylesheet": "stylesheet", "Script": "script"}
+
+
+class BlockingProfile:
+    def __init__(self, name, block_types=(), block_domains=(), allow_domains=ALLOW_DOMAINS):
+        """
+        Args:
+            name (str): Profile name, for logs
+            block_types (iterable, optional): Resource types to drop (image, font, media, stylesheet, script)
+            block_domains (iterable, optional): Domains whose requests are dropped (subdomains included)
+            allow_domains (iterable, optional): Host or host/path prefixes that are never dropped
+        """
+        self.name = name
+        self.block_types = set(block_types)
+        self.block_domains = list(block_domains)
+        self.allow_domains = list(allow_domains)
+
+    @property
+    def enabled(self):
+        return bool(self.block_types or self.block_domains)
+
+    def _host_matches(self, host, domains):
+        return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+    def is_allowed_explicitly(self, url):
+        parts = urlsplit(url)
+        target = parts.netloc + parts.path
+        return any(target.startswith(prefix) for prefix in self.allow_domains)
+
+    def should_block(self, url, resource_type):
+        """Decide for one request; resource_type uses Playwright's names"""
+        if not url.startswith("http") or self.is_allowed_explicitly(url):
+            return False
+        if resource_type in self.block_types:
+            return True
+        return self._host_matches(urlsplit(url).hostname or "", self.block_domains)
+
+    def url_patterns(self):
+        """
+        Wildcard block list for the legacy `urls` form of CDP Network.setBlockedURLs
+        (URL-only approximation of the type rules; cannot express the allow list)
+        """
+        patterns = []
+        for resource_type in sorted(self.block_types):
+            for extension in TYPE_EXTENSIONS.get(resource_type, []):
+                # Versioned assets carry a query string: app.css?v=123
+                patterns.extend([f"*.{extension}", f"*.{extension}?*"])
+        for domain in self.block_domains:
+            patterns.extend([f"*://{domain}/*", f"*.{domain}/*"])
+        return patterns
+
+    def block_patterns(self):
+        """
+        Ordered `urlPatterns` for CDP Network.setBlockedURLs: allow-listed prefixes
+        first (block=False), so the first match gives the same answer as should_block
+        """
+        patterns = []
+        for prefix in self.allow_domains:
+            host, _, path = prefix.partition("/")
+            for search in ("", "?*"):
+                patterns.append({"urlPattern": f"*://{host}:*/{path}*{search}", "block": False})
+        for resource_type in sorted(self.block_types):
+            for extension in TYPE_EXTENSIONS.get(resource_type, []):
+                for search in ("", "?*"):
+                    patterns.append({"urlPattern": f"*://*:*/*.{extension}{search}", "block": True})
+        for domain in self.block_domains:
+            for host in (domain, f"*.{domain}"):
+                patterns.append({"urlPattern": f"*://{host}:*/*", "block": True})
+        return patterns
+
+    def __repr__(self):
+        return f"BlockingProfile({self.name!r}, types={sorted(self.block_types)}, domains={len(self.block_domains)})"
+
+
+PROFILES = {
+    "off": BlockingProfile("off"),
+    # Safe default: nothing the overview text or layout depends on
+    "lean": BlockingProfile("lean", ["image", "font", "media"], TRACKER_DOMAINS),
+    # Also drops CSS; cheaper, but hidden elements then show up in innerText
+    "text_only": BlockingProfile("text_only", ["image", "font", "media", "stylesheet"], TRACKER_DOMAINS),
+}
+
+
+def get_profile(profile):
+    """Accept a profile name or a BlockingProfile"""
+    return PROFILES[profile] if isinstance(profile, str) else profile
+
+
+class PageTraffic:
+    """Bytes loaded and requests blocked for one page load"""
+    def __init__(self):
+        self.loaded_bytes = 0
+        self.requests = 0
+        self.blocked = {}
+
+    def add_loaded(self, size):
+        self.requests += 1
+        self.loaded_bytes += max(0, int(size or 0))
+
+    def add_blocked(self, resource_type):
+        resource_type = resource_type if resource_type in TYPICAL_BYTES else "other"
+        self.blocked[resource_type] = self.blocked.get(resource_type, 0) + 1
+
+    @property
+    def saved_bytes(self):
+        return sum(TYPICAL_BYTES[resource_type] * count for resource_type, count in self.blocked.items())
+
+    def summary(self):
+        return {
+            "loaded_bytes": self.loaded_bytes,
+            "requests": self.requests,
+            "blocked_requests": sum(self.blocked.values()),
+            "estimated_saved_bytes": self.saved_bytes
+        }
+
+    def __str__(self):
+        return (f"{self.loaded_bytes / 1024:.0f} KB loaded in {self.requests} requests, "
+                f"{sum(self.blocked.values())} blocked (~{self.saved_bytes / 1024:.0f} KB saved)")
+
+
+class BandwidthStats:
+    """Running totals over every page a scraper loaded"""
+    def __init__(self):
+        self.pages = 0
+        self.loaded_bytes = 0
+        self.saved_bytes = 0
+        self.blocked = {}
+        self._lock = threading.Lock()
+
+    def record(self, traffic):
+        with self._lock:
+            self.pages += 1
+            self.loaded_bytes += traffic.loaded_bytes
+            self.saved_bytes += traffic.saved_bytes
+            for resource_type, count in traffic.blocked.items():
+                self.blocked[resource_type] = self.blocked.get(resource_type, 0) + count
+
+    def get_stats(self):
+        with self._lock:
+            total = self.loaded_bytes + self.saved_bytes
+            return {
+                "pages": self.pages,
+                "loaded_bytes": self.loaded_bytes,
+                "estimated_saved_bytes": self.saved_bytes,
+                "saved_bytes_per_page": self.saved_bytes // self.pages if self.pages else 0,
+                "estimated_saved_share": round(self.saved_bytes / total, 3) if total else 0.0,
+                "blocked_requests": dict(self.blocked)
+            }
+
+
+# --- Selenium (Chrome DevTools Protocol) ---
+
+def apply_chrome_options(chrome_options, profile):
+    """Chrome flags for a profile; call from make_chrome_options"""
+    profile = get_profile(profile)
+    if "image" in profile.block_types:
+        chrome_options.add_experimental_option(
+            "prefs", {"profile.managed_default_content_settings.images": 2}
+        )
+    # Performance log carries the Network.* events read by collect_selenium_traffic
+    chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return chrome_options
+
+
+def enable_selenium_blocking(driver, profile):
+    """Install the URL block list on a freshly started driver"""
+    profile = get_profile(profile)
+    driver.execute_cdp_cmd("Network.enable", {})
+    if profile.enabled:
+        try:
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urlPatterns": profile.block_patterns()})
+        except Exception as e:
+            # Chrome before urlPatterns: plain block list, so allow-listed URLs of a blocked type are dropped too
+            logger.warning(f"CDP urlPatterns unsupported ({e}); blocking without the allow list")
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": profile.url_patterns()})
+        logger.info(f"Blocking resources with {profile}")
+    return driver
+
+
+def collect_selenium_traffic(driver):
+    """
+    Read (and drain) the performance log for the page just loaded
+
+    Returns:
+        PageTraffic
+    """
+    traffic = PageTraffic()
+    types = {}
+    try:
+        entries = driver.get_log("performance")
+    except Exception as e:
+        logger.debug(f"Performance log unavailable: {e}")
+        return traffic
+    for entry in entries:
+        message = json.loads(entry["message"])["message"]
+        method, params = message.get("method"), message.get("params", {})
+        if method == "Network.requestWillBeSent":
+            types[params.get("requestId")] = _CDP_TYPES.get(params.get("type"), "other")
+        elif method == "Network.loadingFinished":
+            traffic.add_loaded(params.get("encodedDataLength"))
+        elif method == "Network.loadingFailed" and params.get("blockedReason"):
+            traffic.add_blocked(types.get(params.get("requestId"), "other"))
+    return traffic
+
+
+# --- Playwright ---
+
+async def install_playwright_blocking(context, profile, traffic):
+    """
+    Route every request of a BrowserContext through the profile
+
+    Args:
+        context: Playwright BrowserContext (one per page, as in BrowserPool.fetch)
+        profile (str or BlockingProfile): Rules to apply
+        traffic (PageTraffic): Receives blocked counts and loaded bytes
+    """
+    profile = get_profile(profile)
+
+    async def handle(route):
+        request = route.request
+        if profile.should_block(request.url, request.resource_type):
+            traffic.add_blocked(request.resource_type)
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+
+    async def on_finished(request):
+        try:
+            sizes = await request.sizes()
+            traffic.add_loaded(sizes["responseBodySize"] + sizes["responseHeadersSize"])
+        except Exception:
+            traffic.add_loaded(0)
+
+    if profile.enabled:
+        await context.route("**/*", handle)
+    context.on("requestfinished", on_finished)
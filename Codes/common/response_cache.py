@@ -0,0 +1,218 @@
+"""
+On-disk cache of raw provider responses, so identical queries aren't paid for twice.
+
+Entries are keyed by provider, normalized query, gl, hl and device, expire after
+a per-provider TTL and are evicted least-recently-used once the cache holds
+more than max_entries. In stale-while-revalidate mode an expired entry is still
+served immediately while a background thread refreshes it, which suits
+dashboards that prefer fast slightly-old data over waiting on a paid call.
+
+    python -m common.response_cache stats [--path response_cache.sqlite3]
+    python -m common.response_cache purge [--path response_cache.sqlite3]
+"""
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = "response_cache.sqlite3"
+
+# Seconds a cached response stays fresh, per provider
+DEFAULT_TTLS = {
+    "serpapi": 7 * 24 * 3600,
+    "serpapi_answers": 7 * 24 * 3600,
+    "scraperapi": 3 * 24 * 3600,
+}
+DEFAULT_TTL = 24 * 3600
+
+
+def normalize_query(query):
+    """Case-fold, Unicode-normalize and collapse whitespace so trivially different queries share an entry"""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+class ResponseCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttls=None, max_entries=50000, stale_while_revalidate=False):
+        """
+        Args:
+            path (str, optional): SQLite database file
+            ttls (dict, optional): Provider -> TTL in seconds, merged over DEFAULT_TTLS
+            max_entries (int, optional): LRU size limit
+            stale_while_revalidate (bool, optional): Serve expired entries and refresh them in the background
+        """
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_entries = max_entries
+        self.stale_while_revalidate = stale_while_revalidate
+        self.counters = {"hits": 0, "misses": 0, "stale_hits": 0, "expired": 0, "evicted": 0}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                cache_key TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                query TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(provider, query, gl="us", hl="en", device="desktop"):
+        return json.dumps([provider, normalize_query(query), gl, hl, device])
+
+    def ttl_for(self, provider):
+        return self.ttls.get(provider, DEFAULT_TTL)
+
+    def get(self, provider, query, gl="us", hl="en", device="desktop"):
+        """
+        Look up a cached response
+
+        Returns:
+            tuple: (payload, is_stale), or (None, False) on a miss. Expired entries
+                   are only returned (with is_stale=True) in stale-while-revalidate mode.
+        """
+        key = self.make_key(provider, query, gl, hl, device)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT payload, created_at FROM responses WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None, False
+
+            is_stale = now - row[1] > self.ttl_for(provider)
+            if is_stale and not self.stale_while_revalidate:
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None, False
+
+            self._db.execute("UPDATE responses SET last_access = ? WHERE cache_key = ?", (now, key))
+            self._db.commit()
+            self.counters["stale_hits" if is_stale else "hits"] += 1
+        return json.loads(row[0]), is_stale
+
+    def put(self, provider, query, payload, gl="us", hl="en", device="desktop"):
+        """Store a response and evict least-recently-used entries beyond max_entries"""
+        key = self.make_key(provider, query, gl, hl, device)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, provider, normalize_query(query), json.dumps(payload, ensure_ascii=False), now, now)
+            )
+            count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._db.execute(
+                    "DELETE FROM responses WHERE cache_key IN "
+                    "(SELECT cache_key FROM responses ORDER BY last_access LIMIT ?)",
+                    (overflow,)
+                )
+                self.counters["evicted"] += overflow
+            self._db.commit()
+
+    def fetch(self, provider, query, fetch_fn, gl="us", hl="en", device="desktop", cacheable=None):
+        """
+        Return the cached response, or call fetch_fn() and cache its result
+
+        Args:
+            fetch_fn (callable): Makes the real (paid) request; returning None means failure
+            cacheable (callable, optional): payload -> bool, to keep error payloads out of the cache
+
+        Returns:
+            tuple: (payload, from_cache)
+        """
+        payload, is_stale = self.get(provider, query, gl, hl, device)
+        if payload is not None:
+            if is_stale:
+                self._revalidate(provider, query, fetch_fn, gl, hl, device, cacheable)
+            return payload, True
+
+        payload = fetch_fn()
+        if payload is not None and (cacheable is None or cacheable(payload)):
+            self.put(provider, query, payload, gl, hl, device)
+        return payload, False
+
+    def _revalidate(self, provider, query, fetch_fn, gl, hl, device, cacheable):
+        key = self.make_key(provider, query, gl, hl, device)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                payload = fetch_fn()
+                if payload is not None and (cacheable is None or cacheable(payload)):
+                    self.put(provider, query, payload, gl, hl, device)
+            except Exception as e:
+                logger.warning(f"Background refresh of '{query}' ({provider}) failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def purge_expired(self):
+        """Delete entries older than their provider's TTL; returns the number removed"""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            for provider, in self._db.execute("SELECT DISTINCT provider FROM responses").fetchall():
+                cursor = self._db.execute(
+                    "DELETE FROM responses WHERE provider = ? AND created_at < ?",
+                    (provider, now - self.ttl_for(provider))
+                )
+                removed += cursor.rowcount
+            self._db.commit()
+        return removed
+
+    def get_stats(self):
+        """Hit/miss counters for this process plus entry counts per provider"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT provider, COUNT(*) FROM responses GROUP BY provider"
+            ).fetchall()
+            lookups = self.counters["hits"] + self.counters["stale_hits"] + self.counters["misses"]
+            served = self.counters["hits"] + self.counters["stale_hits"]
+            return dict(
+                self.counters,
+                hit_rate=round(served / lookups, 3) if lookups else 0.0,
+                entries=dict(rows)
+            )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Inspect or clean the response cache")
+    parser.add_argument("command", choices=["stats", "purge"])
+    parser.add_argument("--path", default=DEFAULT_CACHE_PATH)
+    args = parser.parse_args(argv)
+
+    cache = ResponseCache(args.path)
+    if args.command == "purge":
+        logger.info(f"Removed {cache.purge_expired()} expired entries")
+    logger.info(f"Cache entries per provider: {cache.get_stats()['entries']}")
+    cache.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
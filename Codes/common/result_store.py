@@ -0,0 +1,193 @@
+"""
+Append-only JSONL result store shared by the scraper scripts.
+
+The scripts used to json.load the whole results file at startup and json.dump
+the full list after every query, which is O(n^2) I/O and keeps every record in
+memory. Here each record is appended as one line, fsyncs are batched, readers
+iterate lazily, and a torn final line left by a crash is dropped on reopen.
+
+    python -m common.result_store compact results.jsonl [--key searchQuery]
+    python -m common.result_store convert results.json results.jsonl
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+def _repair_tail(path):
+    """Truncate a partial last line left behind by a crash mid-write"""
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return
+
+        # Walk back to the last complete line
+        pos = size - 1
+        chunk = 4096
+        while pos > 0:
+            start = max(0, pos - chunk)
+            f.seek(start)
+            block = f.read(pos - start)
+            newline = block.rfind(b'\n')
+            if newline != -1:
+                pos = start + newline + 1
+                break
+            pos = start
+        f.truncate(pos)
+        logger.warning(f"Dropped {size - pos} bytes of a partial record at the end of {path}")
+
+
+class ResultSink:
+    """Appends one JSON record per line, fsyncing every `fsync_every` records or `fsync_interval` seconds"""
+    def __init__(self, path, fsync_every=10, fsync_interval=5.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        if os.path.isfile(path):
+            _repair_tail(path)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self.written = 0
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._pending += 1
+        self.written += 1
+        if self._pending >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_results(path):
+    """Lazily yield records from a JSONL file, skipping a torn or corrupt line"""
+    if not os.path.isfile(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping unreadable record on line {line_number} of {path}")
+
+
+def completed_queries(path, key="searchQuery"):
+    """Set of query strings already stored, for resuming an interrupted batch"""
+    return {record[key] for record in iter_results(path) if key in record}
+
+
+def convert_json_array(json_path, jsonl_path):
+    """Import a legacy indented JSON array file into a JSONL store; returns records written"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        try:
+            records = json.load(f)
+        except Exception:
+            records = []
+    with ResultSink(jsonl_path, fsync_every=1000) as sink:
+        for record in records:
+            sink.write(record)
+    return len(records)
+
+
+def open_result_sink(path, legacy_json=None):
+    """Open the JSONL sink, first importing the old .json results file if the sink doesn't exist yet"""
+    if legacy_json and os.path.isfile(legacy_json) and not os.path.isfile(path):
+        count = convert_json_array(legacy_json, path)
+        logger.info(f"Imported {count} records from {legacy_json} into {path}")
+    return ResultSink(path)
+
+
+def compact(path, output=None, key="searchQuery"):
+    """
+    Rewrite a JSONL store keeping only the latest record per key
+
+    Two streaming passes: the first remembers the line number of the last
+    record for every key, the second copies just those lines. Records without
+    the key are always kept. The rewrite goes through a temp file and
+    os.replace, so a crash never leaves a half-written store.
+
+    Returns:
+        tuple: (records before, records after)
+    """
+    latest = {}
+    total = 0
+    for line_number, record in enumerate(iter_results(path)):
+        total += 1
+        if key in record:
+            latest[record[key]] = line_number
+
+    keep = set(latest.values())
+    output = output or path
+    directory = os.path.dirname(os.path.abspath(output))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.jsonl.tmp')
+    kept = 0
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as out:
+            for line_number, record in enumerate(iter_results(path)):
+                if key not in record or line_number in keep:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    kept += 1
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, output)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return total, kept
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Maintain JSONL result stores")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compact_cmd = commands.add_parser("compact", help="Keep only the latest record per query")
+    compact_cmd.add_argument("path")
+    compact_cmd.add_argument("--output")
+    compact_cmd.add_argument("--key", default="searchQuery")
+
+    convert_cmd = commands.add_parser("convert", help="Convert a JSON array file to JSONL")
+    convert_cmd.add_argument("json_path")
+    convert_cmd.add_argument("jsonl_path")
+
+    args = parser.parse_args(argv)
+    if args.command == "compact":
+        before, after = compact(args.path, args.output, args.key)
+        logger.info(f"Compacted {args.path}: {before} -> {after} records")
+    else:
+        count = convert_json_array(args.json_path, args.jsonl_path)
+        logger.info(f"Converted {count} records into {args.jsonl_path}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
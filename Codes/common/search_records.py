@@ -0,0 +1,131 @@
+"""
+Compact record types for processed search result items.
+
+_process_search_item used to build a fresh dict per item, plus nested dicts
+(metadata, product_info, structured_product, structured_offer) that repeat
+the same keys, and large discovery runs keep every item in search_results.
+These classes use __slots__ instead of a per-instance __dict__. Values that
+repeat across items (display links, currencies, availability, og:type,
+brands) are interned, so a run holds one copy of each.
+
+A record behaves like the dict it replaces wherever the scrapers read one
+(get, `in`, [key]), and from_dict() loads a saved item back. A field left
+as None is treated as absent, which keeps the JSON output identical to the
+old dicts:
+
+    json.dump(results, f, default=to_json)
+
+Measure the savings with benchmarks/record_memory.py.
+"""
+import sys
+
+
+class SlottedRecord:
+    """Base for the record types: the slot names are the JSON keys, in output order"""
+    __slots__ = ()
+    # Fields whose values repeat across items and are worth interning
+    INTERNED = ()
+    # Fields holding nested records: name -> record class
+    NESTED = {}
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            value = values.pop(name, None)
+            if name in self.INTERNED and type(value) is str:
+                value = sys.intern(value)
+            object.__setattr__(self, name, value)
+        if values:
+            raise TypeError(f"{type(self).__name__} has no fields {sorted(values)}")
+
+    @classmethod
+    def from_dict(cls, data):
+        """Record for a dict in the JSON shape, e.g. one item of a saved search_results list"""
+        values = {}
+        for name in cls.__slots__:
+            value = data.get(name)
+            if name in cls.NESTED and isinstance(value, dict):
+                value = cls.NESTED[name].from_dict(value)
+            values[name] = value
+        return cls(**values)
+
+    def to_dict(self):
+        """The dict this record stands for; None fields are left out"""
+        out = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is not None:
+                out[name] = value.to_dict() if isinstance(value, SlottedRecord) else value
+        return out
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def __contains__(self, key):
+        return key in self.__slots__ and getattr(self, key) is not None
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __eq__(self, other):
+        if isinstance(other, SlottedRecord):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class PageMeta(SlottedRecord):
+    """metadata: the page's og: metatags"""
+    __slots__ = ("description", "type", "site_name", "price", "currency", "availability", "image")
+    INTERNED = ("type", "site_name", "currency", "availability")
+
+
+class ProductInfo(SlottedRecord):
+    """product_info: og: product tags"""
+    __slots__ = ("name", "price", "currency", "availability", "image", "brand")
+    INTERNED = ("currency", "availability", "brand")
+
+
+class StructuredProduct(SlottedRecord):
+    """structured_product: the pagemap's schema.org Product"""
+    __slots__ = ("name", "description", "price", "availability", "sku", "brand")
+    INTERNED = ("availability", "brand")
+
+
+class StructuredOffer(SlottedRecord):
+    """structured_offer: the pagemap's schema.org Offer"""
+    __slots__ = ("price", "currency", "availability")
+    INTERNED = ("currency", "availability")
+
+
+class SearchItem(SlottedRecord):
+    """
+    One processed search result from Custom Search or SearchAPI
+
+    rich_data, attributes and sitelinks are rare and free-form (and rich_data
+    stores an explicit null price), so they stay plain dicts/lists.
+    """
+    __slots__ = ("title", "link", "snippet", "htmlSnippet", "displayLink", "formattedUrl", "position",
+                 "image", "metadata", "product_info", "structured_product", "structured_offer",
+                 "rich_data", "attributes", "sitelinks")
+    INTERNED = ("displayLink",)
+    NESTED = {"metadata": PageMeta, "product_info": ProductInfo,
+              "structured_product": StructuredProduct, "structured_offer": StructuredOffer}
+
+
+def to_json(value):
+    """json.dump default= hook for the record types"""
+    if isinstance(value, SlottedRecord):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,275 @@
+"""
+HTTP-only AI Overview extraction from Google SERP HTML.
+
+The browser scrapers pay for a full Chrome just to read the SERP DOM. This
+module fetches the SERP with a plain HTTP request (through the same proxies),
+parses it with lxml and runs the same selector set as get_overview_block. The
+caller only escalates to a browser when the page needs JavaScript to render
+the overview: Google served its enable-JS shell, or the overview heading is
+present but its content is loaded asynchronously.
+"""
+import logging
+from urllib.parse import quote_plus
+
+import lxml.html
+from lxml import etree
+
+from common.transport import get_session
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 12_3) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36"
+)
+
+# get_overview_block selectors: CSS for the in-page script, XPath for lxml
+OVERVIEW_SELECTORS = [
+    ('div[data-md="311"]', '//div[@data-md="311"]'),
+    ('div[data-attrid*="ai_overview"]', '//div[contains(@data-attrid, "ai_overview")]'),
+    ('div[aria-label*="AI Overview"]', '//div[contains(@aria-label, "AI Overview")]'),
+    ('div[data-attrid*="sgx"]', '//div[contains(@data-attrid, "sgx")]'),
+    ('div[data-attrid*="synth"]', '//div[contains(@data-attrid, "synth")]'),
+    ('div[class^="wDYxhc"]', '//div[starts-with(@class, "wDYxhc")]'),
+    ('div[data-ved]', '//div[@data-ved]'),
+]
+
+# CSS selector -> XPath, so callers can pass their own CSS list to the lxml search
+SELECTOR_XPATHS = dict(OVERVIEW_SELECTORS)
+
+OVERVIEW_MARKERS = ["AI Overview", "Gemini", "SGE", "AI-powered overview", "Generated by"]
+
+# Runs the selector loop inside the page: one WebDriver round-trip instead of
+# find_elements + get_attribute + .text for every match (div[data-ved] can match hundreds)
+OVERVIEW_BLOCK_SCRIPT = """
+const [selectors, markers, minHtmlLength] = arguments;
+for (const selector of selectors) {
+    let nodes;
+    try { nodes = document.querySelectorAll(selector); } catch (e) { continue; }
+    for (const el of nodes) {
+        const text = el.innerText || "";
+        if (!markers.some(m => text.includes(m))) continue;
+        const html = el.outerHTML;
+        if (html.length > minHtmlLength) {
+            return [html, text, Array.from(el.querySelectorAll("a[href]"), a => a.href)];
+        }
+    }
+}
+return null;
+"""
+
+# Overview headings; seen on a page without a qualifying block, the page goes to a browser
+OVERVIEW_HEADINGS = ["AI Overview", "AI-powered overview"]
+
+# Google's no-JS interstitial / shell pages
+JS_REQUIRED_SIGNALS = ["/httpservice/retry/enablejs", "Please click here if you are not redirected"]
+
+FOUND = "found"
+NOT_FOUND = "not_found"
+NEEDS_JS = "needs_js"
+CAPTCHA = "captcha"
+ERROR = "error"
+
+
+def proxy_url(proxy):
+    """Build a requests proxy URL from "user:pass@host:port" or a Playwright proxy dict"""
+    if not proxy:
+        return None
+    if isinstance(proxy, dict):
+        server = proxy["server"].split("://", 1)[-1]
+        if proxy.get("username"):
+            return f"http://{proxy['username']}:{proxy.get('password', '')}@{server}"
+        return f"http://{server}"
+    return f"http://{proxy}"
+
+
+def is_captcha(page_html):
+    lowered = page_html.lower()
+    return "recaptcha" in lowered or "i'm not a robot" in lowered
+
+
+def parse_html(page_html):
+    """Parse SERP HTML with lxml, dropping script/style so text matches what a browser shows"""
+    root = lxml.html.fromstring(page_html)
+    etree.strip_elements(root, "script", "style", "noscript", with_tail=False)
+    return root
+
+
+def find_overview_block(root, selectors=None, min_html_length=200, require_marker=True):
+    """
+    Run the get_overview_block selector set against a parsed page
+
+    Args:
+        root: Page parsed with parse_html
+        selectors (list, optional): CSS selectors from OVERVIEW_SELECTORS in priority order (default: all)
+        min_html_length (int, optional): Minimum outerHTML length of a qualifying block
+        require_marker (bool, optional): Only accept blocks whose text has an overview marker phrase
+
+    Returns:
+        tuple: (outer_html, text, links) of the first qualifying block, or (None, None, [])
+    """
+    selectors = selectors or [css for css, _ in OVERVIEW_SELECTORS]
+    for css in selectors:
+        for el in root.xpath(SELECTOR_XPATHS[css]):
+            txt = el.text_content()
+            if require_marker and not any(marker in txt for marker in OVERVIEW_MARKERS):
+                continue
+            html = lxml.html.tostring(el, encoding="unicode")
+            if len(html) > min_html_length:
+                links = [a.get("href") for a in el.iter("a") if a.get("href")]
+                logger.debug(f"AI Overview matched selector {css}")
+                return html, txt, links
+    return None, None, []
+
+
+def find_overview_block_in_browser(driver, selectors=None, min_html_length=200):
+    """
+    Selector search in a live Selenium page with a single execute_script call
+
+    Args:
+        driver: Selenium WebDriver with the SERP loaded
+        selectors (list, optional): CSS selectors in priority order (default: all OVERVIEW_SELECTORS)
+        min_html_length (int, optional): Minimum outerHTML length of a qualifying block
+
+    Returns:
+        tuple: (outer_html, text, links) of the first qualifying block, or (None, None, [])
+    """
+    selectors = selectors or [css for css, _ in OVERVIEW_SELECTORS]
+    found = driver.execute_script(OVERVIEW_BLOCK_SCRIPT, selectors, OVERVIEW_MARKERS, min_html_length)
+    if not found:
+        return None, None, []
+    html, text, links = found
+    return html, text, links
+
+
+def overview_hyperlinks(ai_html):
+    """Links of an extracted overview block as [{"url", "text"}], like the Playwright scraper collects them"""
+    if not ai_html:
+        return []
+    return [{"url": a.get("href"), "text": a.text_content()} for a in lxml.html.fromstring(ai_html).iter("a")]
+
+
+def find_marker_block(root, min_length=40):
+    """
+    Smallest element whose text contains an overview marker phrase and is longer than min_length
+
+    Marker-text fallback for when no selector matches. Text length and marker
+    presence are computed bottom-up in one pass (children before parents), so
+    each node is visited once instead of re-walking every subtree per div.
+
+    Returns:
+        element or None
+    """
+    length = {}
+    has_marker = {}
+    best, best_length = None, None
+    # Reversed document order visits every child before its parent
+    for el in reversed(list(root.iter())):
+        if not isinstance(el.tag, str):
+            # Comments / processing instructions: only their tail is page text
+            length[el], has_marker[el] = 0, False
+            continue
+        own = [el.text or ""]
+        total = len(own[0])
+        marker = False
+        for child in el:
+            tail = child.tail or ""
+            own.append(tail)
+            total += length.pop(child) + len(tail)
+            marker = marker or has_marker.pop(child)
+        if not marker:
+            own_text = " ".join(own)
+            marker = any(m in own_text for m in OVERVIEW_MARKERS)
+        length[el], has_marker[el] = total, marker
+
+        if marker and el.tag == "div" and total > min_length and (best is None or total < best_length):
+            best, best_length = el, total
+    return best
+
+
+def extract_overview_fallback(page_html, min_length=40):
+    """
+    Marker-text fallback over a full page: lxml parse plus find_marker_block
+
+    Returns:
+        tuple: (outer_html, text), or (None, None)
+    """
+    if not page_html:
+        return None, None
+    el = find_marker_block(parse_html(page_html), min_length)
+    if el is None:
+        return None, None
+    return lxml.html.tostring(el, encoding="unicode"), "\n".join(t.strip() for t in el.itertext() if t.strip())
+
+
+def needs_javascript(page_html, root):
+    """True when the overview can't be read from static HTML and a browser is required"""
+    if any(signal in page_html for signal in JS_REQUIRED_SIGNALS):
+        return True
+    # No organic results container at all: we got a JS shell, not a SERP
+    if not root.xpath('//div[@id="search" or @id="rso"]'):
+        return True
+    # The overview is mentioned (visible heading or inline script data) but its content
+    # streams in via JS; a browser may still find it, so don't call it a miss
+    return any(heading in page_html for heading in OVERVIEW_HEADINGS)
+
+
+def fetch_overview_http(query, proxy=None, timeout=20, verify=True, selectors=None, min_html_length=200,
+                        require_marker=True, fallback_min_length=40):
+    """
+    Fetch a Google SERP over plain HTTP and extract the AI Overview
+
+    Pass the same selectors, thresholds and fallback as the caller's browser
+    path, so a not_found here is the answer the browser would have given.
+
+    Args:
+        query (str): Search query
+        proxy (str or dict, optional): "user:pass@host:port" or a Playwright proxy dict
+        timeout (int, optional): Request timeout in seconds
+        verify (bool, optional): TLS verification (Bright Data proxies need False)
+        selectors (list, optional): CSS selectors from OVERVIEW_SELECTORS (default: all)
+        min_html_length (int, optional): Minimum outerHTML length of a selector match
+        require_marker (bool, optional): Selector matches need an overview marker phrase
+        fallback_min_length (int, optional): Text length for the marker-text fallback (None = no fallback)
+
+    Returns:
+        dict: status (found / not_found / needs_js / captcha / error), ai_html,
+              ai_text, links, page_html and bytes downloaded
+    """
+    result = {"status": ERROR, "ai_html": None, "ai_text": None, "links": [], "page_html": None, "bytes": 0}
+    url = f"https://www.google.com/search?q={quote_plus(query)}&hl=en"
+    proxies = {"http": proxy_url(proxy), "https": proxy_url(proxy)} if proxy else None
+    headers = {"User-Agent": USER_AGENT, "Accept-Language": "en-US,en;q=0.9"}
+
+    try:
+        response = get_session().get(url, headers=headers, proxies=proxies, timeout=timeout, verify=verify)
+    except Exception as e:
+        logger.warning(f"HTTP fetch failed for '{query}': {e}")
+        return result
+
+    page_html = response.text
+    result["page_html"] = page_html
+    result["bytes"] = len(response.content)
+
+    if response.status_code == 429 or is_captcha(page_html):
+        result["status"] = CAPTCHA
+        return result
+    if response.status_code != 200:
+        logger.warning(f"HTTP fetch for '{query}' returned {response.status_code}")
+        return result
+
+    root = parse_html(page_html)
+    ai_html, ai_text, links = find_overview_block(root, selectors, min_html_length, require_marker)
+    if not ai_html and fallback_min_length is not None:
+        el = find_marker_block(root, fallback_min_length)
+        if el is not None:
+            ai_html = lxml.html.tostring(el, encoding="unicode")
+            ai_text = "\n".join(t.strip() for t in el.itertext() if t.strip())
+            links = [a.get("href") for a in el.iter("a") if a.get("href")]
+    if ai_html:
+        result.update(status=FOUND, ai_html=ai_html, ai_text=ai_text, links=links)
+    elif needs_javascript(page_html, root):
+        result["status"] = NEEDS_JS
+    else:
+        result["status"] = NOT_FOUND
+    return result
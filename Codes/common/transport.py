@@ -0,0 +1,148 @@
+"""
+Shared HTTP transport for the API scrapers.
+
+Every scraper used a bare requests.get(), which opens a new TCP+TLS connection
+per call. This module keeps one requests.Session per process with keep-alive
+connection pools sized per provider host, negotiates compressed responses and
+counts how often pooled connections are reused.
+"""
+import logging
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# urllib3 only decodes brotli bodies when a brotli package is importable,
+# so only advertise "br" when we can actually handle it
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+# Keep-alive pool size per provider host (max idle connections kept open)
+HOST_POOL_SIZES = {
+    "serpapi.com": 20,
+    "www.searchapi.io": 20,
+    "api.scraperapi.com": 10,
+    "www.googleapis.com": 10,
+}
+DEFAULT_POOL_SIZE = 10
+
+
+class ConnectionStats:
+    """Thread-safe per-host counters of requests sent and connections opened"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = {}
+    
+    def _host(self, host):
+        return self._hosts.setdefault(host, {"requests": 0, "connections_opened": 0})
+    
+    def record_request(self, host):
+        with self._lock:
+            self._host(host)["requests"] += 1
+    
+    def record_connection(self, host):
+        with self._lock:
+            self._host(host)["connections_opened"] += 1
+    
+    def snapshot(self):
+        """Return per-host stats including how many requests reused a pooled connection"""
+        with self._lock:
+            stats = {}
+            for host, counts in self._hosts.items():
+                reused = max(0, counts["requests"] - counts["connections_opened"])
+                stats[host] = {
+                    "requests": counts["requests"],
+                    "connections_opened": counts["connections_opened"],
+                    "connections_reused": reused,
+                    "reuse_ratio": round(reused / counts["requests"], 3) if counts["requests"] else 0.0
+                }
+            return stats
+
+
+connection_stats = ConnectionStats()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        connection_stats.record_connection(self.host)
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        connection_stats.record_connection(self.host)
+        return super()._new_conn()
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools report every new connection to connection_stats"""
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool
+        }
+
+
+def _count_request(response, *args, **kwargs):
+    connection_stats.record_request(urlparse(response.url).hostname)
+
+
+def create_session(host_pool_sizes=None):
+    """
+    Build a keep-alive session with one connection pool per provider host
+    
+    Args:
+        host_pool_sizes (dict, optional): Host -> pool size, defaults to HOST_POOL_SIZES
+        
+    Returns:
+        requests.Session: Session shared by all scrapers in this process
+    """
+    session = requests.Session()
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+    session.headers["Connection"] = "keep-alive"
+    
+    default_adapter = PooledAdapter(pool_connections=DEFAULT_POOL_SIZE, pool_maxsize=DEFAULT_POOL_SIZE)
+    session.mount("http://", default_adapter)
+    session.mount("https://", default_adapter)
+    
+    # Dedicated adapter per provider host so each gets its own pool size
+    for host, size in (host_pool_sizes or HOST_POOL_SIZES).items():
+        session.mount(f"https://{host}/", PooledAdapter(pool_connections=1, pool_maxsize=size))
+    
+    session.hooks["response"].append(_count_request)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide shared session, creating it on first use"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def log_connection_stats(log=logger):
+    """Log per-host connection reuse statistics"""
+    for host, stats in connection_stats.snapshot().items():
+        log.info(
+            f"Connections to {host}: {stats['requests']} requests, "
+            f"{stats['connections_opened']} opened, {stats['connections_reused']} reused "
+            f"({stats['reuse_ratio']:.0%})"
+        )
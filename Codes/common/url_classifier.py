@@ -0,0 +1,296 @@
+"""
+Route-table URL classifier for site-discovery results.
+
+Each scraper's _categorize_result used to parse every result URL and walk its
+own chain of startswith checks, each a little different from the others.
+This module turns a table of path patterns into one compiled regex per site,
+so classifying a URL takes one cached canonicalization and one regex match:
+
+    classify_url("https://www.mykitsch.com/en-eu/collections/headbands/products/sedona?srsltid=...")
+    -> ClassifiedUrl(site="mykitsch.com", path="en-eu/collections/headbands/products/sedona",
+                     section="collections/headbands", kind="product", name="sedona", collection="headbands")
+
+A route pattern is a list of path segments. "{name}" captures the entity's
+name, "{collection}" its collection, and any other "{...}" matches one segment
+without keeping it. Patterns match from the start of the path, so trailing
+segments are ignored; the empty pattern only matches the home page. Routes
+are tried in order. A URL that matches none of them is a "category" named
+after its full path.
+
+DEFAULT_ROUTES follow the Shopify layout and accept a Shopify Markets locale
+prefix (/fr/, /en-eu/). SITE_ROUTES adds rules for the retailers that show up
+in the results; they are tried before the defaults, and a subdomain uses its
+parent domain's rules. Retailer pages get their own kinds (retail_product,
+retail_category), so they never feed the catalog's collection exploration.
+
+    python -m common.url_classifier urls.txt [more.txt ...]    # kind counts and URLs/sec
+"""
+import re
+import sys
+import time
+import logging
+import argparse
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+ClassifiedUrl = namedtuple("ClassifiedUrl", "site path section kind name collection")
+
+# pattern, kind, section ("{...}" filled from the match; None = the pattern's segments before {name})
+Route = namedtuple("Route", "pattern kind section locale", defaults=(None, False))
+
+DEFAULT_ROUTES = [
+    Route("", "home", locale=True),
+    Route("collections/{collection}/products/{name}", "product", "collections/{collection}", locale=True),
+    Route("collections/{collection}", "collection", locale=True),
+    Route("collections", "listing", locale=True),
+    Route("products/{name}", "product", locale=True),
+    Route("products", "listing", locale=True),
+    Route("pages/{name}", "page", locale=True),
+    Route("pages", "listing", locale=True),
+    Route("blogs/{collection}/{name}", "article", "blogs/{collection}", locale=True),
+    Route("blogs/{collection}", "blog", "blogs/{collection}", locale=True),
+    Route("search", "search", locale=True),
+]
+
+SITE_ROUTES = {
+    "amazon.com": [
+        Route("dp/{name}", "retail_product", "dp"),
+        Route("{slug}/dp/{name}", "retail_product", "dp"),
+        Route("s", "search"),
+        Route("{slug}/s", "search", "s"),
+        Route("stores/{collection}", "retail_category", "stores"),
+    ],
+    "target.com": [
+        Route("p/{slug}/-/{name}", "retail_product", "p"),
+        Route("c/{collection}", "retail_category", "c"),
+        Route("s", "search"),
+    ],
+    "ulta.com": [
+        Route("p/{name}", "retail_product", "p"),
+        Route("brand/{collection}", "retail_category", "brand"),
+    ],
+    "walmart.com": [
+        Route("ip/{slug}/{name}", "retail_product", "ip"),
+        Route("browse/{collection}", "retail_category", "browse"),
+        Route("search", "search"),
+    ],
+    "cvs.com": [
+        Route("shop/{name}", "retail_product", "shop"),
+    ],
+    "etsy.com": [
+        Route("listing/{name}", "retail_product", "listing"),
+        Route("market/{collection}", "retail_category", "market"),
+        Route("search", "search"),
+    ],
+}
+
+# Storefront languages for Shopify Markets locale prefixes (/fr, /en-eu, /pt-br). Only
+# these count, so a short page like /go or /us is not mistaken for a locale home page
+LOCALE_LANGUAGES = ["ar", "bg", "cs", "da", "de", "el", "en", "es", "et", "fi", "fr", "he", "hi", "hr", "hu",
+                    "id", "it", "ja", "ko", "lt", "lv", "ms", "nb", "nl", "no", "pl", "pt", "ro", "ru", "sk",
+                    "sl", "sv", "th", "tr", "uk", "vi", "zh"]
+LOCALE = r'(?:' + "|".join(LOCALE_LANGUAGES) + r')(?:-[a-z]{2})?'
+LOCALE_PREFIX = rf'(?:{LOCALE}/)?'
+
+CANONICAL_CACHE_SIZE = 65536
+PLACEHOLDER = re.compile(r'^\{(\w+)\}$')
+
+# scheme, //authority, path; the query and fragment are left unmatched.
+# One match is several times cheaper than urlsplit() plus .hostname
+URL_PARTS = re.compile(r'(?:[A-Za-z][A-Za-z0-9+.-]*:)?(?://(?:[^/?#@]*@)?([^/?#:]*)[^/?#]*)?([^?#]*)')
+
+
+def _canonicalize(url):
+    host, path = URL_PARTS.match(url.strip()).groups()
+    host = (host or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if "//" in path:
+        path = "/".join(segment for segment in path.split("/") if segment)
+    return host, path.strip("/")
+
+
+@lru_cache(maxsize=CANONICAL_CACHE_SIZE)
+def canonicalize(url):
+    """
+    Site and path of a URL: lowercase host without www., credentials or port,
+    path without the query, fragment, empty segments or surrounding slashes
+
+    Returns:
+        tuple: (site, path), e.g. ("mykitsch.com", "collections/headbands")
+    """
+    return _canonicalize(url)
+
+
+def _compile_route(index, route):
+    """Regex for one route, wrapped in group r<index>; its placeholders become r<index>_<name>"""
+    pieces = []
+    for segment in route.pattern.split("/") if route.pattern else []:
+        placeholder = PLACEHOLDER.match(segment)
+        if placeholder:
+            pieces.append(f"(?P<r{index}_{placeholder.group(1)}>[^/]+)")
+        else:
+            pieces.append(re.escape(segment))
+    if pieces:
+        body = "/".join(pieces) + r"(?:/|$)"
+        if route.locale:
+            body = LOCALE_PREFIX + body
+    else:
+        # Home page, possibly a locale's: "" or "fr"
+        body = rf"(?:{LOCALE})?$" if route.locale else "$"
+    return f"(?P<r{index}>{body})"
+
+
+def _section_template(route):
+    if route.section is not None:
+        return route.section
+    segments = route.pattern.split("/") if route.pattern else []
+    if "{name}" in segments:
+        segments = segments[:segments.index("{name}")]
+    return "/".join(segments)
+
+
+class RouteTable:
+    """Routes compiled into a single alternation; the first route that matches wins"""
+    def __init__(self, routes):
+        self.routes = list(routes)
+        self.pattern = re.compile("|".join(_compile_route(i, route) for i, route in enumerate(self.routes)))
+        self._sections = [_section_template(route) for route in self.routes]
+        # Per route: (regex group, placeholder) pairs, so a match reads only its own groups
+        self._groups = [
+            [(f"r{i}_{key}", key) for key in re.findall(r'\{(\w+)\}', route.pattern)]
+            for i, route in enumerate(self.routes)
+        ]
+
+    def match(self, path):
+        """
+        Returns:
+            tuple: (section, kind, name, collection), or None if no route matches
+        """
+        match = self.pattern.match(path)
+        if match is None:
+            return None
+        index = int(match.lastgroup[1:])
+        route = self.routes[index]
+        groups = {key: match.group(group) for group, key in self._groups[index]}
+        collection = groups.get("collection", "")
+        section = self._sections[index]
+        if groups and "{" in section:
+            section = section.format_map(groups)
+        return section, route.kind, groups.get("name", collection), collection
+
+
+class UrlClassifier:
+    def __init__(self, routes=None, site_routes=None, cache_size=CANONICAL_CACHE_SIZE):
+        """
+        Args:
+            routes (list, optional): Routes for every site (default DEFAULT_ROUTES)
+            site_routes (dict, optional): Site -> routes tried before `routes` (default SITE_ROUTES)
+            cache_size (int, optional): Classified URLs kept in the memo
+        """
+        self.routes = DEFAULT_ROUTES if routes is None else routes
+        self.site_routes = SITE_ROUTES if site_routes is None else site_routes
+        self._default_table = RouteTable(self.routes)
+        self._tables = {site: RouteTable(list(extra) + list(self.routes)) for site, extra in self.site_routes.items()}
+        self._site_tables = {}
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    def table_for(self, site):
+        """The site's route table; subdomains fall back to their parent domain's"""
+        table = self._site_tables.get(site)
+        if table is None:
+            table = self._default_table
+            candidate = site
+            while candidate:
+                if candidate in self._tables:
+                    table = self._tables[candidate]
+                    break
+                candidate = candidate.partition(".")[2]
+            self._site_tables[site] = table
+        return table
+
+    def classify_path(self, path, site=""):
+        """Classify an already canonical path (no slashes around it)"""
+        matched = self.table_for(site).match(path)
+        if matched is None:
+            return ClassifiedUrl(site, path, path.partition("/")[0], "category", path, "")
+        section, kind, name, collection = matched
+        return ClassifiedUrl(site, path, section, kind, name, collection)
+
+    def _classify(self, url):
+        site, path = canonicalize(url or "")
+        return self.classify_path(path, site)
+
+    def _classify_uncached(self, url):
+        site, path = _canonicalize(url or "")
+        return self.classify_path(path, site)
+
+    def classify_many(self, urls):
+        """
+        Classify a batch of URLs; repeated URLs are classified once
+
+        The batch dedupes on its own and skips the memo, so a pass over millions
+        of historical URLs doesn't evict the URLs a crawl is working on.
+
+        Returns:
+            list: ClassifiedUrl per URL, in input order
+        """
+        seen = {}
+        classify = self._classify_uncached
+        out = []
+        for url in urls:
+            classified = seen.get(url)
+            if classified is None:
+                classified = seen[url] = classify(url)
+            out.append(classified)
+        return out
+
+
+default_classifier = UrlClassifier()
+
+
+def classify_url(url):
+    """Classify one URL with the default routes (memoized)"""
+    return default_classifier.classify(url)
+
+
+def classify_urls(urls):
+    """Classify many URLs with the default routes"""
+    return default_classifier.classify_many(urls)
+
+
+def _read_urls(paths):
+    for path in paths:
+        f = sys.stdin if path == "-" else open(path, 'r', encoding='utf-8')
+        try:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Classify URLs (one per line) with the site route tables")
+    parser.add_argument("files", nargs="+", help="URL lists; - reads stdin")
+    parser.add_argument("--site", help="Only count URLs of this site")
+    args = parser.parse_args(argv)
+
+    urls = list(_read_urls(args.files))
+    started = time.perf_counter()
+    classified = classify_urls(urls)
+    elapsed = time.perf_counter() - started
+
+    counts = Counter((item.site, item.kind) for item in classified if not args.site or item.site == args.site)
+    for (site, kind), count in counts.most_common():
+        print(f"{site:40} {kind:15} {count:8}")
+    logger.info(f"Classified {len(urls)} URLs in {elapsed:.2f}s ({len(urls) / elapsed if elapsed else 0:.0f} URLs/sec)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
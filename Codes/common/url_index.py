@@ -0,0 +1,237 @@
+"""
+Persistent URL index for site-discovery crawls.
+
+_categorize_result used to rebuild the catalog in memory on every run. The
+index keeps every URL a discovery query returned in one SQLite file, with the
+section it belongs to and first-seen / last-seen timestamps, so a run can
+open where the previous one stopped. Each result is one keyed insert-or-update.
+
+The index also remembers when each discovery query last ran. A crawl that
+passes it to CrawlPlanner with refresh_after skips queries whose results are
+still fresh and re-runs only stale ones; sections no query has touched are
+always tried. The scrapers only do this when asked (--skip-fresh), since the
+skipped queries' results are not reloaded into their JSON output.
+
+    python -m common.url_index stats [--site mykitsch.com]
+    python -m common.url_index stale --days 7 [--site mykitsch.com]
+    python -m common.url_index reclassify      # after changing common/url_classifier.py routes
+"""
+import sys
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+
+from common.url_classifier import classify_url, classify_urls
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = "site_index.sqlite3"
+DEFAULT_REFRESH_DAYS = 7
+
+# Upserts are committed in batches; a crash loses at most this many
+COMMIT_EVERY = 200
+
+
+class UrlIndex:
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        """
+        Args:
+            path (str, optional): SQLite file shared by every discovery run
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                site TEXT NOT NULL,
+                section TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                name TEXT,
+                title TEXT,
+                snippet TEXT,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                seen_count INTEGER NOT NULL DEFAULT 1
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS urls_section ON urls (site, section, last_seen)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS urls_kind ON urls (site, kind)")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS queries (
+                query TEXT NOT NULL,
+                pages INTEGER NOT NULL,
+                last_run REAL NOT NULL,
+                result_count INTEGER NOT NULL,
+                PRIMARY KEY (query, pages)
+            )
+        """)
+        self._db.commit()
+        self.new_urls = 0
+        self.refreshed_urls = 0
+
+    def _written(self):
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self._db.commit()
+            self._pending = 0
+
+    def upsert(self, url, title="", snippet="", now=None):
+        """
+        Record that a search returned `url`
+
+        Returns:
+            bool: True if the URL was not in the index yet
+        """
+        now = now or time.time()
+        classified = classify_url(url)
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO urls (url, site, section, kind, name, title, snippet, first_seen, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, classified.site, classified.section, classified.kind, classified.name, title, snippet, now, now)
+            )
+            is_new = cursor.rowcount == 1
+            if not is_new:
+                self._db.execute(
+                    "UPDATE urls SET last_seen = ?, seen_count = seen_count + 1, title = ?, snippet = ? WHERE url = ?",
+                    (now, title, snippet, url)
+                )
+            self._written()
+        if is_new:
+            self.new_urls += 1
+        else:
+            self.refreshed_urls += 1
+        return is_new
+
+    def names(self, site, kind):
+        """Names of every known entity of a kind ("collection", "product", ...) on a site"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT DISTINCT name FROM urls WHERE site = ? AND kind = ? AND name != ''", (site, kind)
+            ).fetchall()
+        return {name for (name,) in rows}
+
+    def sections(self, site):
+        """Every section ("collections/hair", "products", ...) with at least one known URL"""
+        with self._lock:
+            rows = self._db.execute("SELECT DISTINCT section FROM urls WHERE site = ?", (site,)).fetchall()
+        return {section for (section,) in rows}
+
+    def stale_sections(self, site, max_age):
+        """
+        Sections whose newest sighting is older than max_age seconds
+
+        Returns:
+            list: (section, last_seen, url_count), oldest first
+        """
+        cutoff = time.time() - max_age
+        with self._lock:
+            return self._db.execute(
+                "SELECT section, MAX(last_seen), COUNT(*) FROM urls WHERE site = ? "
+                "GROUP BY section HAVING MAX(last_seen) < ? ORDER BY 2",
+                (site, cutoff)
+            ).fetchall()
+
+    def last_run(self, query, pages=1):
+        """When a discovery query last completed, or None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT last_run FROM queries WHERE query = ? AND pages = ?", (query, pages)
+            ).fetchone()
+        return row[0] if row else None
+
+    def record_query(self, query, pages, result_count, now=None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO queries VALUES (?, ?, ?, ?)",
+                (query, pages, now or time.time(), result_count)
+            )
+            self._written()
+
+    def reclassify(self, batch_size=10000):
+        """
+        Re-run the URL classifier over every stored URL, after its route tables change
+
+        Returns:
+            int: URLs whose site, section, kind or name changed
+        """
+        changed = 0
+        with self._lock:
+            reader = self._db.execute("SELECT url, site, section, kind, name FROM urls")
+            while True:
+                rows = reader.fetchmany(batch_size)
+                if not rows:
+                    break
+                updates = [
+                    (item.site, item.section, item.kind, item.name, url)
+                    for (url, *stored), item in zip(rows, classify_urls([row[0] for row in rows]))
+                    if tuple(stored) != (item.site, item.section, item.kind, item.name)
+                ]
+                if updates:
+                    self._db.executemany("UPDATE urls SET site = ?, section = ?, kind = ?, name = ? WHERE url = ?", updates)
+                changed += len(updates)
+            self._db.commit()
+            self._pending = 0
+        return changed
+
+    def flush(self):
+        with self._lock:
+            self._db.commit()
+            self._pending = 0
+
+    def get_stats(self, site=None):
+        """URL counts per kind, and how many this process added or refreshed"""
+        where, params = ("WHERE site = ?", (site,)) if site else ("", ())
+        with self._lock:
+            kinds = dict(self._db.execute(f"SELECT kind, COUNT(*) FROM urls {where} GROUP BY kind", params))
+            first_seen, last_seen = self._db.execute(
+                f"SELECT MIN(first_seen), MAX(last_seen) FROM urls {where}", params
+            ).fetchone()
+        return {
+            "total_urls": sum(kinds.values()),
+            "by_kind": kinds,
+            "first_seen": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(first_seen)) if first_seen else None,
+            "last_seen": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(last_seen)) if last_seen else None,
+            "new_this_run": self.new_urls,
+            "refreshed_this_run": self.refreshed_urls
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Inspect the persistent site URL index")
+    parser.add_argument("--path", default=DEFAULT_INDEX_PATH)
+    parser.add_argument("--site", default="mykitsch.com")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="URL counts per kind")
+    stale_cmd = commands.add_parser("stale", help="Sections not seen for a while")
+    stale_cmd.add_argument("--days", type=float, default=DEFAULT_REFRESH_DAYS)
+    commands.add_parser("reclassify", help="Re-run the URL classifier over every stored URL")
+    args = parser.parse_args(argv)
+
+    index = UrlIndex(args.path)
+    if args.command == "stats":
+        logger.info(f"{args.site}: {index.get_stats(args.site)}")
+    elif args.command == "reclassify":
+        logger.info(f"Reclassified {index.reclassify()} URLs")
+    else:
+        stale = index.stale_sections(args.site, args.days * 86400)
+        for section, last_seen, count in stale:
+            age = (time.time() - last_seen) / 86400
+            print(f"{section or '/':40} {count:6} URLs, last seen {age:.1f} days ago")
+        logger.info(f"{len(stale)} sections older than {args.days} days")
+    index.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Provider status mapping. Run from Codes/: python -m unittest discover -s tests
+"""
+import os
+import sys
+import types
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+_workdir = tempfile.TemporaryDirectory(prefix="provider_tests_")
+os.environ["QUOTA_LEDGER_PATH"] = os.path.join(_workdir.name, "quota_ledger.sqlite3")
+os.environ.update({"SERPAPI_KEY": "test-key", "SERPAPI_API_KEY": "test-key"})
+
+from common import providers
+from common.quota_ledger import get_ledger
+
+
+def setUpModule():
+    ledger = get_ledger()
+    ledger.set_budget("serpapi", None, None)
+
+
+class SerpAPIAnswersRepeatTest(unittest.TestCase):
+    def test_repeated_query_is_fetched_again(self):
+        from mock_server import MockProviderServer, SERPAPI_PATH
+        module = providers.load_script("SearchAPI/search_ai-overview.py", "_search_ai_overview_script")
+        with MockProviderServer() as server:
+            provider = providers.SerpAPIAnswersProvider(max_queries=10)
+            provider._scraper = module.GoogleAIOverviewScraper(max_queries=10)
+            provider._scraper.api_endpoint = server.url + SERPAPI_PATH
+            records = [provider.fetch("kitsch claw clip") for _ in range(3)]
+            served = server.get_stats()
+        self.assertEqual([record["status"] for record in records], [providers.HIT] * 3)
+        self.assertEqual(served[f"{SERPAPI_PATH} 200"], 3)
+
+
+class SerpAPIErrorPayloadTest(unittest.TestCase):
+    def fetch_with_payload(self, payload):
+        search = mock.Mock()
+        search.return_value.get_dict.return_value = payload
+        fake_serpapi = types.SimpleNamespace(GoogleSearch=search)
+        with mock.patch.dict(sys.modules, {"serpapi": fake_serpapi}):
+            sys.modules.pop("_serpapi_script", None)
+            return providers.SerpAPIProvider().fetch("kitsch claw clip")
+
+    def test_invalid_key_is_an_error(self):
+        record = self.fetch_with_payload({"error": "Invalid API key. Your API key should be here: ..."})
+        self.assertEqual(record["status"], providers.ERROR)
+        self.assertIn("Invalid API key", record["error"])
+
+    def test_out_of_searches_is_quota_exceeded(self):
+        record = self.fetch_with_payload({"error": "Your account has run out of searches."})
+        self.assertEqual(record["status"], providers.QUOTA_EXCEEDED)
+
+    def test_no_overview_is_a_miss(self):
+        record = self.fetch_with_payload({"search_metadata": {"status": "Success"}, "organic_results": []})
+        self.assertEqual(record["status"], providers.MISS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+"""
+Per-attempt budget metering under the adaptive limiter. Run from Codes/: python -m unittest discover -s tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.quota_ledger import QuotaLedger, BudgetExceeded
+from common.rate_limit import AdaptiveLimiter
+
+
+def responses(*statuses):
+    return iter([mock.Mock(status_code=status, text="", headers={}) for status in statuses])
+
+
+class MeteredRetryTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory(prefix="ledger_tests_")
+        self.ledger = QuotaLedger(os.path.join(self.workdir.name, "quota_ledger.sqlite3"))
+        self.limiter = AdaptiveLimiter("test", base_delay=0, max_delay=0)
+
+    def tearDown(self):
+        self.ledger._db.close()
+        self.workdir.cleanup()
+
+    def spend_rows(self):
+        return [row[0] for row in self.ledger._db.execute("SELECT status FROM spend ORDER BY id")]
+
+    def test_every_attempt_is_reserved(self):
+        replies = responses(503, 502, 200)
+        response = self.limiter.call(self.ledger.metered("test", lambda: next(replies)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.spend_rows()), 3)
+        self.assertEqual(self.ledger.usage("test")["monthly_used"], 1)
+
+    def test_spent_budget_refuses_the_attempt(self):
+        self.ledger.set_budget("test", daily=1)
+        replies = responses(200, 200)
+        send = self.ledger.metered("test", lambda: next(replies))
+        self.limiter.call(send)
+        with self.assertRaises(BudgetExceeded):
+            self.limiter.call(send)
+        self.assertEqual(self.spend_rows(), ["committed"])
+        # The refused attempt gave its concurrency slot back and wasn't retried
+        self.assertEqual(self.limiter.in_flight, 0)
+        self.assertEqual(self.limiter.counters["retries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
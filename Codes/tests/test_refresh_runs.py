@@ -0,0 +1,83 @@
+"""
+Repeated discovery runs keep the whole catalog. Run from Codes/: python -m unittest discover -s tests
+"""
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+_workdir = tempfile.TemporaryDirectory(prefix="refresh_tests_")
+os.environ["QUOTA_LEDGER_PATH"] = os.path.join(_workdir.name, "quota_ledger.sqlite3")
+os.environ.update({"SEARCHAPI_KEY": "test-key", "GOOGLE_SEARCH_API_KEY": "test-key",
+                   "GOOGLE_SEARCH_ENGINE_ID": "test-cx"})
+
+from common import providers
+from common.quota_ledger import get_ledger
+from mock_server import MockProviderServer, CSE_PATH, SEARCHAPI_PATH
+
+SECTIONS = ("collections", "products", "pages", "categories", "search_results")
+
+
+def setUpModule():
+    ledger = get_ledger()
+    for provider in ("searchapi", "google_cse"):
+        ledger.set_budget(provider, None, None)
+
+
+class RefreshRunTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.rundir = tempfile.TemporaryDirectory(prefix="refresh_run_")
+        # site_index.sqlite3 lives in the working directory and is shared by both runs
+        os.chdir(self.rundir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.rundir.cleanup()
+
+    def assert_second_run_not_smaller(self, run):
+        with MockProviderServer() as server:
+            first = run(server, "first.json")
+            second = run(server, "second.json")
+        self.assertTrue(first["search_results"])
+        for section in SECTIONS:
+            self.assertGreaterEqual(len(second[section]), len(first[section]), section)
+        self.assertGreaterEqual(os.path.getsize("second.json"), os.path.getsize("first.json"))
+
+    def test_searchapi_scraper(self):
+        module = providers.load_script("SearchAPI/searchapi_scraper.py", "_searchapi_scraper_script")
+
+        def run(server, filename):
+            scraper = module.SearchAPIScraper(max_queries=50)
+            scraper.api_endpoint = server.url + SEARCHAPI_PATH
+            scraper.execute_prioritized_searches()
+            scraper.save_results(filename)
+            scraper.url_index.close()
+            with open(filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+        self.assert_second_run_not_smaller(run)
+
+    def test_google_custom_search_scraper(self):
+        module = providers.load_script("Google Custom JSON/limit.py", "_limit_script")
+
+        def run(server, filename):
+            scraper = module.GoogleSearchScraper()
+            scraper.api_endpoint = server.url + CSE_PATH
+            scraper.discover_site_structure()
+            scraper.discover_collections()
+            scraper.discover_products()
+            scraper.save_results(filename)
+            scraper.url_index.close()
+            with open(filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+        self.assert_second_run_not_smaller(run)
+
+
+if __name__ == "__main__":
+    unittest.main()
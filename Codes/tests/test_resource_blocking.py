@@ -0,0 +1,52 @@
+"""
+Selenium CDP patterns vs the Playwright rules. Run from Codes/: python -m unittest discover -s tests
+"""
+import os
+import sys
+import unittest
+from fnmatch import fnmatchcase
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.resource_blocking import enable_selenium_blocking, get_profile
+
+ASSETS = [
+    ("https://www.mykitsch.com/cdn/shop/t/12/assets/base.css?v=123", "stylesheet"),
+    ("https://www.mykitsch.com/cdn/shop/files/clip.jpg?v=1712&width=600", "image"),
+    ("https://fonts.gstatic.com/s/inter/v13/inter.woff2", "font"),
+]
+RECAPTCHA = [
+    ("https://www.gstatic.com/recaptcha/releases/abc/styles__ltr.css", "stylesheet"),
+    ("https://www.google.com/recaptcha/api2/logo_48.png?v=2", "image"),
+]
+
+
+class SeleniumPatternTest(unittest.TestCase):
+    def setUp(self):
+        self.profile = get_profile("text_only")
+
+    def test_query_string_assets_are_blocked(self):
+        for url, resource_type in ASSETS:
+            self.assertTrue(self.profile.should_block(url, resource_type), url)
+            self.assertTrue(any(fnmatchcase(url, p) for p in self.profile.url_patterns()), url)
+
+    def test_allow_list_comes_first(self):
+        patterns = self.profile.block_patterns()
+        allowed = [p for p in patterns if not p["block"]]
+        self.assertEqual(patterns[:len(allowed)], allowed)
+        self.assertIn({"urlPattern": "*://www.gstatic.com:*/recaptcha*", "block": False}, allowed)
+        for url, resource_type in RECAPTCHA:
+            self.assertFalse(self.profile.should_block(url, resource_type), url)
+
+    def test_legacy_fallback(self):
+        driver = mock.Mock()
+        driver.execute_cdp_cmd.side_effect = [None, Exception("Invalid parameters"), None]
+        enable_selenium_blocking(driver, self.profile)
+        calls = [c.args for c in driver.execute_cdp_cmd.call_args_list]
+        self.assertEqual(calls[1], ("Network.setBlockedURLs", {"urlPatterns": self.profile.block_patterns()}))
+        self.assertEqual(calls[2], ("Network.setBlockedURLs", {"urls": self.profile.url_patterns()}))
+
+
+if __name__ == "__main__":
+    unittest.main()
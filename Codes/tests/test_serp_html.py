@@ -0,0 +1,49 @@
+"""
+HTTP-first AI Overview extraction. Run from Codes/: python -m unittest discover -s tests
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common import serp_html
+
+SERP = """<html><body><div id="search"><div id="rso">{overview}<div class="g"><a href="https://www.mykitsch.com/">Kitsch</a></div></div></div>{script}</body></html>"""
+SHORT_OVERVIEW = '<div data-attrid="sgx"><h2>AI Overview</h2><p>Satin scrunchies reduce breakage.</p></div>'
+
+
+def fetch(page_html, **kwargs):
+    response = mock.Mock(status_code=200, text=page_html, content=page_html.encode('utf-8'))
+    session = mock.Mock()
+    session.get.return_value = response
+    with mock.patch.object(serp_html, "get_session", return_value=session):
+        return serp_html.fetch_overview_http("satin scrunchies", **kwargs)
+
+
+class FetchOverviewHttpTest(unittest.TestCase):
+    def test_caller_thresholds_decide_a_short_block(self):
+        page = SERP.format(overview=SHORT_OVERVIEW, script="")
+        # Under the default 200 characters of HTML: not a final miss, the browser gets to look
+        self.assertEqual(fetch(page, fallback_min_length=None)["status"], serp_html.NEEDS_JS)
+        found = fetch(page, selectors=['div[data-attrid*="sgx"]'], min_html_length=50, fallback_min_length=None)
+        self.assertEqual(found["status"], serp_html.FOUND)
+        self.assertIn("Satin scrunchies", found["ai_text"])
+
+    def test_marker_fallback(self):
+        page = SERP.format(overview='<div><span>AI-powered overview</span> Satin scrunchies reduce breakage on curls.</div>', script="")
+        result = fetch(page)
+        self.assertEqual(result["status"], serp_html.FOUND)
+        self.assertIn("reduce breakage", result["ai_text"])
+
+    def test_overview_only_in_script_needs_browser(self):
+        page = SERP.format(overview="", script='<script>window.jsl={"title":"AI Overview"}</script>')
+        self.assertEqual(fetch(page)["status"], serp_html.NEEDS_JS)
+
+    def test_plain_serp_is_a_miss(self):
+        self.assertEqual(fetch(SERP.format(overview="", script=""))["status"], serp_html.NOT_FOUND)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+URL classification. Run from Codes/: python -m unittest discover -s tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.url_classifier import classify_url, classify_urls
+
+
+class LocaleTest(unittest.TestCase):
+    def test_locale_home_pages(self):
+        for url in ("https://www.mykitsch.com/", "https://www.mykitsch.com/fr",
+                    "https://www.mykitsch.com/en-eu?srsltid=abc", "https://www.mykitsch.com/pt-br/"):
+            self.assertEqual(classify_url(url).kind, "home", url)
+
+    def test_two_letter_page_is_not_a_locale(self):
+        classified = classify_url("https://mykitsch.com/go")
+        self.assertEqual(classified.kind, "category")
+        self.assertEqual(classified.name, "go")
+        self.assertEqual(classify_url("https://mykitsch.com/us/collections/sale").kind, "category")
+
+    def test_locale_prefixed_routes(self):
+        classified = classify_url("https://www.mykitsch.com/en-fi/collections/headbands/products/sedona-set")
+        self.assertEqual((classified.kind, classified.section, classified.name, classified.collection),
+                         ("product", "collections/headbands", "sedona-set", "headbands"))
+        self.assertEqual(classify_url("https://www.mykitsch.com/fr/pages/about").kind, "page")
+
+
+class SiteRoutesTest(unittest.TestCase):
+    def test_retailer_rules(self):
+        product, search, other = classify_urls([
+            "https://www.amazon.com/Kitsch-Satin-Scrunchies/dp/B08PDZM5QF",
+            "https://www.amazon.com/kitsch-hair-clips/s?k=kitsch",
+            "https://www.mykitsch.com/dp/B08PDZM5QF",
+        ])
+        self.assertEqual((product.kind, product.name), ("retail_product", "B08PDZM5QF"))
+        self.assertEqual(search.kind, "search")
+        self.assertEqual(other.kind, "category")
+
+
+if __name__ == "__main__":
+    unittest.main()